@@ -0,0 +1,72 @@
+# benchmarks/bench_import.py
+"""
+Tempo de import dos módulos de entrada (CLI, monitor, log) e verificação de que
+importar não cria nada no disco.
+
+Cada import roda num processo Python novo, com diretório de trabalho e
+%userprofile% apontando para uma pasta temporária vazia; vale a mediana de
+`--runs` execuções, descontado o tempo de um processo que não importa nada.
+Sai com código 1 se algum módulo passar do orçamento ou deixar arquivos na pasta.
+
+Uso: python benchmarks/bench_import.py [--runs 7] [--budget-light-ms 25] [--budget-ms 250]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _time_import(module, folder, runs):
+    code = f"import sys; sys.path.insert(0, {ROOT!r})" + (f"; import {module}" if module else "")
+    env = dict(os.environ, USERPROFILE=folder, HOME=folder)
+    tempos = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=folder, env=env, check=True)
+        tempos.append((time.perf_counter() - start) * 1000)
+    return statistics.median(tempos)
+
+
+def _created(folder):
+    return sorted(os.path.relpath(os.path.join(base, name), folder)
+                  for base, dirs, files in os.walk(folder) for name in dirs + files)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7, help="execuções por módulo (vale a mediana)")
+    parser.add_argument("--budget-light-ms", type=float, default=25, help="orçamento de nuvem e nuvem.logger")
+    parser.add_argument("--budget-ms", type=float, default=250, help="orçamento das ferramentas e do monitor")
+    args = parser.parse_args(argv)
+
+    modulos = [
+        ("nuvem", args.budget_light_ms),
+        ("nuvem.logger", args.budget_light_ms),
+        ("nuvem.log_retention", args.budget_ms),
+        ("nuvem.history", args.budget_ms),
+        ("nuvem.monitor", args.budget_ms),
+    ]
+    falhas = 0
+    with tempfile.TemporaryDirectory() as folder:
+        base = _time_import(None, folder, args.runs)
+    print(f"Processo Python vazio: {base:.1f} ms (descontado abaixo)")
+    print(f"{'módulo':<22} {'import (ms)':>12} {'orçamento':>10}  arquivos criados")
+    for module, budget in modulos:
+        # Pasta nova por módulo: o que aparecer nela foi criado por aquele import
+        with tempfile.TemporaryDirectory() as folder:
+            tempo = max(0.0, _time_import(module, folder, args.runs) - base)
+            criados = _created(folder)
+        ok = tempo <= budget and not criados
+        falhas += not ok
+        print(f"{module:<22} {tempo:>12.1f} {budget:>10.0f}  {', '.join(criados) or '-'}"
+              f"{'' if ok else '  <- FALHOU'}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
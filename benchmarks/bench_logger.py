@@ -0,0 +1,96 @@
+# benchmarks/bench_logger.py
+"""
+Custo de nuvem.logger.log para quem chama (threads de medição, laço do jitter).
+
+Compara o caminho anterior (abrir o arquivo, gravar uma linha, fechar e dar
+print a cada chamada) com o LogWriter (fila + thread gravando em lotes). Mede
+chamadas por segundo e a latência de cada chamada (p50/p99/máx), com o
+terminal redirecionado para os.devnull. O tempo de esvaziar a fila no fim
+entra no total do LogWriter.
+
+Uso: python benchmarks/bench_logger.py [--calls 20000] [--threads 4]
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nuvem.latency import percentile  # noqa: E402
+from nuvem.logger import LogWriter  # noqa: E402
+
+MESSAGE = "Download nativo: {'phase': 'download', 'mbps': 94.31, 'bytes': 117891072, 'streams': 4}"
+
+
+def legacy_log(path):
+    def log(message):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        full_message = f"[{timestamp}] {message}"
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(full_message + "\n")
+        print(full_message)
+    return log
+
+
+def writer_log(writer):
+    def log(message):
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        writer.write(f"[{timestamp}] {message}")
+    return log
+
+
+def _hammer(log, calls, latencies):
+    clock = time.perf_counter_ns
+    for _ in range(calls):
+        start = clock()
+        log(MESSAGE)
+        latencies.append(clock() - start)
+
+
+def _run(log, calls, threads, finish=None):
+    per_thread = calls // threads
+    latencies = [[] for _ in range(threads)]
+    workers = [threading.Thread(target=_hammer, args=(log, per_thread, latencies[i])) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    calls_s = time.perf_counter() - start
+    if finish:
+        finish()
+    total_s = time.perf_counter() - start
+    values = sorted(v / 1000 for thread in latencies for v in thread)
+    return per_thread * threads / calls_s, percentile(values, 50), percentile(values, 99), values[-1], total_s
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=20000, help="chamadas de log no total")
+    parser.add_argument("--threads", type=int, default=4, help="threads chamando log() ao mesmo tempo")
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as folder, open(os.devnull, "w") as devnull:
+        writer = LogWriter(os.path.join(folder, "atual.log"))
+        # O print() do caminho anterior e o eco do LogWriter vão para os.devnull
+        with contextlib.redirect_stdout(devnull):
+            rows.append(("anterior", _run(legacy_log(os.path.join(folder, "anterior.log")), args.calls, args.threads)))
+            rows.append(("atual", _run(writer_log(writer), args.calls, args.threads, finish=writer.close)))
+        with open(os.path.join(folder, "atual.log"), encoding="utf-8") as f:
+            gravadas = sum(1 for _ in f)
+
+    print(f"{args.calls} chamadas em {args.threads} thread(s)")
+    print(f"{'modo':<10} {'chamadas/s':>12} {'p50 (us)':>9} {'p99 (us)':>9} {'máx (us)':>10} {'total s':>8}")
+    for label, (rate, p50, p99, maximum, total_s) in rows:
+        print(f"{label:<10} {rate:>12,.0f} {p50:>9.1f} {p99:>9.1f} {maximum:>10.1f} {total_s:>8.2f}")
+    print(f"Linhas gravadas pelo LogWriter: {gravadas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# benchmarks/bench_server_catalog.py
+"""
+Compara a leitura da lista de servidores do speedtest.net feita pelo speedtest-cli
+(documento inteiro em memória + ordenação por distância) com o ServerCatalog
+(iterparse + k-d tree), usando a amostra gravada em benchmarks/data.
+
+Uso: python benchmarks/bench_server_catalog.py [--generate] [--queries N]
+"""
+import argparse
+import gzip
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nuvem.server_catalog import ServerCatalog, EARTH_RADIUS_KM  # noqa: E402
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "speedtest-servers-sample.xml.gz")
+SAMPLE_SERVERS = 12000
+
+
+def generate_sample(path: str = SAMPLE_PATH, count: int = SAMPLE_SERVERS, seed: int = 42):
+    # Lista sintética no formato de speedtest-servers.php, com cidades agrupadas como na real
+    rng = random.Random(seed)
+    cities = [(rng.uniform(-50, 60), rng.uniform(-180, 180)) for _ in range(count // 8)]
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<settings>\n<servers>\n')
+        for server_id in range(1, count + 1):
+            lat, lon = rng.choice(cities)
+            lat += rng.gauss(0, 0.3)
+            lon += rng.gauss(0, 0.3)
+            host = f"speedtest{server_id}.example.net:8080"
+            f.write(
+                f'<server url="http://{host}/speedtest/upload.php" lat="{lat:.4f}" lon="{lon:.4f}" '
+                f'name="Cidade {server_id % 997}" country="País {server_id % 61}" cc="P{server_id % 61}" '
+                f'sponsor="Provedor {server_id}" id="{server_id}" host="{host}" />\n'
+            )
+        f.write("</servers>\n</settings>\n")
+
+
+def _distance(origin, destination):
+    # Mesma fórmula de speedtest.distance()
+    lat1, lon1 = origin
+    lat2, lon2 = destination
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon / 2) ** 2)
+    return EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def legacy_parse(path: str, lat_lon):
+    # Reproduz o speedtest-cli: lê tudo, monta a árvore e calcula a distância de cada servidor
+    with gzip.open(path, "rb") as f:
+        chunks = []
+        while True:
+            chunk = f.read(1024)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    root = ET.fromstring(b"".join(chunks))
+    servers = {}
+    for server in root.iter("server"):
+        attrib = server.attrib
+        d = _distance(lat_lon, (float(attrib["lat"]), float(attrib["lon"])))
+        attrib["d"] = d
+        servers.setdefault(d, []).append(attrib)
+    return servers
+
+
+def legacy_closest(servers, limit=5):
+    closest = []
+    for d in sorted(servers):
+        for server in servers[d]:
+            closest.append(server)
+            if len(closest) == limit:
+                return closest
+    return closest
+
+
+def legacy_distances(servers, lat_lon):
+    recomputed = {}
+    for group in servers.values():
+        for attrib in group:
+            d = _distance(lat_lon, (float(attrib["lat"]), float(attrib["lon"])))
+            recomputed.setdefault(d, []).append(attrib)
+    return recomputed
+
+
+def catalog_parse(path: str):
+    with gzip.open(path, "rb") as f:
+        return ServerCatalog.parse(f)
+
+
+def _measure(label, func, *args):
+    # Tempo e pico de memória em execuções separadas: o tracemalloc distorce o tempo
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms   pico {peak / 1024 / 1024:7.2f} MiB")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--generate", action="store_true", help="regrava a amostra sintética")
+    parser.add_argument("--queries", type=int, default=1000, help="consultas de vizinhos mais próximos")
+    parser.add_argument("-k", type=int, default=5, help="servidores por consulta")
+    args = parser.parse_args(argv)
+
+    if args.generate or not os.path.exists(SAMPLE_PATH):
+        os.makedirs(os.path.dirname(SAMPLE_PATH), exist_ok=True)
+        generate_sample()
+    print(f"Amostra: {SAMPLE_PATH} ({os.path.getsize(SAMPLE_PATH) / 1024:.0f} KiB)")
+
+    client = (-23.55, -46.63)
+    servers = _measure("speedtest-cli (ET.fromstring)", legacy_parse, SAMPLE_PATH, client)
+    catalog = _measure("ServerCatalog (iterparse)", catalog_parse, SAMPLE_PATH)
+    print(f"Servidores: {sum(len(v) for v in servers.values())} / {len(catalog)}")
+
+    rng = random.Random(7)
+    points = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    for lat, lon in points:
+        catalog.nearest(lat, lon, args.k)
+    per_query = (time.perf_counter() - start) / len(points)
+    print(f"nearest(k={args.k}) k-d tree          {per_query * 1e6:9.1f} µs por consulta")
+
+    # Linha de base: distância para todos e ordenação, como o speedtest-cli faz a cada execução
+    sample = points[: max(1, len(points) // 20)]
+    start = time.perf_counter()
+    for lat, lon in sample:
+        legacy_closest(legacy_distances(servers, (lat, lon)), args.k)
+    per_query = (time.perf_counter() - start) / len(sample)
+    print(f"varredura linear + sort            {per_query * 1e6:9.1f} µs por consulta")
+
+    # Confere que o índice devolve os mesmos vizinhos da varredura
+    lat, lon = client
+    expected = [s["id"] for s in legacy_closest(servers, args.k)]
+    found = [s["id"] for s in catalog.nearest_servers(lat, lon, args.k)]
+    print("Vizinhos conferem com a varredura:", "sim" if expected == found else f"não ({expected} x {found})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# benchmarks/bench_throughput.py
+"""
+Custo de CPU e memória do próprio cliente de vazão (nuvem/throughput.py) no loopback.
+
+Um servidor HTTP em outro processo entrega e recebe dados limitados a `--rate`
+Mbps no total. Cada modo roda num processo novo, para que o pico de RSS seja
+só dele. Os modos são o caminho atual (fatias de memoryview no upload, readinto
+no download) e o caminho anterior (corpo novo a cada POST, read() no download).
+Com --processos, entra também o modo "processes" do motor (fluxos repartidos
+entre processos); a CPU inclui a dos processos filhos e o RSS soma o do maior deles.
+No Windows (sem o módulo resource) a CPU vem de os.times(), sem os filhos, e o pico
+de RSS só aparece com o psutil instalado; sem ele a coluna fica com "-".
+
+Uso: python benchmarks/bench_throughput.py [--rate 1000] [--seconds 5] [--streams 4] [--processos]
+"""
+import argparse
+import http.client
+import http.server
+import multiprocessing
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource  # só existe em Unix
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from nuvem.throughput import ThroughputEngine, ThroughputError, CHUNK_SIZE, MODE_PROCESSES, _connect, _path  # noqa: E402
+
+DOWNLOAD_SIZE = 1024 * 1024 * 1024
+SERVER_CHUNK = 256 * 1024
+
+
+class _PacedHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    payload = memoryview(bytes(SERVER_CHUNK))
+
+    def _rate(self) -> float:
+        # Bytes por segundo desta conexão (?rate= em bits/s)
+        query = parse_qs(urlsplit(self.path).query)
+        return float(query.get("rate", ["0"])[0]) / 8
+
+    def _pace(self, start: float, done: int, rate: float):
+        if rate > 0:
+            ahead = done / rate - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    def do_GET(self):
+        rate = self._rate()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(DOWNLOAD_SIZE))
+        self.end_headers()
+        start = time.perf_counter()
+        sent = 0
+        try:
+            while sent < DOWNLOAD_SIZE:
+                self.wfile.write(self.payload)
+                sent += SERVER_CHUNK
+                self._pace(start, sent, rate)
+        except OSError:
+            self.close_connection = True
+
+    def do_POST(self):
+        rate = self._rate()
+        remaining = int(self.headers.get("Content-Length", 0))
+        sink = memoryview(bytearray(SERVER_CHUNK))
+        start = time.perf_counter()
+        received = 0
+        while remaining > 0:
+            n = self.rfile.readinto(sink[:min(SERVER_CHUNK, remaining)])
+            if not n:
+                self.close_connection = True
+                return
+            remaining -= n
+            received += n
+            self._pace(start, received, rate)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _serve(port_queue):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _PacedHandler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class LegacyEngine(ThroughputEngine):
+    """
+    Caminho de dados anterior: read() aloca um bytes por bloco e cada POST monta o corpo de novo.
+    """
+
+    def _download_stream(self, index, counters, stop, errors):
+        conn = None
+        path = _path(self.download_url)
+        while not stop.is_set():
+            try:
+                if conn is None:
+                    conn = _connect(self.download_url, self.timeout_s)
+                conn.request("GET", path)
+                response = conn.getresponse()
+                while not stop.is_set():
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    counters[index] += len(chunk)
+                conn.close()
+                conn = None
+            except (OSError, http.client.HTTPException, ThroughputError) as e:
+                errors.append(e)
+                conn = None
+
+    def _upload_stream(self, index, counters, stop, errors):
+        conn = None
+        path = _path(self.upload_url)
+        while not stop.is_set():
+            try:
+                if conn is None:
+                    conn = _connect(self.upload_url, self.timeout_s)
+                body = b"0" * self.upload_size
+                conn.putrequest("POST", path)
+                conn.putheader("Content-Length", str(len(body)))
+                conn.endheaders()
+                sent = 0
+                while sent < len(body) and not stop.is_set():
+                    chunk = body[sent:sent + CHUNK_SIZE]
+                    conn.send(chunk)
+                    sent += len(chunk)
+                    counters[index] += len(chunk)
+                if sent < len(body):
+                    conn.close()
+                    conn = None
+                    break
+                conn.getresponse().read()
+            except (OSError, http.client.HTTPException, ThroughputError) as e:
+                errors.append(e)
+                conn = None
+
+
+def _cpu_seconds() -> float:
+    # Processos filhos (modo "processes") entram depois de encerrados; no Windows os.times() não os conta
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def _peak_rss_mib():
+    # Pico de RSS deste processo e do maior filho encerrado, ou None sem como medir
+    if resource is not None:
+        # ru_maxrss vem em KiB no Linux
+        return sum(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        # peak_wset é o pico no Windows; nos demais sistemas fica o RSS atual
+        return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+    return None
+
+
+def _run_mode(mode, url, streams, seconds, result_queue):
+    engine_class = LegacyEngine if mode == "anterior" else ThroughputEngine
+    options = {"mode": MODE_PROCESSES} if mode == "processos" else {}
+    engine = engine_class(url, streams=streams, duration_s=seconds, warmup_s=0.5, timeout_s=5, **options)
+    rows = []
+    for phase in ("download", "upload"):
+        cpu = _cpu_seconds()
+        result = getattr(engine, phase)()
+        cpu = _cpu_seconds() - cpu
+        gigabytes = result["total_bytes"] / 1e9
+        rows.append((phase, result["mbps"], cpu / gigabytes if gigabytes else float("nan")))
+    result_queue.put((rows, _peak_rss_mib()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=float, default=1000, help="vazão total em Mbps (0 = sem limite)")
+    parser.add_argument("--seconds", type=float, default=5, help="duração de cada fase")
+    parser.add_argument("--streams", type=int, default=4, help="fluxos paralelos")
+    parser.add_argument("--processos", action="store_true", help="inclui o modo com fluxos em processos")
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context("spawn")
+    port_queue = ctx.Queue()
+    server = ctx.Process(target=_serve, args=(port_queue,), daemon=True)
+    server.start()
+    port = port_queue.get(timeout=10)
+    per_stream_bps = args.rate * 1_000_000 / args.streams
+    url = f"http://127.0.0.1:{port}/bench?rate={per_stream_bps:.0f}"
+
+    print(f"Loopback, {args.streams} fluxos, limite total {args.rate:g} Mbps, {args.seconds:g}s por fase")
+    print(f"{'modo':<10} {'fase':<9} {'Mbps':>9} {'CPU-s/GB':>9} {'pico RSS':>10}")
+    try:
+        modes = ("anterior", "atual", "processos") if args.processos else ("anterior", "atual")
+        for mode in modes:
+            result_queue = ctx.Queue()
+            worker = ctx.Process(target=_run_mode, args=(mode, url, args.streams, args.seconds, result_queue))
+            worker.start()
+            rows, peak = result_queue.get(timeout=args.seconds * 4 + 30)
+            worker.join()
+            pico = "-" if peak is None else f"{peak:.1f} MiB"
+            for phase, mbps, cpu_per_gb in rows:
+                print(f"{mode:<10} {phase:<9} {mbps:9.1f} {cpu_per_gb:9.3f} {pico:>10}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,16 +7,20 @@ if sys.stderr is None:
     sys.stderr = io.StringIO()
 
 # main.py
-import os, json
+import os
+import multiprocessing
 import time
 from PySide6.QtWidgets import QApplication, QMainWindow, QPushButton, QLabel, QVBoxLayout, QWidget, QProgressBar, QSpacerItem, QSizePolicy, QScrollArea
 from PySide6.QtCore import QThread, QTimer, Qt
 from PySide6.QtGui import QPixmap, QFont, QIcon
 from PySide6.QtCore import QSize
 from ui_main import Ui_MainWindow
-from nuvem_test.logger import log
-from nuvem_test.network_worker import SpeedTestWorker, NetworkWorker
-from nuvem_test.alternative_speedtest import AlternativeSpeedTestWindow
+from nuvem.config_loader import load_config
+from nuvem.logger import log
+from nuvem.log_retention import start_maintenance as start_log_maintenance
+from nuvem.network_worker import SessionWorker
+from nuvem.speedtest_worker import total_timeout
+from nuvem.alternative_speedtest import AlternativeSpeedTestWindow
 
 def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
@@ -120,10 +124,10 @@ class MainWindow(QMainWindow):
             self.scroll_area.verticalScrollBar().setValue(self.scroll_area.verticalScrollBar().maximum())
         self._scroll_to_bottom = scroll_to_bottom  # Referência para uso posterior
 
-        # Carrega o conf.json do diretório do usuário
-        config_path = resource_path("config/conf.json")
-        with open(config_path, "r", encoding="utf-8") as f:
-            self.config = json.load(f)
+        # conf.json do diretório do usuário (ou do bundle), lido e validado uma vez pelo ConfigService
+        self.config = load_config()
+        # Compressão e retenção dos logs antigos, em segundo plano
+        start_log_maintenance(self.config.get("logging"))
 
         # Ajusta layout do topo para imagem e texto centralizados na tela
         from PySide6.QtWidgets import QHBoxLayout, QSpacerItem, QSizePolicy
@@ -241,17 +245,29 @@ class MainWindow(QMainWindow):
         self.progress_bar.setRange(0, 0)
         QApplication.processEvents()
 
-        self.network_thread = QThread()
-        self.network_worker = NetworkWorker()
-        self.network_worker.moveToThread(self.network_thread)
-        self.network_thread.started.connect(self.network_worker.run_tests)
-        self.network_worker.progress.connect(self.update_progress)
-        self.network_worker.result.connect(self.update_results)
-        self.network_worker.finished.connect(self.on_network_finished)
-        self.network_worker.finished.connect(self.network_thread.quit)
-        self.network_worker.finished.connect(self.network_worker.deleteLater)
-        self.network_thread.finished.connect(self.network_thread.deleteLater)
-        self.network_thread.start()
+        # Testes de conexão e speedtest numa sessão só: a descoberta do servidor roda junto
+        # com as sondas TCP e as mensagens chegam na ordem de sempre (conexão, depois speedtest)
+        self.session_thread = QThread()
+        timeout_seconds = total_timeout(self.config)
+        self.session_worker = SessionWorker(timeout=timeout_seconds)
+        self.session_worker.moveToThread(self.session_thread)
+        self.session_thread.started.connect(self.session_worker.run)
+        self.session_worker.network_progress.connect(self.update_progress)
+        self.session_worker.network_result.connect(self.update_results)
+        self.session_worker.network_finished.connect(self.on_network_finished)
+        self.session_worker.progress.connect(self.update_speedtest_progress)
+        self.session_worker.throughput.connect(self.on_speedtest_sample)
+        self.session_worker.finished.connect(self.on_speedtest_finished)
+        self.session_worker.error.connect(self.on_speedtest_error)
+        self.session_worker.finished.connect(self.session_thread.quit)
+        self.session_worker.error.connect(self.session_thread.quit)
+        self.session_worker.finished.connect(self.session_worker.deleteLater)
+        self.session_thread.finished.connect(self.session_thread.deleteLater)
+
+        self.speedtest_timeout_timer = QTimer()
+        self.speedtest_timeout_timer.setSingleShot(True)
+        self.speedtest_timeout_timer.timeout.connect(self.on_speedtest_timeout)
+        self.session_thread.start()
 
     def update_progress(self, message):
         # Adiciona a mensagem ao texto existente, sem apagar
@@ -272,34 +288,39 @@ class MainWindow(QMainWindow):
         self._scroll_to_bottom()
 
     def on_network_finished(self, results):
+        # O speedtest já está rodando (servidor escolhido em paralelo); daqui em diante mede a vazão
         self.label.setText(self.label.text() + "\nIniciando teste de velocidade...")
         QApplication.processEvents()
         self._scroll_to_bottom()
+        timeout_seconds = total_timeout(self.config)
+        self.speedtest_timeout_timer.start(int(timeout_seconds * 1000))
 
-        self.speedtest_thread = QThread()
-        timeout_seconds = self.config.get("speedtest_timeout", 40)
-        self.speedtest_worker = SpeedTestWorker(timeout=timeout_seconds)
-        self.speedtest_worker.moveToThread(self.speedtest_thread)
-        self.speedtest_thread.started.connect(self.speedtest_worker.run)
-        self.speedtest_worker.progress.connect(self.update_speedtest_progress)
-        self.speedtest_worker.finished.connect(self.on_speedtest_finished)
-        self.speedtest_worker.error.connect(self.on_speedtest_error)
-        self.speedtest_worker.finished.connect(self.speedtest_thread.quit)
-        self.speedtest_worker.finished.connect(self.speedtest_worker.deleteLater)
-        self.speedtest_thread.finished.connect(self.speedtest_thread.deleteLater)
-
-        self.speedtest_timeout_timer = QTimer()
-        self.speedtest_timeout_timer.setSingleShot(True)
-        self.speedtest_timeout_timer.timeout.connect(self.on_speedtest_timeout)
-        self.speedtest_thread.start()
-        self.speedtest_timeout_timer.start(timeout_seconds * 1000)
+    def _label_sem_amostra(self):
+        # Texto do label sem a linha de vazão ao vivo
+        texto = self.label.text()
+        linha = getattr(self, "_linha_amostra", None)
+        if linha and texto.endswith(linha):
+            texto = texto[:-len(linha)]
+        self._linha_amostra = None
+        return texto
 
     def update_speedtest_progress(self, message):
         # Exibe mensagem de progresso do speedtest na interface
-        self.label.setText(self.label.text() + "\n" + message)
+        self.label.setText(self._label_sem_amostra() + "\n" + message)
         QApplication.processEvents()
         self._scroll_to_bottom()
 
+    def on_speedtest_sample(self, sample):
+        # Cada amostra também serve de heartbeat para on_speedtest_timeout
+        self.last_speedtest_update = time.time()
+        if "mbps" not in sample:
+            return
+        fase = "Download" if sample.get("phase") == "download" else "Upload"
+        texto = self._label_sem_amostra()
+        self._linha_amostra = f"\n    {fase} ao vivo: {sample['mbps']} Mbps"
+        self.label.setText(texto + self._linha_amostra)
+        self._scroll_to_bottom()
+
     def on_speedtest_finished(self, result):
         # Se o fallback já foi aberto, ignore o resultado do speedtest
         if hasattr(self, "fallback_ativo") and self.fallback_ativo:
@@ -328,7 +349,7 @@ class MainWindow(QMainWindow):
 
     def on_speedtest_timeout(self):
         # Só aciona o alternative_speedtest se o tempo desde a última atualização for maior que o timeout
-        timeout_seconds = self.config.get("speedtest_timeout", 40)
+        timeout_seconds = total_timeout(self.config)
         now = time.time()
         if not hasattr(self, "last_speedtest_update") or (now - self.last_speedtest_update) >= timeout_seconds:
             log("Speedtest demorou demais. Abrindo alternativa.")
@@ -346,26 +367,13 @@ class MainWindow(QMainWindow):
     def abrir_speedtest_alternativo(self):
         # Marca que o fallback foi acionado
         self.fallback_ativo = True
-        # Cancela o teste de velocidade se estiver rodando
-        if hasattr(self, "speedtest_worker"):
+        # Cancela a sessão (testes de conexão e speedtest) se estiver rodando
+        if hasattr(self, "session_worker"):
             try:
-                self.speedtest_worker.cancel()
+                self.session_worker.cancel()
             except Exception:
                 pass
-        # Não espera a thread do speedtest terminar, apenas ignora o resultado
-        # Cancela o network worker se estiver rodando
-        if hasattr(self, "network_worker"):
-            try:
-                self.network_worker.cancel()
-            except Exception:
-                pass
-        if hasattr(self, "network_thread") and self.network_thread is not None:
-            try:
-                if self.network_thread.isRunning():
-                    self.network_thread.quit()
-                    self.network_thread.wait(2000)
-            except RuntimeError:
-                pass
+        # Não espera a thread da sessão terminar, apenas ignora o resultado
         # Abre a janela alternativa
         self.alt_window = AlternativeSpeedTestWindow()
         self.alt_window.show()
@@ -374,28 +382,16 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         # Cancela todos os workers e threads ao fechar a janela principal
-        if hasattr(self, "speedtest_worker"):
-            try:
-                self.speedtest_worker.cancel()
-            except Exception:
-                pass
-        if hasattr(self, "speedtest_thread") and self.speedtest_thread is not None:
-            try:
-                if self.speedtest_thread.isRunning():
-                    self.speedtest_thread.quit()
-                    self.speedtest_thread.wait(2000)
-            except RuntimeError:
-                pass
-        if hasattr(self, "network_worker"):
+        if hasattr(self, "session_worker"):
             try:
-                self.network_worker.cancel()
+                self.session_worker.cancel()
             except Exception:
                 pass
-        if hasattr(self, "network_thread") and self.network_thread is not None:
+        if hasattr(self, "session_thread") and self.session_thread is not None:
             try:
-                if self.network_thread.isRunning():
-                    self.network_thread.quit()
-                    self.network_thread.wait(2000)
+                if self.session_thread.isRunning():
+                    self.session_thread.quit()
+                    self.session_thread.wait(2000)
             except RuntimeError:
                 pass
         event.accept()
@@ -437,6 +433,8 @@ class MainWindow(QMainWindow):
         self.main_layout.insertWidget(2, self.button)
 
 if __name__ == "__main__":
+    # Necessário no executável do PyInstaller para o modo "processes" do motor de vazão (spawn)
+    multiprocessing.freeze_support()
     print("[DEBUG] Iniciando NetBR...")
     app = QApplication()
     window = MainWindow()
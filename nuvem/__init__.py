@@ -1,8 +1,21 @@
 # nuvem/__init__.py
-from .network import ping_host
 # from .speedtest import medir_velocidade
-from .config_loader import load_config
 # from .logger import setup_logger
-from .network import test_connection
-from nuvem.speedtest_worker import SpeedTest
-from .logger import log
\ No newline at end of file
+
+# Atalhos do pacote, carregados sob demanda: importar um submódulo leve (ex.: nuvem.logger)
+# não puxa a pilha de rede (asyncio, ssl, ping3), e o modo monitor (nuvem.monitor) não
+# pode importar o PySide6 que o SpeedTest usa
+_EXPORTS = {
+    "ping_host": "nuvem.network",
+    "test_connection": "nuvem.network",
+    "load_config": "nuvem.config_loader",
+    "log": "nuvem.logger",
+    "SpeedTest": "nuvem.speedtest_worker",
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,78 @@
+# nuvem/adaptive.py
+import math
+from collections import deque
+from typing import Optional, Tuple
+
+# Valores padrão da seção "adaptive" do conf.json
+DEFAULT_WINDOW = 8
+DEFAULT_MIN_SAMPLES = 4
+DEFAULT_MAX_RELATIVE_CI = 0.1
+
+# Valores críticos da t de Student (95%, bicaudal) para 1..10 graus de liberdade
+T_95 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228)
+
+CONVERGED = "converged"
+BELOW_MIN = "below_min"
+
+
+def _t_critical(df: int) -> float:
+    if df <= len(T_95):
+        return T_95[df - 1]
+    return 2.0 if df <= 30 else 1.96
+
+
+class AdaptiveController:
+    """
+    Decide, a cada amostra de vazão, se uma fase do teste pode terminar antes do prazo.
+
+    Usa o intervalo de confiança (95%) da média das últimas `window` amostras:
+    termina com CONVERGED quando a meia-largura fica abaixo de `max_relative_ci`
+    da média, e com BELOW_MIN quando o limite superior já está abaixo de `min_mbps`.
+    """
+
+    __slots__ = ("min_mbps", "min_samples", "max_relative_ci", "_samples", "verdict", "interval")
+
+    def __init__(
+        self,
+        min_mbps: Optional[float] = None,
+        window: int = DEFAULT_WINDOW,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        max_relative_ci: float = DEFAULT_MAX_RELATIVE_CI,
+    ):
+        self.min_mbps = min_mbps
+        self.min_samples = max(2, min_samples)
+        self.max_relative_ci = max_relative_ci
+        self._samples = deque(maxlen=max(self.min_samples, window))
+        self.verdict: Optional[str] = None
+        self.interval: Optional[Tuple[float, float]] = None
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], min_mbps: Optional[float] = None) -> Optional["AdaptiveController"]:
+        section = section or {}
+        if not section.get("enabled", True):
+            return None
+        return cls(
+            min_mbps=min_mbps,
+            window=int(section.get("window", DEFAULT_WINDOW)),
+            min_samples=int(section.get("min_samples", DEFAULT_MIN_SAMPLES)),
+            max_relative_ci=section.get("max_relative_ci", DEFAULT_MAX_RELATIVE_CI),
+        )
+
+    def add(self, mbps: float) -> Optional[str]:
+        """
+        Registra uma amostra (Mbps do intervalo) e devolve o veredito, se houver.
+        """
+        samples = self._samples
+        samples.append(mbps)
+        n = len(samples)
+        if n < self.min_samples:
+            return None
+        mean = sum(samples) / n
+        variance = sum((x - mean) ** 2 for x in samples) / (n - 1)
+        half_width = _t_critical(n - 1) * math.sqrt(variance / n)
+        self.interval = (max(0.0, mean - half_width), mean + half_width)
+        if self.min_mbps is not None and self.interval[1] < self.min_mbps:
+            self.verdict = BELOW_MIN
+        elif mean > 0 and half_width <= self.max_relative_ci * mean:
+            self.verdict = CONVERGED
+        return self.verdict
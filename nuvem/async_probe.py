@@ -0,0 +1,260 @@
+# nuvem/async_probe.py
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+from nuvem.latency import LatencySamples
+from nuvem.resolver import Resolver, default_resolver, run_async
+from nuvem.tls_probe import tls_handshake_probe, create_context as create_tls_context
+
+# Limite de conexões simultâneas e prazo por sonda (segundos)
+DEFAULT_CONCURRENCY = 32
+DEFAULT_TIMEOUT = 3.0
+
+# Intervalo para verificar o cancelamento enquanto as sondas rodam
+CANCEL_POLL_INTERVAL = 0.1
+
+# Uma sonda TLS faz dois handshakes (completo e retomado), cada um com o prazo `timeout`
+TLS_HANDSHAKES = 2
+
+
+def _failure(host, port, start, error, **phases) -> Dict[str, Any]:
+    elapsed_ns = time.perf_counter_ns() - start
+    result = {
+        "host": host,
+        "port": port,
+        "connected": False,
+        "elapsed_ns": elapsed_ns,
+        "elapsed_ms": round(elapsed_ns / 1_000_000, 2),
+        "error": error,
+    }
+    result.update(phases)
+    return result
+
+
+async def probe_tcp(
+    host: str,
+    port: int,
+    timeout: float = DEFAULT_TIMEOUT,
+    resolver: Optional[Resolver] = None,
+    payload: Optional[bytes] = None,
+    first_byte: bool = False,
+) -> Dict[str, Any]:
+    """
+    Tenta abrir uma conexão TCP com host:port respeitando o prazo informado.
+
+    As fases são medidas separadamente: resolução DNS (via cache do `resolver`),
+    conexão TCP e, se `payload` ou `first_byte` forem informados, o tempo até o
+    primeiro byte recebido do servidor.
+    """
+    resolver = resolver or default_resolver
+    start = time.perf_counter_ns()
+    deadline = time.monotonic() + timeout
+
+    try:
+        resolution = await asyncio.wait_for(resolver.resolve_async(host), timeout)
+    except asyncio.TimeoutError:
+        return _failure(host, port, start, "timeout na resolução DNS")
+    except OSError as e:
+        return _failure(host, port, start, f"falha na resolução DNS: {e}")
+    phases: Dict[str, Any] = {"dns_ms": resolution.dns_ms, "dns_cached": resolution.cached}
+
+    writer = None
+    reader = None
+    error = "nenhum endereço resolvido"
+    connect_start = time.perf_counter_ns()
+    for _, ip in resolution.addresses:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            error = "timeout"
+            break
+        phases["ip"] = ip
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), remaining)
+            break
+        except asyncio.TimeoutError:
+            error = "timeout"
+        except OSError as e:
+            error = str(e)
+    connect_ns = time.perf_counter_ns() - connect_start
+    phases["connect_ms"] = round(connect_ns / 1_000_000, 2)
+    if writer is None:
+        return _failure(host, port, start, error, **phases)
+
+    try:
+        if payload or first_byte:
+            fb_start = time.perf_counter_ns()
+            try:
+                if payload:
+                    writer.write(payload)
+                    await writer.drain()
+                data = await asyncio.wait_for(reader.read(1), max(0.0, deadline - time.monotonic()))
+                if data:
+                    phases["first_byte_ms"] = round((time.perf_counter_ns() - fb_start) / 1_000_000, 2)
+                else:
+                    phases["first_byte_error"] = "conexão encerrada sem dados"
+            except asyncio.TimeoutError:
+                phases["first_byte_error"] = "timeout"
+            except OSError as e:
+                phases["first_byte_error"] = str(e)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+    elapsed_ns = time.perf_counter_ns() - start
+    result = {
+        "host": host,
+        "port": port,
+        "connected": True,
+        # Latência da conexão TCP, sem a resolução DNS
+        "connect_ns": connect_ns,
+        "elapsed_ns": elapsed_ns,
+        "elapsed_ms": round(elapsed_ns / 1_000_000, 2),
+    }
+    result.update(phases)
+    return result
+
+
+def _payload(teste: dict) -> Optional[bytes]:
+    payload = teste.get("payload")
+    if payload is None:
+        return None
+    return payload.encode("utf-8") if isinstance(payload, str) else payload
+
+
+async def sample_tcp(
+    host: str,
+    port: int,
+    samples: int,
+    timeout: float = DEFAULT_TIMEOUT,
+    resolver: Optional[Resolver] = None,
+    payload: Optional[bytes] = None,
+    first_byte: bool = False,
+) -> Dict[str, Any]:
+    """
+    Abre `samples` conexões seguidas com host:port e resume as latências.
+
+    As conexões ao mesmo destino são sequenciais para não competirem entre si.
+    Só o tempo de conexão TCP entra nas amostras; o DNS é resolvido uma vez.
+    """
+    buffer = LatencySamples()
+    first_bytes = LatencySamples()
+    error = None
+    phases: Dict[str, Any] = {}
+    for _ in range(samples):
+        probe = await probe_tcp(host, port, timeout, resolver, payload, first_byte)
+        if "dns_ms" in probe and "dns_ms" not in phases:
+            phases["dns_ms"] = probe["dns_ms"]
+            phases["dns_cached"] = probe["dns_cached"]
+        if probe.get("ip"):
+            phases["ip"] = probe["ip"]
+        if probe["connected"]:
+            buffer.add(probe["connect_ns"])
+            if "first_byte_ms" in probe:
+                first_bytes.add(int(probe["first_byte_ms"] * 1_000_000))
+        else:
+            buffer.add_failure()
+            error = probe["error"]
+    latency = buffer.summary()
+    result = {
+        "host": host,
+        "port": port,
+        "connected": len(buffer) > 0,
+        "elapsed_ms": latency["p50_ms"] if latency["p50_ms"] is not None else 0.0,
+        "connect_ms": latency["p50_ms"],
+        "latency": latency,
+    }
+    result.update(phases)
+    if len(first_bytes):
+        result["first_byte_ms"] = first_bytes.summary()["p50_ms"]
+    if error:
+        result["error"] = error
+    return result
+
+
+def _tls_probe(teste: dict, timeout: float, resolver: Optional[Resolver]) -> Dict[str, Any]:
+    context = create_tls_context(verify=teste.get("tls_verify", True))
+    return tls_handshake_probe(
+        teste["host"],
+        teste["port"],
+        timeout=timeout,
+        server_hostname=teste.get("server_hostname"),
+        context=context,
+        resolver=resolver,
+    )
+
+
+async def _run_all(tests, concurrency, timeout, on_result, cancel_flag, resolver) -> List[Optional[Dict[str, Any]]]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def guarded(index: int, teste: dict):
+        async with semaphore:
+            samples = int(teste.get("samples", 1))
+            payload = _payload(teste)
+            first_byte = bool(teste.get("first_byte", False))
+            if teste.get("tls"):
+                # O handshake usa o módulo ssl bloqueante, numa thread do executor (ver run_async)
+                loop = asyncio.get_running_loop()
+                start = time.perf_counter_ns()
+                try:
+                    result = await asyncio.wait_for(
+                        loop.run_in_executor(None, _tls_probe, teste, timeout, resolver), timeout * TLS_HANDSHAKES
+                    )
+                except asyncio.TimeoutError:
+                    result = _failure(teste["host"], teste["port"], start, "timeout no handshake TLS", tls=True)
+            elif samples > 1:
+                result = await sample_tcp(
+                    teste["host"], teste["port"], samples, timeout, resolver, payload, first_byte
+                )
+            else:
+                result = await probe_tcp(teste["host"], teste["port"], timeout, resolver, payload, first_byte)
+        result["index"] = index
+        result["test"] = teste
+        return result
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tests)
+    pending = {asyncio.ensure_future(guarded(i, t)) for i, t in enumerate(tests)}
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, timeout=CANCEL_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+        )
+        for future in done:
+            result = future.result()
+            results[result["index"]] = result
+            if on_result:
+                on_result(result)
+        if pending and cancel_flag and cancel_flag():
+            for future in pending:
+                future.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            break
+    return results
+
+
+def run_probes(
+    tests: List[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel_flag: Optional[Callable[[], bool]] = None,
+    resolver: Optional[Resolver] = None,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Executa todas as sondas TCP em paralelo (limitado por `concurrency`).
+
+    Testes com `samples` > 1 abrem várias conexões e trazem a chave `latency`
+    com min/p50/p95/p99/max, desvio padrão e taxa de falhas. Todos os resultados
+    trazem `dns_ms`, `connect_ms` e, quando o teste define `payload` ou
+    `first_byte`, `first_byte_ms`. Testes com `"tls": true` medem o handshake
+    TLS completo e o retomado (ver nuvem.tls_probe).
+
+    `on_result` é chamado a cada sonda concluída, na ordem de término.
+    O retorno segue a ordem de `tests`; sondas canceladas ficam como None.
+    DNS e TLS travados não seguram o retorno (ver nuvem.resolver.run_async).
+    """
+    if not tests:
+        return []
+    workers = min(len(tests), max(1, concurrency))
+    return run_async(_run_all(tests, concurrency, timeout, on_result, cancel_flag, resolver), workers)
@@ -0,0 +1,159 @@
+# nuvem/bufferbloat.py
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from nuvem.jitter import RttSampler, DEFAULT_METHOD, DEFAULT_TIMEOUT_MS
+from nuvem.latency import LatencySamples, percentile
+
+# Valores padrão da seção "bufferbloat" do conf.json
+DEFAULT_INTERVAL_MS = 100
+DEFAULT_IDLE_SAMPLES = 10
+DEFAULT_PERCENTILE = 50
+# Aumento máximo de latência sob carga (ms) para cada nota; acima do último, "F"
+DEFAULT_GRADES = {"A+": 5, "A": 30, "B": 60, "C": 200, "D": 400}
+
+IDLE = "idle"
+LOADED_PHASES = ("download", "upload")
+
+
+def grade(delta_ms: float, thresholds: Optional[Dict[str, float]] = None) -> str:
+    """
+    Nota de bufferbloat para um aumento de latência sob carga.
+    """
+    for nota, limite in sorted((thresholds or DEFAULT_GRADES).items(), key=lambda item: item[1]):
+        if delta_ms < limite:
+            return nota
+    return "F"
+
+
+class LoadedLatencyProbe:
+    """
+    Amostra o RTT dos destinos em segundo plano, separando as amostras pela fase
+    atual do teste: ociosa (antes do download), download e upload.
+
+    A fase é trocada por `set_phase()`; com a fase None o probe fica pausado.
+    """
+
+    def __init__(
+        self,
+        targets: List[Tuple[str, Optional[int]]],
+        method: str = DEFAULT_METHOD,
+        interval_ms: float = DEFAULT_INTERVAL_MS,
+        timeout_ms: float = DEFAULT_TIMEOUT_MS,
+        idle_samples: int = DEFAULT_IDLE_SAMPLES,
+        percentile: int = DEFAULT_PERCENTILE,
+        grades: Optional[Dict[str, float]] = None,
+        cancel_flag: Optional[Callable[[], bool]] = None,
+    ):
+        self.sampler = RttSampler(targets, method, timeout_ms)
+        self.interval = interval_ms / 1000
+        self.idle_samples = max(1, idle_samples)
+        self.percentile = percentile
+        self.grades = grades or DEFAULT_GRADES
+        self.cancel_flag = cancel_flag
+        self.samples: Dict[str, Dict[str, LatencySamples]] = {
+            phase: {key: LatencySamples() for key in self.sampler.targets} for phase in (IDLE,) + LOADED_PHASES
+        }
+        self._phase: Optional[str] = None
+        self._idle_ticks = 0
+        self._idle_done = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bufferbloat-probe", daemon=True)
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], targets, cancel_flag=None) -> Optional["LoadedLatencyProbe"]:
+        section = section or {}
+        if not section.get("enabled", True) or not targets:
+            return None
+        return cls(
+            targets,
+            method=section.get("method", DEFAULT_METHOD),
+            interval_ms=section.get("interval_ms", DEFAULT_INTERVAL_MS),
+            timeout_ms=section.get("timeout_ms", DEFAULT_TIMEOUT_MS),
+            idle_samples=int(section.get("idle_samples", DEFAULT_IDLE_SAMPLES)),
+            percentile=int(section.get("percentile", DEFAULT_PERCENTILE)),
+            grades=section.get("grades"),
+            cancel_flag=cancel_flag,
+        )
+
+    def _stopped(self) -> bool:
+        return self._stop.is_set() or bool(self.cancel_flag and self.cancel_flag())
+
+    def _run(self):
+        try:
+            next_tick = time.monotonic()
+            while not self._stopped():
+                phase = self._phase
+                if phase is not None:
+                    for key, rtt in self.sampler.tick().items():
+                        if rtt is None:
+                            self.samples[phase][key].add_failure()
+                        else:
+                            self.samples[phase][key].add(rtt)
+                    if phase == IDLE:
+                        self._idle_ticks += 1
+                        if self._idle_ticks >= self.idle_samples:
+                            self._idle_done.set()
+                # Agendamento absoluto, como no jitter; se atrasou, segue do instante atual
+                next_tick = max(next_tick + self.interval, time.monotonic())
+                self._stop.wait(next_tick - time.monotonic())
+        finally:
+            self._idle_done.set()
+            self.sampler.close()
+
+    def start(self) -> "LoadedLatencyProbe":
+        self._thread.start()
+        return self
+
+    def measure_idle(self, timeout: Optional[float] = None):
+        """
+        Coleta as amostras da linha de base (link ocioso) e pausa.
+        """
+        self._phase = IDLE
+        self._idle_done.wait(timeout)
+        self._phase = None
+
+    def set_phase(self, phase: Optional[str]):
+        self._phase = phase
+
+    def stop(self):
+        self._phase = None
+        self._stop.set()
+        self._thread.join(self.sampler.timeout + self.interval)
+
+    def _reference_ms(self, samples: LatencySamples) -> Optional[float]:
+        # Percentil usado na comparação ociosa x sob carga
+        values = sorted(samples.values_ms())
+        return round(percentile(values, self.percentile), 3) if values else None
+
+    def summary(self) -> Dict:
+        """
+        Latência ociosa e sob carga (p50/p95) por destino, o pior aumento e a nota.
+        """
+        destinos = []
+        pior = None
+        for key in self.sampler.targets:
+            item = {"target": key}
+            for phase in (IDLE,) + LOADED_PHASES:
+                resumo = self.samples[phase][key].summary()
+                item[phase] = {field: resumo[field] for field in ("samples", "p50_ms", "p95_ms", "failure_ratio")}
+            idle = self._reference_ms(self.samples[IDLE][key])
+            for phase in LOADED_PHASES:
+                loaded = self._reference_ms(self.samples[phase][key])
+                if idle is None or loaded is None:
+                    continue
+                delta = round(loaded - idle, 2)
+                item[phase]["delta_ms"] = delta
+                if pior is None or delta > pior[0]:
+                    pior = (delta, key, phase)
+            if key in self.sampler.errors:
+                item["error"] = self.sampler.errors[key]
+            destinos.append(item)
+
+        result = {"percentile": self.percentile, "targets": destinos, "delta_ms": None, "grade": None}
+        if pior is not None:
+            delta, key, phase = pior
+            result.update({"delta_ms": delta, "worst_target": key, "worst_phase": phase,
+                           "grade": grade(max(0.0, delta), self.grades)})
+        return result
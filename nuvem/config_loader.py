@@ -1,15 +1,134 @@
 import json
 import os
+import sys
+import threading
 
+from nuvem.config_model import AppConfig
+from nuvem.logger import log
 
-def load_config():
-    # Carrega o conf.json do diretório do usuário
+
+def _bundled_config_path():
+    # conf.json empacotado (PyInstaller) ou da pasta config/ do projeto
+    base_path = getattr(sys, '_MEIPASS', os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    return os.path.join(base_path, "config", "conf.json")
+
+
+class FrozenDict(dict):
+    """
+    dict somente leitura: o snapshot do conf.json é compartilhado entre threads e
+    janelas, então ninguém pode alterá-lo por engano. Continua sendo um dict para
+    isinstance, json.dumps e dict(...) (cópia mutável).
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Configuração somente leitura; use dict(...) para uma cópia alterável.")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # pickle/deepcopy (ex.: modo "processes" do motor nativo) recriam pelo construtor
+        return (FrozenDict, (dict(self),))
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def default_config_path():
+    # conf.json do diretório do usuário; sem ele, o do bundle
     user_dir = os.path.expandvars(r"%userprofile%/.nuvem")
     config_path = os.path.join(user_dir, "conf.json")
+    if not os.path.exists(config_path) and os.path.exists(_bundled_config_path()):
+        config_path = _bundled_config_path()
+    return config_path
+
+
+class ConfigService:
+    """
+    Leitura única do conf.json, validada e guardada por (caminho, mtime, tamanho).
+
+    `get()` custa um os.stat enquanto o arquivo não muda e devolve sempre o mesmo
+    snapshot somente leitura (FrozenDict, listas viram tuplas); editar o arquivo
+    gera um snapshot novo na chamada seguinte. Um arquivo inválido levanta o mesmo
+    erro de `load_config` até ser corrigido, sem ser relido a cada chamada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = {}
+        # Modelo tipado (AppConfig) do último snapshot de cada caminho
+        self._models = {}
+        # Último erro já registrado por caminho, para não repetir a cada ciclo
+        self._reported = {}
+
+    def get(self, config_path=None):
+        config_path = config_path or default_config_path()
+        try:
+            stat = os.stat(config_path)
+        except OSError:
+            raise FileNotFoundError(f"Arquivo de configuração não encontrado: {config_path}")
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(config_path)
+            if cached is None or cached[0] != key:
+                try:
+                    cached = (key, _freeze(_parse(config_path)))
+                except ValueError as e:
+                    cached = (key, e)
+                self._cache[config_path] = cached
+        if isinstance(cached[1], Exception):
+            raise cached[1]
+        return cached[1]
+
+    def model(self, config_path=None) -> AppConfig:
+        """
+        O snapshot compilado em AppConfig (destinos e requisitos tipados), montado
+        uma vez por versão do arquivo.
+        """
+        snapshot = self.get(config_path)
+        with self._lock:
+            cached = self._models.get(config_path)
+            if cached is None or cached.raw is not snapshot:
+                cached = AppConfig.from_dict(snapshot)
+                self._models[config_path] = cached
+        return cached
+
+    def changed(self, snapshot, config_path=None):
+        """
+        Para laços longos (modo monitor): o snapshot novo se o arquivo mudou desde
+        `snapshot`, senão None. Um conf.json que passou a ser inválido é registrado
+        no log e ignorado, mantendo o último válido.
+        """
+        try:
+            novo = self.get(config_path)
+        except (FileNotFoundError, ValueError) as e:
+            if self._reported.get(config_path) != str(e):
+                self._reported[config_path] = str(e)
+                log(f"conf.json alterado, mas inválido; mantendo a configuração anterior: {e}")
+            return None
+        self._reported.pop(config_path, None)
+        return None if novo is snapshot else novo
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._models.clear()
+
+
+default_config = ConfigService()
+
+
+def load_config(config_path=None):
+    # Carrega o conf.json do diretório do usuário (ou do caminho informado), uma vez por versão do arquivo
+    return default_config.get(config_path)
 
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Arquivo de configuração não encontrado: {config_path}")
 
+def _parse(config_path):
     with open(config_path, "r", encoding="utf-8") as f:
         try:
             data = json.load(f)
@@ -22,6 +141,10 @@ def load_config():
     for test in data["tests"]:
         if not all(k in test for k in ("host", "port", "required")):
             raise ValueError(f"Teste mal formatado: {test}")
+        if "samples" in test and (not isinstance(test["samples"], int) or test["samples"] < 1):
+            raise ValueError(f"Teste com 'samples' inválido: {test}")
+        if "max_p95_ms" in test and not isinstance(test["max_p95_ms"], (int, float)):
+            raise ValueError(f"Teste com 'max_p95_ms' inválido: {test}")
 
     # Validação dos testes de velocidade
     if "speedtest" not in data or not isinstance(data["speedtest"], list):
@@ -0,0 +1,151 @@
+# nuvem/config_model.py
+"""
+Modelo tipado do conf.json, montado uma vez por versão do arquivo (ver ConfigService.model).
+
+Os laços de teste leem atributos em vez de procurar chaves em dicts, e os requisitos
+de "speedtest" viram um limite por métrica: avaliar um resultado é uma passada
+pelas métricas configuradas, que devolve todas as violações.
+
+As dataclasses usam slots=True, que exige Python 3.10+ (o mínimo do readme).
+"""
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+# Métricas de "speedtest" com mínimo (Mbps) e com máximo (ms), e os padrões de antes
+MIN_METRICS = ("download", "upload")
+MAX_METRICS = ("ping", "jitter")
+DEFAULT_MIN_MBPS = 0
+DEFAULT_MAX_MS = 9999
+
+_LABELS = {"download": "Download", "upload": "Upload", "ping": "Ping", "jitter": "Jitter"}
+
+
+@dataclass(frozen=True, slots=True)
+class Threshold:
+    metric: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    description: str = ""
+
+    def violation(self, value: Optional[float]) -> Optional[str]:
+        label = _LABELS.get(self.metric, self.metric)
+        if value is None:
+            # Métrica obrigatória que não pôde ser medida (ex.: jitter sem amostras)
+            return f"{label} não medido"
+        if self.minimum is not None and value < self.minimum:
+            return f"{label} abaixo do mínimo: {value} Mbps < {self.minimum} Mbps"
+        if self.maximum is not None and value > self.maximum:
+            return f"{label} acima do máximo: {value} ms > {self.maximum} ms"
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class SpeedRequirements:
+    """
+    Requisitos obrigatórios de "speedtest", já resolvidos por métrica.
+
+    Se houver mais de um requisito para a mesma métrica, vale o mais restritivo
+    (maior mínimo, menor máximo). Requisitos com "required": false e tipos
+    desconhecidos não entram, como antes. `by_metric` é derivado de `limits`
+    (somente leitura, fora da comparação e do hash).
+    """
+    limits: Tuple[Threshold, ...] = ()
+    by_metric: Mapping[str, Threshold] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "by_metric", MappingProxyType({t.metric: t for t in self.limits}))
+
+    def __reduce__(self):
+        # pickle/deepcopy recriam pelo construtor (o MappingProxyType não é serializável)
+        return (SpeedRequirements, (self.limits,))
+
+    @classmethod
+    def from_list(cls, requirements) -> "SpeedRequirements":
+        limits: Dict[str, Threshold] = {}
+        for req in requirements or ():
+            tipo = req.get("type")
+            if not req.get("required") or tipo not in MIN_METRICS + MAX_METRICS:
+                continue
+            atual = limits.get(tipo)
+            if tipo in MIN_METRICS:
+                minimo = req.get("min_mbps", DEFAULT_MIN_MBPS)
+                if atual is None or minimo > atual.minimum:
+                    limits[tipo] = Threshold(tipo, minimum=minimo, description=req.get("description", ""))
+            else:
+                maximo = req.get("max_ms", DEFAULT_MAX_MS)
+                if atual is None or maximo < atual.maximum:
+                    limits[tipo] = Threshold(tipo, maximum=maximo, description=req.get("description", ""))
+        return cls(tuple(limits.values()))
+
+    def min_mbps(self, phase: str) -> Optional[float]:
+        # Mínimo exigido para a fase (download/upload), ou None sem requisito obrigatório
+        limite = self.by_metric.get(phase)
+        return limite.minimum if limite else None
+
+    def evaluate(self, result: dict) -> List[str]:
+        """
+        Todas as violações do resultado, na ordem do conf.json (lista vazia = aprovado).
+        """
+        erros = []
+        for limite in self.limits:
+            erro = limite.violation(result.get(limite.metric, 0))
+            if erro:
+                erros.append(erro)
+        return erros
+
+
+@dataclass(frozen=True, slots=True)
+class ProbeTarget:
+    """
+    Um destino de "tests". `spec` guarda a entrada original do conf.json, com as
+    opções da sonda (tls, payload, samples...) lidas por nuvem.async_probe. Ela
+    entra na comparação, mas não no hash (o snapshot do ConfigService é um
+    FrozenDict, que não é hashable).
+    """
+    host: str
+    port: int
+    required: bool
+    description: str
+    max_p95_ms: Optional[float] = None
+    spec: Mapping = field(default_factory=dict, repr=False, hash=False)
+
+    @classmethod
+    def from_dict(cls, teste: Mapping) -> "ProbeTarget":
+        host = teste["host"]
+        port = int(teste["port"])
+        return cls(
+            host=host,
+            port=port,
+            required=bool(teste.get("required")),
+            description=teste.get("description", f"{host}:{port}"),
+            max_p95_ms=teste.get("max_p95_ms"),
+            spec=teste,
+        )
+
+
+def compile_targets(tests) -> Tuple[ProbeTarget, ...]:
+    # Entradas que não são objetos são ignoradas, como antes
+    return tuple(
+        t if isinstance(t, ProbeTarget) else ProbeTarget.from_dict(t)
+        for t in tests or () if isinstance(t, (dict, ProbeTarget))
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    """
+    conf.json compilado: destinos e requisitos tipados; as demais seções seguem
+    em `raw` (o snapshot somente leitura do ConfigService, fora do hash).
+    """
+    targets: Tuple[ProbeTarget, ...]
+    requirements: SpeedRequirements
+    raw: Mapping = field(hash=False)
+
+    @classmethod
+    def from_dict(cls, config: Mapping) -> "AppConfig":
+        return cls(
+            targets=compile_targets(config.get("tests", ())),
+            requirements=SpeedRequirements.from_list(config.get("speedtest", ())),
+            raw=config,
+        )
@@ -0,0 +1,272 @@
+# nuvem/history.py
+"""
+Histórico de resultados em SQLite, consolidado a partir do JSONL de nuvem.results.
+
+Uso: python -m nuvem.history --metric connect_ms --target Prod [--days 30] [--percentile 95] [--trend]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from nuvem.latency import percentile as _percentile
+from nuvem.results import METRICS, default_results_path
+
+# Colunas de texto guardadas de cada registro (o registro completo fica no JSONL)
+TEXT_COLUMNS = ("session", "source", "kind", "phase", "host", "description", "verdict")
+
+# Linhas inseridas por transação durante a consolidação
+INGEST_BATCH = 5000
+
+DAY_S = 86400
+
+
+def default_history_path() -> str:
+    return os.path.join(os.path.dirname(default_results_path()), "history.db")
+
+
+class HistoryStore:
+    """
+    Consulta de tendências sobre os resultados gravados.
+
+    Cada registro vira uma linha com as métricas numéricas em colunas e índice
+    por (host, instante), então "p95 da conexão ao Prod nos últimos 30 dias"
+    lê só as linhas daquele host e período. `ingest()` lê apenas o trecho do
+    JSONL acrescentado desde a última consolidação (posição guardada no banco).
+    """
+
+    def __init__(self, path: Optional[str] = None, results_path: Optional[str] = None):
+        self.path = path or default_history_path()
+        self.results_path = results_path or default_results_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path)
+        self._create()
+
+    @classmethod
+    def from_config(cls, section: Optional[dict]) -> "HistoryStore":
+        section = section or {}
+        return cls(section.get("db_path") or None, section.get("results_path") or None)
+
+    def _create(self):
+        colunas = ", ".join([f"{c} TEXT" for c in TEXT_COLUMNS] + [f"{m} REAL" for m in METRICS])
+        self._db.executescript(f"""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS results (ts REAL NOT NULL, port INTEGER, {colunas});
+            CREATE INDEX IF NOT EXISTS results_host_ts ON results (host, ts);
+            CREATE TABLE IF NOT EXISTS targets (host TEXT, port INTEGER, description TEXT,
+                                                PRIMARY KEY (host, port, description));
+            CREATE TABLE IF NOT EXISTS ingest_state (path TEXT PRIMARY KEY, offset INTEGER, ts REAL);
+        """)
+
+    def close(self):
+        self._db.close()
+
+    # Consolidação ------------------------------------------------------------
+
+    def ingest(self) -> int:
+        """
+        Acrescenta ao banco os registros novos do JSONL. Retorna quantos entraram.
+        """
+        if not os.path.exists(self.results_path):
+            return 0
+        row = self._db.execute("SELECT offset FROM ingest_state WHERE path = ?", (self.results_path,)).fetchone()
+        offset = row[0] if row else 0
+        if os.path.getsize(self.results_path) < offset:
+            # Arquivo recriado: lê desde o início
+            offset = 0
+        colunas = ("ts", "port") + TEXT_COLUMNS + METRICS
+        insert = f"INSERT INTO results ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+        total = 0
+        batch = []
+        targets = set()
+        with open(self.results_path, "rb") as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                # Linha sem "\n" ainda está sendo escrita: fica para a próxima consolidação
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                    values = [float(record["ts"]), record.get("port")]
+                    values += [record.get(c) for c in TEXT_COLUMNS]
+                    values += [_number(record.get(m)) for m in METRICS]
+                except (ValueError, KeyError, TypeError):
+                    continue
+                batch.append(values)
+                if record.get("host"):
+                    targets.add((record["host"], record.get("port"), record.get("description")))
+                if len(batch) >= INGEST_BATCH:
+                    total += self._commit(insert, batch, targets, offset)
+                    batch = []
+                    targets = set()
+        total += self._commit(insert, batch, targets, offset)
+        return total
+
+    def compact_results(self, max_age_days: float, max_mb: float) -> int:
+        """
+        Corta do início do JSONL as linhas com mais de `max_age_days` dias e, se ainda
+        passar de `max_mb`, as mais antigas até caber. Antes do corte consolida o
+        arquivo, e só sai o que já está no banco. Devolve quantos bytes saíram.
+        """
+        path = self.results_path
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        cutoff = time.time() - max_age_days * DAY_S
+        max_bytes = int(max_mb * 1024 * 1024)
+        with open(path, "rb") as f:
+            first = f.readline()
+        # O arquivo é cronológico: a primeira linha diz se há algo vencido
+        if size <= max_bytes and _line_ts(first) >= cutoff:
+            return 0
+        self.ingest()
+        row = self._db.execute("SELECT offset FROM ingest_state WHERE path = ?", (path,)).fetchone()
+        consolidado = row[0] if row else 0
+        temporario = path + ".tmp"
+        with open(path, "rb") as f:
+            inicio = 0
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n") or _line_ts(line) >= cutoff:
+                    break
+                inicio += len(line)
+            if size - inicio > max_bytes:
+                # Primeira linha inteira dentro dos últimos max_bytes
+                f.seek(size - max_bytes)
+                f.readline()
+                inicio = max(inicio, f.tell())
+            inicio = min(inicio, consolidado)
+            if inicio <= 0:
+                return 0
+            f.seek(inicio)
+            with open(temporario, "wb") as saida:
+                shutil.copyfileobj(f, saida, 1024 * 1024)
+        os.replace(temporario, path)
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO ingest_state VALUES (?, ?, ?)", (path, consolidado - inicio, time.time())
+            )
+        return inicio
+
+    def _commit(self, insert, batch, targets, offset) -> int:
+        with self._db:
+            self._db.executemany(insert, batch)
+            self._db.executemany("INSERT OR IGNORE INTO targets VALUES (?, ?, ?)", list(targets))
+            self._db.execute(
+                "INSERT OR REPLACE INTO ingest_state VALUES (?, ?, ?)", (self.results_path, offset, time.time())
+            )
+        return len(batch)
+
+    # Consultas ---------------------------------------------------------------
+
+    def targets(self, target: str) -> List[tuple]:
+        """
+        (host, porta) que casam com `target`: nome exato do host ou parte da descrição ("Prod").
+        """
+        return self._db.execute(
+            "SELECT DISTINCT host, port FROM targets WHERE host = ? OR description LIKE ?", (target, f"%{target}%")
+        ).fetchall()
+
+    def values(self, metric: str, target: Optional[str] = None, days: float = 30, kind: Optional[str] = None,
+               until: Optional[float] = None) -> List[tuple]:
+        """
+        (instante, valor) de `metric` no período, em ordem de tempo.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Métrica desconhecida: {metric}")
+        until = until or time.time()
+        since = until - days * DAY_S
+        filtros = [f"{metric} IS NOT NULL"]
+        params: list = []
+        if kind:
+            filtros.append("kind = ?")
+            params.append(kind)
+        if target is None:
+            sql = f"SELECT ts, {metric} FROM results WHERE ts >= ? AND ts <= ? AND {' AND '.join(filtros)}"
+            return self._db.execute(sql + " ORDER BY ts", [since, until] + params).fetchall()
+        linhas = []
+        # Uma consulta por destino, para cada uma usar o índice (host, ts)
+        for host, port in self.targets(target):
+            sql = (f"SELECT ts, {metric} FROM results WHERE host = ? AND ts >= ? AND ts <= ? "
+                   f"AND port IS ? AND {' AND '.join(filtros)}")
+            linhas.extend(self._db.execute(sql, [host, since, until, port] + params).fetchall())
+        linhas.sort()
+        return linhas
+
+    def percentile(self, metric: str, pct: float = 95, target: Optional[str] = None, days: float = 30,
+                   kind: Optional[str] = None) -> Optional[float]:
+        ordered = sorted(v for _, v in self.values(metric, target, days, kind))
+        return round(_percentile(ordered, pct), 3) if ordered else None
+
+    def trend(self, metric: str, target: Optional[str] = None, days: float = 30, kind: Optional[str] = None,
+              bucket_s: float = DAY_S, pct: float = 95) -> List[Dict]:
+        """
+        Por intervalo de `bucket_s` (padrão: dia): amostras, p50 e o percentil `pct`.
+        """
+        buckets: Dict[int, List[float]] = {}
+        for ts, value in self.values(metric, target, days, kind):
+            buckets.setdefault(int(ts // bucket_s), []).append(value)
+        tendencia = []
+        for bucket in sorted(buckets):
+            ordered = sorted(buckets[bucket])
+            tendencia.append({
+                "start": bucket * bucket_s,
+                "samples": len(ordered),
+                "p50": round(_percentile(ordered, 50), 3),
+                f"p{pct:g}": round(_percentile(ordered, pct), 3),
+            })
+        return tendencia
+
+
+def _line_ts(line: bytes) -> float:
+    # Instante de uma linha do JSONL; linha ilegível não vence por idade (o limite de tamanho ainda vale)
+    try:
+        return float(json.loads(line)["ts"])
+    except (ValueError, KeyError, TypeError):
+        return float("inf")
+
+
+def _number(value) -> Optional[float]:
+    # bool é subclasse de int: o type() exato o deixa de fora
+    return value if type(value) in (int, float) else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o histórico de resultados do Nuvem.Test.")
+    parser.add_argument("--metric", default="connect_ms", choices=METRICS)
+    parser.add_argument("--target", help="host ou parte da descrição do teste (ex.: Prod)")
+    parser.add_argument("--kind", help="probe, ping, throughput ou speedtest")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--percentile", type=float, default=95)
+    parser.add_argument("--trend", action="store_true", help="um valor por dia")
+    parser.add_argument("--db", help="caminho do history.db")
+    parser.add_argument("--results", help="caminho do results.jsonl")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.db, args.results)
+    inicio = time.perf_counter()
+    novos = store.ingest()
+    consolidado = time.perf_counter()
+    if args.trend:
+        linhas = store.trend(args.metric, args.target, args.days, args.kind, pct=args.percentile)
+        for item in linhas:
+            dia = time.strftime("%Y-%m-%d", time.localtime(item["start"]))
+            print(f"{dia}  {item['samples']:>6} amostras  p50 {item['p50']}  p{args.percentile:g} "
+                  f"{item[f'p{args.percentile:g}']}")
+    else:
+        valor = store.percentile(args.metric, args.percentile, args.target, args.days, args.kind)
+        print(f"p{args.percentile:g} de {args.metric} ({args.target or 'todos'}, {args.days:g} dias): {valor}")
+    fim = time.perf_counter()
+    print(f"({novos} registro(s) novo(s) consolidado(s) em {(consolidado - inicio) * 1000:.1f} ms; "
+          f"consulta em {(fim - consolidado) * 1000:.1f} ms)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+# nuvem/icmp.py
+import itertools
+import os
+import select
+import socket
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+import ping3
+
+from nuvem.latency import LatencySamples
+from nuvem.resolver import Resolver, default_resolver
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+# Por família: (tipo do pedido, tipo da resposta, protocolo do socket)
+_ECHO = {
+    socket.AF_INET: (ICMP_ECHO_REQUEST, ICMP_ECHO_REPLY, socket.IPPROTO_ICMP),
+    socket.AF_INET6: (ICMPV6_ECHO_REQUEST, ICMPV6_ECHO_REPLY, socket.IPPROTO_ICMPV6),
+}
+PAYLOAD = b"nuvem.test-ping!" * 2  # 32 bytes, como o ping do Windows
+
+# Sequências globais: várias chamadas no mesmo processo não colidem
+_sequence = itertools.count(1)
+
+
+class PingResult:
+    """
+    Resultado de ping para um host: amostras de RTT e perdas.
+    """
+
+    __slots__ = ("host", "ip", "sent", "received", "rtt", "method", "error")
+
+    def __init__(self, host: str, ip: Optional[str] = None):
+        self.host = host
+        self.ip = ip
+        self.sent = 0
+        self.received = 0
+        self.rtt = LatencySamples()
+        self.method = None
+        self.error = None
+
+    @property
+    def loss(self) -> float:
+        return round(1 - self.received / self.sent, 4) if self.sent else 1.0
+
+    @property
+    def ok(self) -> bool:
+        return self.received > 0
+
+    def summary(self) -> Dict:
+        result = {
+            "host": self.host,
+            "ip": self.ip,
+            "sent": self.sent,
+            "received": self.received,
+            "loss": self.loss,
+            "method": self.method,
+            "rtt": self.rtt.summary(),
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _family(ip: str) -> int:
+    return socket.AF_INET6 if ":" in ip else socket.AF_INET
+
+
+def _build_echo(identifier: int, sequence: int, family: int = socket.AF_INET) -> bytes:
+    request = _ECHO[family][0]
+    header = struct.pack("!BBHHH", request, 0, 0, identifier, sequence)
+    # No ICMPv6 o checksum cobre o pseudo-cabeçalho IPv6 e é preenchido pelo kernel
+    checksum = _checksum(header + PAYLOAD) if family == socket.AF_INET else 0
+    return struct.pack("!BBHHH", request, 0, checksum, identifier, sequence) + PAYLOAD
+
+
+def _parse_reply(packet: bytes, family: int = socket.AF_INET) -> Optional[Tuple[int, int]]:
+    # Sockets raw IPv4 (e datagram no macOS) entregam o cabeçalho IP junto; os ICMPv6 não
+    if family == socket.AF_INET and packet and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", packet[:8])
+    if icmp_type != _ECHO[family][1]:
+        return None
+    return identifier, sequence
+
+
+def open_icmp_socket(family: int = socket.AF_INET) -> Tuple[socket.socket, str]:
+    """
+    Abre um socket ICMP (ou ICMPv6) sem privilégios (datagram) ou, se o kernel não permitir, raw.
+    """
+    protocol = _ECHO[family][2]
+    try:
+        return socket.socket(family, socket.SOCK_DGRAM, protocol), "dgram"
+    except OSError:
+        pass
+    return socket.socket(family, socket.SOCK_RAW, protocol), "raw"
+
+
+def _resolve_ip(host: str, resolver: Resolver) -> str:
+    # IPv4 quando houver; senão IPv6
+    addresses = resolver.resolve(host).addresses
+    for wanted in (socket.AF_INET, socket.AF_INET6):
+        for family, ip in addresses:
+            if family == wanted:
+                return ip
+    raise OSError(f"sem endereço IPv4/IPv6 para {host}")
+
+
+def _ping_socket(sockets: Dict[int, Tuple[socket.socket, str]], results: Dict[str, PingResult], count: int,
+                 timeout: float, interval: float):
+    # Um socket por família, atendidos no mesmo select. No socket datagram o kernel troca o
+    # identificador pela porta local e já filtra as respostas
+    identifier = os.getpid() & 0xFFFF
+    for sock, _ in sockets.values():
+        sock.setblocking(False)
+    targets = [r for r in results.values() if r.ip and _family(r.ip) in sockets]
+    readers = [sock for sock, _ in sockets.values()]
+
+    for round_index in range(count):
+        if round_index and interval > 0:
+            time.sleep(interval)
+        pending: Dict[Tuple[int, int], Tuple[PingResult, int]] = {}
+        for result in targets:
+            family = _family(result.ip)
+            sequence = next(_sequence) & 0xFFFF
+            packet = _build_echo(identifier, sequence, family)
+            try:
+                sockets[family][0].sendto(packet, (result.ip, 0))
+            except OSError as e:
+                result.sent += 1
+                result.error = str(e)
+                continue
+            pending[(family, sequence)] = (result, time.perf_counter_ns())
+            result.sent += 1
+
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(readers, [], [], remaining)
+            if not readable:
+                break
+            received_ns = time.perf_counter_ns()
+            for sock in readable:
+                try:
+                    packet, address = sock.recvfrom(2048)
+                except BlockingIOError:
+                    continue
+                family = sock.family
+                parsed = _parse_reply(packet, family)
+                if parsed is None:
+                    continue
+                reply_id, sequence = parsed
+                if sockets[family][1] == "raw" and reply_id != identifier:
+                    continue  # resposta de outro processo
+                entry = pending.get((family, sequence))
+                if entry is None or entry[0].ip != address[0]:
+                    continue
+                del pending[(family, sequence)]
+                result, sent_ns = entry
+                result.received += 1
+                result.rtt.add(received_ns - sent_ns)
+
+
+def _ping3_fallback(results: Dict[str, PingResult], count: int, timeout: float, interval: float):
+    def run(result: PingResult):
+        result.method = "ping3"
+        for round_index in range(count):
+            if round_index and interval > 0:
+                time.sleep(interval)
+            result.sent += 1
+            try:
+                rtt = ping3.ping(result.ip, timeout=timeout, unit="ms")
+            except Exception as e:
+                result.error = str(e)
+                continue
+            if rtt is None or rtt is False:
+                continue
+            result.received += 1
+            result.rtt.add(int(rtt * 1_000_000))
+
+    targets = [r for r in results.values() if r.ip]
+    if not targets:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(targets), 16)) as executor:
+        list(executor.map(run, targets))
+
+
+def ping_many(
+    hosts: Iterable[str],
+    count: int = 1,
+    timeout: float = 1.0,
+    interval: float = 0.0,
+    resolver: Optional[Resolver] = None,
+) -> Dict[str, PingResult]:
+    """
+    Envia `count` echos ICMP para cada host sobre um único socket por família
+    (ICMPv6 para destinos só IPv6) e casa as respostas por identificador/sequência.
+    Sem permissão para sockets ICMP IPv4, recorre ao ping3.
+    """
+    resolver = resolver or default_resolver
+    results: Dict[str, PingResult] = {}
+    for host in hosts:
+        result = PingResult(host)
+        try:
+            result.ip = _resolve_ip(host, resolver)
+        except OSError as e:
+            result.error = f"falha na resolução DNS: {e}"
+        results[host] = result
+
+    sockets: Dict[int, Tuple[socket.socket, str]] = {}
+    for family in {_family(r.ip) for r in results.values() if r.ip}:
+        try:
+            sockets[family] = open_icmp_socket(family)
+        except OSError:
+            pass
+    sem_socket = {}
+    for host, result in results.items():
+        if not result.ip:
+            continue
+        family = _family(result.ip)
+        if family in sockets:
+            result.method = sockets[family][1]
+        elif family == socket.AF_INET:
+            sem_socket[host] = result
+        else:
+            # O ping3 só faz ICMP IPv4
+            result.method = "ping3"
+            result.error = "sem permissão para sockets ICMPv6"
+
+    try:
+        if sockets:
+            _ping_socket(sockets, results, count, timeout, interval)
+    finally:
+        for sock, _ in sockets.values():
+            sock.close()
+    _ping3_fallback(sem_socket, count, timeout, interval)
+    return results
+
+
+def ping(host: str, count: int = 1, timeout: float = 1.0, interval: float = 0.0) -> PingResult:
+    return ping_many([host], count, timeout, interval)[host]
@@ -0,0 +1,293 @@
+# nuvem/jitter.py
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from nuvem import icmp
+from nuvem.latency import LatencySamples
+from nuvem.resolver import default_resolver
+
+# Valores padrão da seção "jitter" do conf.json
+DEFAULT_SAMPLES = 20
+DEFAULT_INTERVAL_MS = 50
+DEFAULT_TIMEOUT_MS = 1000
+DEFAULT_METHOD = "tcp"
+METHODS = ("tcp", "icmp", "udp")
+
+
+def rfc3550_jitter(rtts_ms) -> float:
+    """
+    Jitter de chegada conforme a RFC 3550 (6.4.1): J += (|D| - J) / 16,
+    com D sendo a variação entre RTTs consecutivos.
+    """
+    jitter = 0.0
+    for previous, current in zip(rtts_ms, rtts_ms[1:]):
+        jitter += (abs(current - previous) - jitter) / 16
+    return jitter
+
+
+def mean_deviation(rtts_ms) -> float:
+    """
+    Desvio médio absoluto das amostras em relação à média.
+    """
+    if not rtts_ms:
+        return 0.0
+    mean = sum(rtts_ms) / len(rtts_ms)
+    return sum(abs(v - mean) for v in rtts_ms) / len(rtts_ms)
+
+
+class JitterResult:
+    """
+    Amostras de RTT de um destino, na ordem de envio, e as perdas.
+    """
+
+    __slots__ = ("host", "port", "samples", "sent", "error")
+
+    def __init__(self, host: str, port: Optional[int]):
+        self.host = host
+        self.port = port
+        self.samples = LatencySamples()
+        self.sent = 0
+        self.error = None
+
+    @property
+    def loss(self) -> float:
+        return round(self.samples.failures / self.sent, 4) if self.sent else 0.0
+
+    def summary(self) -> Dict:
+        rtts = self.samples.values_ms()
+        result = {
+            "host": self.host,
+            "port": self.port,
+            "sent": self.sent,
+            "received": len(self.samples),
+            "loss": self.loss,
+            "jitter_ms": round(rfc3550_jitter(rtts), 3),
+            "mean_deviation_ms": round(mean_deviation(rtts), 3),
+            "rtt": self.samples.summary(),
+        }
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _tcp_sample(host: str, port: int, timeout: float) -> Optional[int]:
+    # Só a conexão é medida; o nome vem do cache do resolvedor
+    ip = default_resolver.resolve(host).ip
+    start = time.perf_counter_ns()
+    with socket.create_connection((ip, port), timeout=timeout):
+        return time.perf_counter_ns() - start
+
+
+class _UdpEcho:
+    """
+    Cliente de um respondedor UDP echo (RFC 862): casa a resposta pela sequência.
+    """
+
+    def __init__(self, host: str, port: int):
+        # Família do socket pelo endereço resolvido (o resolvedor pode devolver IPv6)
+        family, ip = default_resolver.resolve(host).addresses[0]
+        self.address = (ip, port)
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.token = os.getpid() & 0xFFFFFFFF
+        self.sequence = 0
+
+    def sample(self, timeout: float) -> Optional[int]:
+        self.sequence += 1
+        packet = struct.pack("!II", self.token, self.sequence)
+        start = time.perf_counter_ns()
+        self.sock.sendto(packet, self.address)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if not readable:
+                return None
+            try:
+                data = self.sock.recv(64)
+            except (BlockingIOError, ConnectionError):
+                continue
+            if data[:8] == packet:
+                return time.perf_counter_ns() - start
+
+    def close(self):
+        self.sock.close()
+
+
+class RttSampler:
+    """
+    Mede um RTT de cada destino por chamada de `tick()`, via conexão TCP, echo ICMP
+    ou respondedor UDP echo. Usado pelo jitter e pela latência sob carga.
+    """
+
+    def __init__(self, targets: List[Tuple[str, Optional[int]]], method: str = DEFAULT_METHOD,
+                 timeout_ms: float = DEFAULT_TIMEOUT_MS):
+        if method not in METHODS:
+            raise ValueError(f"Método de jitter inválido: {method}")
+        self.method = method
+        self.timeout = timeout_ms / 1000
+        self.targets = {f"{host}:{port}" if port else host: (host, port) for host, port in targets}
+        self.errors: Dict[str, str] = {}
+        self._udp_clients: Dict[str, _UdpEcho] = {}
+        self._executor = None
+        if method == "udp":
+            for key, (host, port) in self.targets.items():
+                try:
+                    self._udp_clients[key] = _UdpEcho(host, port)
+                except OSError as e:
+                    self.errors[key] = str(e)
+        elif method == "tcp" and self.targets:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.targets))
+
+    def _tcp_tick(self, key: str) -> Optional[int]:
+        host, port = self.targets[key]
+        try:
+            return _tcp_sample(host, port, self.timeout)
+        except OSError as e:
+            self.errors[key] = str(e)
+            return None
+
+    def tick(self) -> Dict[str, Optional[int]]:
+        """
+        RTT (ns) de cada destino, ou None em caso de perda.
+        """
+        if self.method == "icmp":
+            replies = icmp.ping_many([host for host, _ in self.targets.values()], count=1, timeout=self.timeout)
+            rtts = {}
+            for key, (host, _) in self.targets.items():
+                reply = replies[host]
+                rtts[key] = reply.rtt.last_ns() if reply.ok else None
+                if reply.error:
+                    self.errors[key] = reply.error
+            return rtts
+        if self.method == "tcp":
+            keys = list(self.targets)
+            return dict(zip(keys, self._executor.map(self._tcp_tick, keys)))
+        rtts = {}
+        for key, client in self._udp_clients.items():
+            try:
+                rtts[key] = client.sample(self.timeout)
+            except OSError as e:
+                self.errors[key] = str(e)
+                rtts[key] = None
+        return rtts
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        for client in self._udp_clients.values():
+            client.close()
+
+
+def measure_jitter(
+    targets: List[Tuple[str, Optional[int]]],
+    method: str = DEFAULT_METHOD,
+    samples: int = DEFAULT_SAMPLES,
+    interval_ms: float = DEFAULT_INTERVAL_MS,
+    timeout_ms: float = DEFAULT_TIMEOUT_MS,
+    cancel_flag: Optional[Callable[[], bool]] = None,
+    results: Optional[Dict[str, JitterResult]] = None,
+) -> Dict[str, JitterResult]:
+    """
+    Coleta `samples` RTTs de cada destino em horários fixos (a cada `interval_ms`)
+    via conexão TCP, echo ICMP ou respondedor UDP echo.
+
+    O agendamento é absoluto: uma amostra lenta não desloca as seguintes. Com
+    `results`, as amostras entram nesse dict à medida que chegam (outra thread
+    pode ler o parcial).
+    """
+    sampler = RttSampler(targets, method, timeout_ms)
+    interval = interval_ms / 1000
+    if results is None:
+        results = {}
+    for key, (host, port) in sampler.targets.items():
+        results[key] = JitterResult(host, port)
+    if not results:
+        return results
+
+    try:
+        start = time.monotonic()
+        for index in range(samples):
+            if cancel_flag and cancel_flag():
+                break
+            wait = start + index * interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            for key, rtt in sampler.tick().items():
+                result = results[key]
+                result.sent += 1
+                if rtt is None:
+                    result.samples.add_failure()
+                else:
+                    result.samples.add(rtt)
+    finally:
+        sampler.close()
+        for key, error in sampler.errors.items():
+            results[key].error = error
+    return results
+
+
+class JitterProbe:
+    """
+    Executa `measure_jitter` em segundo plano enquanto as outras fases rodam.
+
+    As amostras ficam em `results` conforme chegam: se `wait()` esgotar o prazo,
+    devolve o parcial e `done` fica False (a medição é interrompida).
+    """
+
+    def __init__(self, targets, cancel_flag=None, **options):
+        self.targets = targets
+        self.cancel_flag = cancel_flag
+        self.options = options
+        self.results: Dict[str, JitterResult] = {}
+        self.error: Optional[Exception] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="jitter-probe", daemon=True)
+
+    def _stopped(self) -> bool:
+        return self._stop.is_set() or bool(self.cancel_flag and self.cancel_flag())
+
+    def _run(self):
+        try:
+            measure_jitter(self.targets, cancel_flag=self._stopped, results=self.results, **self.options)
+        except Exception as e:
+            self.error = e
+
+    def start(self) -> "JitterProbe":
+        self._thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, JitterResult]:
+        self._thread.join(timeout)
+        if self.error:
+            raise self.error
+        if not self.done:
+            # Prazo esgotado: encerra a coleta no próximo horário e fica com o que já chegou
+            self._stop.set()
+        return self.results
+
+
+def options_from_config(section: Optional[dict]) -> Dict:
+    """
+    Converte a seção "jitter" do conf.json nos argumentos de `measure_jitter`.
+    """
+    section = section or {}
+    return {
+        "method": section.get("method", DEFAULT_METHOD),
+        "samples": int(section.get("samples", DEFAULT_SAMPLES)),
+        "interval_ms": section.get("interval_ms", DEFAULT_INTERVAL_MS),
+        "timeout_ms": section.get("timeout_ms", DEFAULT_TIMEOUT_MS),
+    }
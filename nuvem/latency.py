@@ -0,0 +1,80 @@
+# nuvem/latency.py
+import math
+from array import array
+from typing import Dict, Optional
+
+
+def percentile(sorted_values, q: float) -> float:
+    """
+    Percentil `q` (0-100) com interpolação linear sobre valores já ordenados.
+    """
+    n = len(sorted_values)
+    if n == 0:
+        return 0.0
+    if n == 1:
+        return float(sorted_values[0])
+    pos = (n - 1) * q / 100.0
+    low = int(pos)
+    high = min(low + 1, n - 1)
+    frac = pos - low
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * frac
+
+
+class LatencySamples:
+    """
+    Buffer compacto de amostras de latência em nanossegundos (array 'q').
+    """
+
+    __slots__ = ("_ns", "failures")
+
+    def __init__(self):
+        self._ns = array("q")
+        self.failures = 0
+
+    def add(self, elapsed_ns: int):
+        self._ns.append(elapsed_ns)
+
+    def add_failure(self):
+        self.failures += 1
+
+    def __len__(self):
+        return len(self._ns)
+
+    def last_ns(self) -> Optional[int]:
+        return self._ns[-1] if self._ns else None
+
+    @property
+    def attempts(self) -> int:
+        return len(self._ns) + self.failures
+
+    def values_ms(self) -> array:
+        return array("d", (v / 1_000_000 for v in self._ns))
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        attempts = self.attempts
+        failure_ratio = round(self.failures / attempts, 4) if attempts else 0.0
+        if not self._ns:
+            return {
+                "samples": 0,
+                "min_ms": None,
+                "p50_ms": None,
+                "p95_ms": None,
+                "p99_ms": None,
+                "max_ms": None,
+                "stddev_ms": None,
+                "failure_ratio": failure_ratio,
+            }
+        ordered = sorted(self.values_ms())
+        n = len(ordered)
+        mean = sum(ordered) / n
+        stddev = math.sqrt(sum((v - mean) ** 2 for v in ordered) / (n - 1)) if n > 1 else 0.0
+        return {
+            "samples": n,
+            "min_ms": round(ordered[0], 3),
+            "p50_ms": round(percentile(ordered, 50), 3),
+            "p95_ms": round(percentile(ordered, 95), 3),
+            "p99_ms": round(percentile(ordered, 99), 3),
+            "max_ms": round(ordered[-1], 3),
+            "stddev_ms": round(stddev, 3),
+            "failure_ratio": failure_ratio,
+        }
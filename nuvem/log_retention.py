@@ -0,0 +1,271 @@
+# nuvem/log_retention.py
+"""
+Manutenção da pasta de logs: compressão, retenção e índice das sessões.
+
+Uso: python -m nuvem.log_retention [--dir pasta] [--search texto] [--since AAAA-MM-DD] [--until AAAA-MM-DD]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from nuvem.logger import configure, current_log_paths, log, log_dir as current_log_dir
+
+# Valores padrão da seção "logging" do conf.json
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_MAX_TOTAL_MB = 50
+DEFAULT_MAX_FILE_MB = 10
+# Logs sem escrita há menos que isso podem ser de outro processo em execução: não são comprimidos
+DEFAULT_MIN_IDLE_S = 3600
+
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+
+# NuvemTest_<sessão>.log, NuvemTest_<sessão>.<parte>.log e as versões .gz
+# (Nuvemtest_ é o nome usado antes, pelas versões que gravavam sempre em %userprofile%)
+LOG_NAME = re.compile(r"^Nuvem[Tt]est_(\d{4}-\d\d-\d\d_\d\d-\d\d-\d\d)(?:\.(\d+))?\.log(\.gz)?$")
+
+
+def _parse(name: str) -> Optional[Tuple[str, int, bool]]:
+    match = LOG_NAME.match(name)
+    if not match:
+        return None
+    return match.group(1), int(match.group(2) or 0), bool(match.group(3))
+
+
+class LogRetention:
+    """
+    Mantém a pasta de logs limitada em idade e tamanho.
+
+    Em cada `run()`: comprime em gzip os logs fechados, apaga os mais velhos que
+    `max_age_days` e, se o total ainda passar de `max_total_mb`, apaga a partir
+    do mais antigo. Ao fim regrava `index.json`, que liga cada sessão (data e
+    hora do nome do arquivo) aos seus arquivos, para a busca não precisar listar
+    e abrir tudo. Os logs deste processo nunca são tocados.
+    """
+
+    def __init__(
+        self,
+        log_dir: Optional[str] = None,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        max_total_mb: float = DEFAULT_MAX_TOTAL_MB,
+        compress: bool = True,
+        min_idle_s: float = DEFAULT_MIN_IDLE_S,
+    ):
+        self.log_dir = log_dir or current_log_dir()
+        self.max_age_days = max_age_days
+        self.max_total_mb = max_total_mb
+        self.compress = compress
+        self.min_idle_s = min_idle_s
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], log_dir: Optional[str] = None) -> "LogRetention":
+        section = section or {}
+        return cls(
+            log_dir,
+            max_age_days=section.get("max_age_days", DEFAULT_MAX_AGE_DAYS),
+            max_total_mb=section.get("max_total_mb", DEFAULT_MAX_TOTAL_MB),
+            compress=section.get("compress", True),
+        )
+
+    def _files(self) -> List[dict]:
+        ativos = {os.path.abspath(p) for p in current_log_paths()}
+        arquivos = []
+        with os.scandir(self.log_dir) as entries:
+            for entry in entries:
+                parsed = _parse(entry.name)
+                if parsed is None or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                session, part, compressed = parsed
+                arquivos.append({
+                    "name": entry.name, "path": entry.path, "session": session, "part": part,
+                    "compressed": compressed, "bytes": stat.st_size, "mtime": stat.st_mtime,
+                    "active": os.path.abspath(entry.path) in ativos,
+                })
+        return arquivos
+
+    def _gzip(self, arquivo: dict) -> Optional[dict]:
+        destino = arquivo["path"] + ".gz"
+        temporario = destino + ".tmp"
+        try:
+            with open(arquivo["path"], "rb") as origem, gzip.open(temporario, "wb", compresslevel=6) as saida:
+                shutil.copyfileobj(origem, saida, 1024 * 1024)
+            os.utime(temporario, (arquivo["mtime"], arquivo["mtime"]))
+            os.replace(temporario, destino)
+            # No Windows falha se outro processo ainda estiver com o log aberto
+            os.remove(arquivo["path"])
+        except OSError:
+            # O original continua lá: desfaz a cópia parcial ou duplicada
+            for caminho in (temporario, destino):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+            return None
+        return dict(arquivo, name=os.path.basename(destino), path=destino, compressed=True,
+                    bytes=os.path.getsize(destino))
+
+    def _remove(self, arquivo: dict) -> bool:
+        try:
+            os.remove(arquivo["path"])
+            return True
+        except OSError:
+            return False
+
+    def run(self) -> Dict[str, int]:
+        """
+        Executa uma passada de manutenção. Retorna quantos arquivos foram comprimidos e apagados.
+        """
+        if not os.path.isdir(self.log_dir):
+            return {"compressed": 0, "removed": 0}
+        now = time.time()
+        arquivos = self._files()
+        comprimidos = 0
+        removidos = 0
+
+        if self.compress:
+            for i, arquivo in enumerate(arquivos):
+                if arquivo["compressed"] or arquivo["active"] or now - arquivo["mtime"] < self.min_idle_s:
+                    continue
+                novo = self._gzip(arquivo)
+                if novo:
+                    arquivos[i] = novo
+                    comprimidos += 1
+
+        # Idade: pela data da última escrita
+        limite = now - self.max_age_days * 86400
+        mantidos = []
+        for arquivo in arquivos:
+            if not arquivo["active"] and arquivo["mtime"] < limite and self._remove(arquivo):
+                removidos += 1
+            else:
+                mantidos.append(arquivo)
+
+        # Tamanho: do mais antigo para o mais novo até caber
+        total = sum(a["bytes"] for a in mantidos)
+        maximo = self.max_total_mb * 1024 * 1024
+        for arquivo in sorted(mantidos, key=lambda a: (a["session"], a["part"])):
+            if total <= maximo:
+                break
+            if not arquivo["active"] and self._remove(arquivo):
+                total -= arquivo["bytes"]
+                mantidos.remove(arquivo)
+                removidos += 1
+
+        self._write_index(mantidos)
+        return {"compressed": comprimidos, "removed": removidos}
+
+    def _write_index(self, arquivos: Iterable[dict]):
+        sessoes: Dict[str, dict] = {}
+        for arquivo in sorted(arquivos, key=lambda a: (a["session"], a["part"])):
+            sessao = sessoes.setdefault(arquivo["session"], {"files": [], "bytes": 0, "last_write": 0})
+            sessao["files"].append(arquivo["name"])
+            sessao["bytes"] += arquivo["bytes"]
+            sessao["last_write"] = max(sessao["last_write"], int(arquivo["mtime"]))
+        caminho = os.path.join(self.log_dir, INDEX_FILE)
+        temporario = caminho + ".tmp"
+        try:
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "updated": int(time.time()), "sessions": sessoes}, f, indent=1)
+            os.replace(temporario, caminho)
+        except OSError:
+            pass
+
+    def start(self) -> threading.Thread:
+        """
+        Roda a manutenção em segundo plano, sem atrasar a abertura do app.
+        """
+        def worker():
+            try:
+                resultado = self.run()
+                if resultado["compressed"] or resultado["removed"]:
+                    log(f"Logs antigos: {resultado['compressed']} comprimido(s), {resultado['removed']} apagado(s).")
+            except OSError as e:
+                log(f"Falha na manutenção dos logs: {e}")
+
+        thread = threading.Thread(target=worker, name="log-retention", daemon=True)
+        thread.start()
+        return thread
+
+
+def start_maintenance(section: Optional[dict]) -> threading.Thread:
+    """
+    Aplica a seção "logging" do conf.json (pasta, nível, limite por arquivo) e inicia a manutenção da pasta.
+    """
+    section = section or {}
+    configure(
+        log_dir=section.get("dir") or None,
+        level=section.get("level"),
+        max_file_bytes=int(section.get("max_file_mb", DEFAULT_MAX_FILE_MB) * 1024 * 1024),
+    )
+    return LogRetention.from_config(section).start()
+
+
+def load_index(log_dir: Optional[str] = None) -> Dict[str, dict]:
+    log_dir = log_dir or current_log_dir()
+    try:
+        with open(os.path.join(log_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("sessions", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def search(text: str, log_dir: Optional[str] = None, since: Optional[str] = None,
+           until: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Linhas que contêm `text`, sessão a sessão (compactadas ou não): (arquivo, linha).
+
+    `since`/`until` (AAAA-MM-DD) filtram pelas sessões do índice, sem abrir os demais arquivos.
+    O índice é refeito a cada manutenção (início do app e do monitor).
+    """
+    log_dir = log_dir or current_log_dir()
+    sessoes = load_index(log_dir)
+    if not sessoes:
+        # Sem índice (ou ainda não gerado): monta a lista a partir da pasta
+        sessoes = {}
+        for name in sorted(os.listdir(log_dir)):
+            parsed = _parse(name)
+            if parsed:
+                sessoes.setdefault(parsed[0], {"files": []})["files"].append(name)
+    for session in sorted(sessoes):
+        dia = session[:10]
+        if (since and dia < since) or (until and dia > until):
+            continue
+        for name in sessoes[session]["files"]:
+            caminho = os.path.join(log_dir, name)
+            opener = gzip.open if name.endswith(".gz") else open
+            try:
+                with opener(caminho, "rt", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        if text in line:
+                            yield name, line.rstrip("\n")
+            except OSError:
+                continue
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção e busca nos logs do Nuvem.Test.")
+    parser.add_argument("--dir", help="pasta dos logs (padrão: a do app)")
+    parser.add_argument("--search", help="texto a procurar nos logs (inclui os comprimidos)")
+    parser.add_argument("--since", help="primeira sessão (AAAA-MM-DD)")
+    parser.add_argument("--until", help="última sessão (AAAA-MM-DD)")
+    parser.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+    parser.add_argument("--max-total-mb", type=float, default=DEFAULT_MAX_TOTAL_MB)
+    args = parser.parse_args(argv)
+
+    if args.search:
+        for name, line in search(args.search, args.dir, args.since, args.until):
+            print(f"{name}: {line}")
+        return
+    resultado = LogRetention(args.dir, args.max_age_days, args.max_total_mb).run()
+    print(f"{resultado['compressed']} arquivo(s) comprimido(s), {resultado['removed']} apagado(s).")
+
+
+if __name__ == "__main__":
+    main()
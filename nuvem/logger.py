@@ -1,23 +1,270 @@
+import atexit
 import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
-# Diretório de logs em %userprofile%/.nuvem/logs
-USER_DIR = os.path.expandvars(r"%userprofile%/.nuvem")
-LOG_DIR = os.path.join(USER_DIR, "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
+# Nada é criado no import: pasta, nome do arquivo e gravador saem na primeira
+# chamada de log() (ou em configure()), para CLI, ferramentas e o modo monitor
+# importarem o módulo sem tocar no disco.
 
-# Nome do arquivo: Nuvemtest_[data e hora do teste].log
-log_filename = "Nuvemtest_" + datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".log"
-log_path = os.path.join(LOG_DIR, log_filename)
+# Níveis aceitos por log() e configure(level=...)
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
 
+# O gravador descarrega o lote ao juntar FLUSH_BYTES ou após FLUSH_INTERVAL_S da primeira linha pendente
+FLUSH_BYTES = 64 * 1024
+FLUSH_INTERVAL_S = 0.5
+# Acima disso o log da sessão continua em NuvemTest_<sessão>.1.log, .2.log... (0 = sem limite)
+MAX_FILE_BYTES = 10 * 1024 * 1024
 
-def log(message: str):
+
+class LogWriter:
+    """
+    Grava as linhas de log numa thread própria, com o arquivo sempre aberto.
+
+    `write()` só enfileira a linha; a thread junta as linhas em lotes e grava
+    no arquivo (e no terminal) quando o lote passa de `flush_bytes` ou quando a
+    linha mais antiga espera `flush_interval_s`. `flush()` espera tudo o que já
+    foi enfileirado chegar ao disco; `close()` faz o mesmo e encerra a thread.
+    Passando de `max_bytes`, o arquivo é fechado e a gravação segue numa nova parte.
+    """
+
+    def __init__(self, path: str, flush_bytes: int = FLUSH_BYTES, flush_interval_s: float = FLUSH_INTERVAL_S,
+                 echo: bool = True, max_bytes: int = MAX_FILE_BYTES):
+        self.path = path
+        self._base_path = path
+        self._part = 0
+        self.max_bytes = max_bytes
+        self.flush_bytes = flush_bytes
+        self.flush_interval_s = flush_interval_s
+        # Repete as linhas no terminal, como o print() de antes
+        self.echo = echo
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._closed:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    def write(self, line: str):
+        if self._closed:
+            # Depois do close (ex.: log no atexit de outro módulo) grava direto
+            f = self._write_batch([line], self._open())
+            if f is not None:
+                f.close()
+            return
+        self._ensure_thread()
+        self._queue.put(line)
+
+    def flush(self, timeout: float = 5.0):
+        if self._thread is None or self._closed:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        thread = self._thread
+        self._closed = True
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _write_batch(self, lines, file):
+        # Devolve o arquivo, ou None se a gravação falhou (disco cheio, pasta apagada...)
+        text = "".join(line + "\n" for line in lines)
+        if file is not None:
+            try:
+                file.write(text)
+                file.flush()
+            except OSError as e:
+                # Sem arquivo, as linhas continuam indo para o terminal e a thread segue viva
+                sys.stderr.write(f"Falha ao gravar o log {self.path}: {e}\n")
+                try:
+                    file.close()
+                except OSError:
+                    pass
+                file = None
+        if self.echo and sys.stdout is not None:
+            try:
+                sys.stdout.write(text)
+            except (OSError, ValueError):
+                pass
+        return file
+
+    def _open(self):
+        try:
+            return open(self.path, "a", encoding="utf-8")
+        except OSError as e:
+            # Sem arquivo, as linhas continuam indo para o terminal
+            sys.stderr.write(f"Não foi possível abrir o log {self.path}: {e}\n")
+            return None
+
+    def _rotate(self, f):
+        # Fecha a parte atual e abre a próxima: NuvemTest_<sessão>.<n>.log
+        f.close()
+        self._part += 1
+        root, ext = os.path.splitext(self._base_path)
+        self.path = f"{root}.{self._part}{ext}"
+        return self._open()
+
+    def _run(self):
+        get = self._queue.get
+        batch = []
+        size = 0
+        oldest = None
+        f = self._open()
+        try:
+            while True:
+                timeout = None if oldest is None else max(0.0, oldest + self.flush_interval_s - time.monotonic())
+                try:
+                    item = get(timeout=timeout)
+                except queue.Empty:
+                    item = ""
+                # Linha: entra no lote; Event: pedido de flush; None: encerramento; "" (tempo esgotado): descarrega
+                if isinstance(item, str) and item:
+                    batch.append(item)
+                    size += len(item) + 1
+                    if oldest is None:
+                        oldest = time.monotonic()
+                    if size < self.flush_bytes:
+                        continue
+                if batch:
+                    f = self._write_batch(batch, f)
+                    if f is not None and self.max_bytes and f.tell() >= self.max_bytes:
+                        f = self._rotate(f)
+                    batch = []
+                    size = 0
+                    oldest = None
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is None:
+                    return
+        finally:
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+
+
+def default_log_dir() -> str:
+    if getattr(sys, 'frozen', False):
+        # Executável: salva em %userprofile%/.nuvem/logs
+        user_dir = os.path.expandvars(r"%userprofile%/.nuvem")
+        return os.path.join(user_dir, "logs")
+    # Desenvolvimento: salva em ./logs
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'logs'))
+
+
+def session_log_name() -> str:
+    # Nome do arquivo: NuvemTest_[data e hora do teste].log
+    return "NuvemTest_" + datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".log"
+
+
+_settings = {
+    "log_dir": None,
+    "path": None,
+    "sink": None,
+    "level": INFO,
+    "echo": True,
+    "max_file_bytes": MAX_FILE_BYTES,
+}
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> LogWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                path = _settings["path"] or os.path.join(_settings["log_dir"] or default_log_dir(), session_log_name())
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                writer = LogWriter(path, echo=_settings["echo"], max_bytes=_settings["max_file_bytes"])
+                atexit.register(writer.close)
+                _writer = writer
+    return _writer
+
+
+def configure(log_dir=None, path=None, sink=None, level=None, echo=None, max_file_bytes=None):
+    """
+    Ajusta o log antes (ou depois) da primeira chamada. Só muda o que for passado.
+
+    `log_dir`/`path`: pasta do log da sessão ou arquivo exato; trocar um dos dois
+    depois do primeiro log fecha o arquivo atual e segue no novo.
+    `sink`: função que recebe cada linha já formatada, no lugar do arquivo e do
+    terminal (ex.: ferramentas que querem as linhas em memória).
+    `level`: "debug", "info", "warning", "error" (ou o número); abaixo disso log() descarta.
+    """
+    global _writer
+    if level is not None:
+        _settings["level"] = LEVELS[level.lower()] if isinstance(level, str) else int(level)
+    if sink is not None:
+        _settings["sink"] = sink
+    if echo is not None:
+        _settings["echo"] = echo
+        if _writer is not None:
+            _writer.echo = echo
+    if max_file_bytes is not None:
+        _settings["max_file_bytes"] = max_file_bytes
+        if _writer is not None:
+            _writer.max_bytes = max_file_bytes
+    if (log_dir is not None and log_dir != _settings["log_dir"]) or (path is not None and path != _settings["path"]):
+        if log_dir is not None:
+            _settings["log_dir"] = log_dir
+        if path is not None:
+            _settings["path"] = path
+        with _writer_lock:
+            antigo, _writer = _writer, None
+        if antigo is not None:
+            antigo.close()
+
+
+def log(message: str, level: int = INFO):
+    if level < _settings["level"]:
+        return
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     full_message = f"[{timestamp}] {message}"
 
-    # Escreve no arquivo
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(full_message + "\n")
+    sink = _settings["sink"]
+    if sink is not None:
+        sink(full_message)
+        return
+    # Enfileira para o arquivo e o terminal; a gravação acontece na thread do LogWriter
+    (_writer or _get_writer()).write(full_message)
+
+
+def log_dir() -> str:
+    """
+    Pasta dos logs de sessão (a configurada ou a padrão), sem criá-la.
+    """
+    if _settings["path"]:
+        return os.path.dirname(_settings["path"]) or "."
+    return _settings["log_dir"] or default_log_dir()
+
+
+def current_log_paths():
+    """
+    Arquivos de log em uso por este processo (a manutenção não mexe neles).
+    """
+    return [_writer.path] if _writer is not None else []
+
 
-    # Também mostra no terminal
-    print(full_message)
+def flush_log(timeout: float = 5.0):
+    """
+    Espera as linhas já registradas chegarem ao arquivo.
+    """
+    if _writer is not None:
+        _writer.flush(timeout)
@@ -0,0 +1,261 @@
+# nuvem/monitor.py
+"""
+Modo monitor: agente sem interface que repete periodicamente os testes de "tests"
+e o ping ICMP dos mesmos hosts (ou de "monitor.icmp_hosts").
+
+Uso: python -m nuvem.monitor [--config caminho/conf.json] [--once]
+
+Não importa PySide6/QtWebEngine. As amostras das últimas `retention_hours`
+horas ficam num buffer circular de memória constante. Alterações no conf.json
+valem a partir do ciclo seguinte, sem reiniciar.
+"""
+import argparse
+import math
+import random
+import signal
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from nuvem import icmp
+from nuvem.async_probe import run_probes, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+from nuvem.config_loader import default_config
+from nuvem.config_model import ProbeTarget, compile_targets
+from nuvem.latency import percentile
+from nuvem.logger import log
+from nuvem.log_retention import start_maintenance as start_log_maintenance
+from nuvem.resolver import default_resolver, DEFAULT_TTL
+from nuvem.results import ResultRecorder, ping_record, probe_record
+from nuvem.ringbuffer import RingBuffer
+
+# Valores padrão da seção "monitor" do conf.json
+DEFAULT_INTERVAL_S = 60
+DEFAULT_JITTER_S = 10
+DEFAULT_RETENTION_HOURS = 24
+DEFAULT_SUMMARY_INTERVAL_S = 3600
+DEFAULT_ICMP = True
+DEFAULT_ICMP_COUNT = 3
+DEFAULT_ICMP_INTERVAL_S = 0.2
+
+
+class Monitor:
+    def __init__(
+        self,
+        tests,
+        interval_s: float = DEFAULT_INTERVAL_S,
+        jitter_s: float = DEFAULT_JITTER_S,
+        retention_hours: float = DEFAULT_RETENTION_HOURS,
+        summary_interval_s: float = DEFAULT_SUMMARY_INTERVAL_S,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout: float = DEFAULT_TIMEOUT,
+        recorder: Optional[ResultRecorder] = None,
+        icmp_hosts: Optional[List[str]] = None,
+        icmp_count: int = DEFAULT_ICMP_COUNT,
+    ):
+        # Destinos tipados (dicts do conf.json são compilados em ProbeTarget)
+        self.tests: Tuple[ProbeTarget, ...] = compile_targets(tests)
+        self._specs = [t.spec for t in self.tests]
+        # Hosts do ping ICMP; no buffer, as chaves vêm depois das dos destinos TCP
+        self.icmp_hosts: Tuple[str, ...] = tuple(icmp_hosts or ())
+        self.icmp_count = icmp_count
+        self.interval_s = interval_s
+        self.jitter_s = min(jitter_s, interval_s / 2)
+        self.retention_hours = retention_hours
+        self.summary_interval_s = summary_interval_s
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.buffer = self._new_buffer()
+        # Cada amostra também vai para o JSONL de resultados (histórico de tendências)
+        self.recorder = recorder
+        # Caminho do conf.json acompanhado entre ciclos (None = não recarrega)
+        self.config_path: Optional[str] = None
+        self.config = None
+        self._stop = threading.Event()
+        self._last_state: Dict[int, bool] = {}
+
+    @staticmethod
+    def _icmp_hosts(config: dict) -> List[str]:
+        # Sem lista própria, pinga os hosts de "tests" (cada um uma vez)
+        section = config.get("monitor", {})
+        if not section.get("icmp", DEFAULT_ICMP):
+            return []
+        hosts = section.get("icmp_hosts") or [t.host for t in compile_targets(config.get("tests", []))]
+        return list(dict.fromkeys(hosts))
+
+    @staticmethod
+    def _settings(config: dict) -> dict:
+        section = config.get("monitor", {})
+        return {
+            "tests": config.get("tests", []),
+            "interval_s": section.get("interval_s", DEFAULT_INTERVAL_S),
+            "jitter_s": section.get("jitter_s", DEFAULT_JITTER_S),
+            "retention_hours": section.get("retention_hours", DEFAULT_RETENTION_HOURS),
+            "summary_interval_s": section.get("summary_interval_s", DEFAULT_SUMMARY_INTERVAL_S),
+            "concurrency": config.get("tests_concurrency", DEFAULT_CONCURRENCY),
+            "timeout": config.get("tests_timeout", DEFAULT_TIMEOUT),
+            "icmp_hosts": Monitor._icmp_hosts(config),
+            "icmp_count": section.get("icmp_count", DEFAULT_ICMP_COUNT),
+        }
+
+    @classmethod
+    def from_config(cls, config: dict, config_path: Optional[str] = None) -> "Monitor":
+        monitor = cls(
+            recorder=ResultRecorder.from_config(config.get("history", {}), source="monitor"),
+            **cls._settings(config),
+        )
+        monitor.config = config
+        monitor.config_path = config_path
+        return monitor
+
+    def _new_buffer(self) -> RingBuffer:
+        # Capacidade para o pior caso: todos os ciclos com o menor intervalo possível
+        cycles = math.ceil(self.retention_hours * 3600 / max(1.0, self.interval_s - self.jitter_s))
+        return RingBuffer(max(1, cycles * max(1, len(self.tests) + len(self.icmp_hosts))))
+
+    def apply_config(self, config: dict):
+        """
+        Aplica um conf.json novo entre ciclos. Se os destinos, o intervalo ou a
+        retenção mudarem, o buffer recomeça (os índices das amostras mudam de sentido).
+        """
+        settings = self._settings(config)
+        tests = compile_targets(settings["tests"])
+        icmp_hosts = tuple(settings["icmp_hosts"])
+        reset = (tests != self.tests or icmp_hosts != self.icmp_hosts or settings["interval_s"] != self.interval_s
+                 or settings["retention_hours"] != self.retention_hours)
+        self.tests = tests
+        self._specs = [t.spec for t in tests]
+        self.icmp_hosts = icmp_hosts
+        self.icmp_count = settings["icmp_count"]
+        self.interval_s = settings["interval_s"]
+        self.jitter_s = min(settings["jitter_s"], self.interval_s / 2)
+        self.retention_hours = settings["retention_hours"]
+        self.summary_interval_s = settings["summary_interval_s"]
+        self.concurrency = settings["concurrency"]
+        self.timeout = settings["timeout"]
+        if config.get("history") != (self.config or {}).get("history"):
+            self.recorder = ResultRecorder.from_config(config.get("history", {}), source="monitor")
+        default_resolver.ttl = config.get("dns_cache_ttl", DEFAULT_TTL)
+        self.config = config
+        if reset:
+            self.buffer = self._new_buffer()
+            self._last_state = {}
+        log(f"[monitor] conf.json recarregado: {len(self.tests)} destino(s), intervalo {self.interval_s}s"
+            f"{', buffer reiniciado' if reset else ''}")
+
+    def _reload_config(self):
+        if self.config is None:
+            return
+        novo = default_config.changed(self.config, self.config_path)
+        if novo is not None:
+            self.apply_config(novo)
+
+    def _description(self, index: int) -> str:
+        if index >= len(self.tests):
+            return f"ICMP {self.icmp_hosts[index - len(self.tests)]}"
+        return self.tests[index].description
+
+    def _update_state(self, index: int, ok: bool, error: Optional[str]):
+        # Só escreve no log quando o estado do destino muda
+        if self._last_state.get(index) != ok:
+            status = "OK" if ok else f"FALHA ({error})"
+            log(f"[monitor] {self._description(index)} - {status}")
+            self._last_state[index] = ok
+
+    def run_cycle(self):
+        sondas = run_probes(self._specs, concurrency=self.concurrency, timeout=self.timeout)
+        now = time.time()
+        for index, probe in enumerate(sondas):
+            if probe is None:
+                continue
+            ok = probe["connected"]
+            value = probe.get("connect_ms") or 0.0
+            self.buffer.append(now, index, value, ok)
+            if self.recorder:
+                self.recorder.record(probe_record(probe, self.tests[index]))
+            self._update_state(index, ok, probe.get("error"))
+        if self.icmp_hosts:
+            self._ping_cycle()
+
+    def _ping_cycle(self):
+        # Um socket ICMP por família para todos os hosts; no buffer vai a mediana do RTT do ciclo
+        pings = icmp.ping_many(self.icmp_hosts, count=self.icmp_count, timeout=self.timeout,
+                               interval=DEFAULT_ICMP_INTERVAL_S)
+        now = time.time()
+        base = len(self.tests)
+        for offset, host in enumerate(self.icmp_hosts):
+            ping = pings[host].summary()
+            ok = ping["received"] > 0
+            self.buffer.append(now, base + offset, ping["rtt"]["p50_ms"] or 0.0, ok)
+            if self.recorder:
+                self.recorder.record(ping_record(ping))
+            self._update_state(base + offset, ok, ping.get("error") or f"perda de {ping['loss']:.0%}")
+
+    def summary(self, window_s: Optional[float] = None) -> List[dict]:
+        since = time.time() - window_s if window_s else None
+        resumo = []
+        for index in range(len(self.tests) + len(self.icmp_hosts)):
+            values, failures = self.buffer.values(index, since)
+            ordered = sorted(values)
+            total = len(ordered) + failures
+            resumo.append({
+                "description": self._description(index),
+                "samples": total,
+                "p50_ms": round(percentile(ordered, 50), 2) if ordered else None,
+                "p95_ms": round(percentile(ordered, 95), 2) if ordered else None,
+                "failure_ratio": round(failures / total, 4) if total else 0.0,
+            })
+        return resumo
+
+    def _log_summary(self):
+        for item in self.summary(self.summary_interval_s):
+            log(
+                f"[monitor] {item['description']}: {item['samples']} amostras, "
+                f"p50 {item['p50_ms']} ms, p95 {item['p95_ms']} ms, falhas {item['failure_ratio']}"
+            )
+
+    def run(self, max_cycles: Optional[int] = None):
+        log(
+            f"[monitor] Iniciado: {len(self.tests)} destino(s), {len(self.icmp_hosts)} ping(s) ICMP, intervalo {self.interval_s}s "
+            f"(±{self.jitter_s}s), buffer de {self.buffer.capacity} amostras ({self.buffer.nbytes()} bytes)"
+        )
+        cycles = 0
+        next_summary = time.monotonic() + self.summary_interval_s
+        while not self._stop.is_set():
+            self._reload_config()
+            self.run_cycle()
+            cycles += 1
+            if max_cycles is not None and cycles >= max_cycles:
+                break
+            if time.monotonic() >= next_summary:
+                self._log_summary()
+                next_summary = time.monotonic() + self.summary_interval_s
+            # Um único despertar por ciclo; o jitter evita que várias estações testem juntas
+            self._stop.wait(self.interval_s + random.uniform(-self.jitter_s, self.jitter_s))
+        self._log_summary()
+        log("[monitor] Encerrado.")
+
+    def stop(self):
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nuvem.Test em modo monitor (sem interface).")
+    parser.add_argument("--config", help="caminho do conf.json (padrão: %%userprofile%%/.nuvem/conf.json)")
+    parser.add_argument("--once", action="store_true", help="executa um único ciclo e sai")
+    args = parser.parse_args(argv)
+
+    config = default_config.get(args.config)
+    start_log_maintenance(config.get("logging"))
+    default_resolver.ttl = config.get("dns_cache_ttl", DEFAULT_TTL)
+    monitor = Monitor.from_config(config, config_path=args.config)
+
+    def on_signal(signum, frame):
+        monitor.stop()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    monitor.run(max_cycles=1 if args.once else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,114 @@
 # nuvem/network.py
 import socket
-import subprocess
-import platform
-import ping3
-from typing import Dict, List, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Any, Optional
+from nuvem import icmp
+from nuvem.resolver import Resolver, default_resolver
 
-def ping_host(host: str) -> bool:
+def ping_host(host: str, timeout: float = 1.0) -> bool:
     """
-    Testa conectividade básica com ping ICMP.
+    Testa conectividade básica com ping ICMP (no próprio processo, sem chamar o binário ping).
     """
-    param = "-n" if platform.system().lower() == "windows" else "-c"
-    command = ["ping", param, "1", host]
+    return icmp.ping(host, count=1, timeout=timeout).ok
+
+def measure_connection(host: str, port: int, timeout: float = 3.0, resolver: Optional[Resolver] = None) -> Dict[str, Any]:
+    """
+    Conecta via TCP medindo separadamente a resolução DNS e a conexão.
+    """
+    resolver = resolver or default_resolver
+    result: Dict[str, Any] = {"host": host, "port": port, "connected": False}
     try:
-        subprocess.check_output(command)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+        resolution = resolver.resolve(host)
+    except OSError as e:
+        result["error"] = f"falha na resolução DNS: {e}"
+        return result
+    result["dns_ms"] = resolution.dns_ms
+    result["dns_cached"] = resolution.cached
+
+    start = time.perf_counter()
+    for family, ip in resolution.addresses:
+        result["ip"] = ip
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect((ip, port))
+                result["connected"] = True
+                result.pop("error", None)
+                break
+        except (socket.timeout, socket.error) as e:
+            result["error"] = str(e) or "timeout"
+    result["connect_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
 
 def test_connection(host: str, port: int, timeout: float = 3.0) -> bool:
     """
     Testa se é possível estabelecer conexão TCP com o host e porta informados.
     """
-    try:
-        with socket.create_connection((host, port), timeout=timeout):
-            return True
-    except (socket.timeout, socket.error):
-        return False
+    return measure_connection(host, port, timeout)["connected"]
+
+# Destinos padrão quando o conf.json não define "network_targets"
+DEFAULT_TARGETS = [
+    "google.com",
+    "cloudflare.com",
+    "aws.amazon.com"
+]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _shared_executor() -> ThreadPoolExecutor:
+    # Pool compartilhado para resoluções DNS em paralelo
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="nuvem-net")
+        return _executor
+
+
+def _ping_status(reply: icmp.PingResult) -> Dict[str, Any]:
+    # Sucesso só com ao menos um echo de volta; sem resposta é "timeout", erro de socket é "failed"
+    if reply.ok:
+        return {"status": "success"}
+    if reply.error:
+        return {"status": "failed", "error": reply.error}
+    return {"status": "timeout", "error": "Sem resposta ao ping"}
+
 
 class NetworkTest:
-    def __init__(self):
-        self.targets = [
-            "google.com",
-            "cloudflare.com",
-            "aws.amazon.com"
-        ]
+    def __init__(self, targets: Optional[List[str]] = None, deadline: float = 5.0, ping_timeout: float = 1.0):
+        self.targets = list(targets) if targets else list(DEFAULT_TARGETS)
+        # Prazo total de test_all (segundos), independente do número de destinos
+        self.deadline = deadline
+        self.ping_timeout = ping_timeout
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "NetworkTest":
+        return cls(
+            targets=config.get("network_targets"),
+            deadline=config.get("network_deadline", 5.0),
+        )
 
     def test_connection(self, host: str) -> Dict[str, Any]:
         try:
-            # Test DNS resolution
-            ip = socket.gethostbyname(host)
-            
-            # Test ping
-            ping_time = ping3.ping(host)
-            
-            return {
+            # Test DNS resolution (uma vez por sessão, via cache)
+            resolution = default_resolver.resolve(host)
+            ip = resolution.ip
+
+            # Test ping direto no IP, sem resolver de novo
+            reply = icmp.ping(ip, timeout=self.ping_timeout)
+
+            result = {
                 "host": host,
                 "ip": ip,
-                "ping": round(ping_time * 1000, 2) if ping_time is not None else None,
-                "status": "success"
+                "dns_ms": resolution.dns_ms,
+                "dns_cached": resolution.cached,
+                "ping": reply.rtt.summary()["min_ms"],
             }
+            result.update(_ping_status(reply))
+            return result
         except Exception as e:
             return {
                 "host": host,
@@ -57,7 +117,46 @@ class NetworkTest:
             }
 
     def test_all(self) -> List[Dict[str, Any]]:
-        results = []
-        for target in self.targets:
-            results.append(self.test_connection(target))
-        return results
+        """
+        Resolve todos os destinos em paralelo e pinga os resolvidos num único lote.
+
+        Ao fim do prazo, devolve o que já terminou; os demais vêm com status "timeout".
+        """
+        deadline_at = time.monotonic() + self.deadline
+        executor = _shared_executor()
+        futures = {target: executor.submit(default_resolver.resolve, target) for target in self.targets}
+        wait(futures.values(), timeout=self.deadline)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        resolved = {}
+        for target, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[target] = {"host": target, "status": "timeout", "error": "Prazo excedido na resolução DNS"}
+                continue
+            try:
+                resolved[target] = future.result()
+            except Exception as e:
+                results[target] = {"host": target, "status": "failed", "error": str(e)}
+
+        remaining = deadline_at - time.monotonic()
+        replies = {}
+        if resolved and remaining > 0:
+            ips = [r.ip for r in resolved.values()]
+            replies = icmp.ping_many(ips, count=1, timeout=min(self.ping_timeout, remaining))
+
+        for target, resolution in resolved.items():
+            reply = replies.get(resolution.ip)
+            results[target] = {
+                "host": target,
+                "ip": resolution.ip,
+                "dns_ms": resolution.dns_ms,
+                "dns_cached": resolution.cached,
+                "ping": reply.rtt.summary()["min_ms"] if reply else None,
+            }
+            if reply is None:
+                results[target].update(status="timeout", error="Prazo excedido antes do ping")
+            else:
+                results[target].update(_ping_status(reply))
+
+        return [results[target] for target in self.targets]
@@ -1,23 +1,181 @@
+import threading
+import time
 from PySide6.QtCore import QObject, Signal
-from nuvem.speedtest_worker import SpeedTest
-from nuvem.config_loader import load_config, get_speedtest_requirements
+from nuvem.speedtest_worker import SpeedTest, BACKEND_SPEEDTEST_CLI
+from nuvem.config_loader import default_config
 from nuvem.logger import log
-from nuvem.network import test_connection
+from nuvem.async_probe import run_probes, DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT
+from nuvem.network import NetworkTest
+from nuvem.resolver import default_resolver, DEFAULT_TTL
+from nuvem.results import ResultRecorder, probe_record, probe_verdict, VERDICT_FAIL, VERDICT_ALERT
+from nuvem.session import TestSession, OrderedOutput, warmup_hosts, CONNECTIVITY, SPEEDTEST
+
+def _format_phases(probe: dict) -> str:
+    # Ex.: "DNS 120.5 ms (cache), conexão 8.2 ms, primeiro byte 30.1 ms"
+    partes = []
+    if "dns_ms" in probe:
+        cache = " (cache)" if probe.get("dns_cached") else ""
+        partes.append(f"DNS {probe['dns_ms']} ms{cache}")
+    if "connect_ms" in probe:
+        partes.append(f"conexão {probe['connect_ms']} ms")
+    if "full_handshake_ms" in probe:
+        partes.append(f"TLS {probe.get('protocol')} {probe.get('cipher')}, handshake {probe['full_handshake_ms']} ms")
+        if probe.get("resumed"):
+            partes.append(f"retomado {probe['resumed_handshake_ms']} ms")
+        elif "resume_error" in probe:
+            partes.append(f"sem retomada: {probe['resume_error']}")
+    if "first_byte_ms" in probe:
+        partes.append(f"primeiro byte {probe['first_byte_ms']} ms")
+    elif "first_byte_error" in probe:
+        partes.append(f"primeiro byte: {probe['first_byte_error']}")
+    if probe.get("error"):
+        partes.append(f"erro: {probe['error']}")
+    return ", ".join(partes) if partes else "-"
+
+def _report_references(referencias: list, progress) -> list:
+    # Destinos de referência ("network_targets"): só alertam se nenhum responder
+    partes = []
+    respondeu = False
+    for item in referencias:
+        if item["status"] == "success" and item.get("ping") is not None:
+            respondeu = True
+            cache = " (cache)" if item.get("dns_cached") else ""
+            log(f"Referência {item['host']} ({item['ip']}) - OK - DNS {item['dns_ms']} ms{cache}, ping {item['ping']} ms")
+            partes.append(f"{item['host']} {item['ping']} ms")
+        else:
+            log(f"Referência {item['host']} - FALHA ({item.get('error') or 'sem resposta ao ping'})")
+            partes.append(f"{item['host']} sem resposta")
+    if partes:
+        progress(f"Referências: {', '.join(partes)}")
+    if referencias and not respondeu:
+        return ["ALERTA: nenhum destino de referência respondeu (DNS/ping)"]
+    return []
+
+def run_connectivity_tests(progress, cancel_flag, recorder=None) -> list:
+    """
+    Sondas TCP dos `tests` do conf.json, com os destinos de referência ("network_targets")
+    testados ao mesmo tempo. Devolve as falhas e alertas, na ordem do conf.json.
+
+    Com `recorder` (nuvem.results), cada sonda também vira um registro no JSONL de resultados.
+    """
+    progress("Executando testes de conexão...")
+    model = default_config.model()
+    alvos = model.targets
+    opcoes = model.raw
+    concurrency = opcoes.get("tests_concurrency", DEFAULT_CONCURRENCY)
+    timeout = opcoes.get("tests_timeout", DEFAULT_TIMEOUT)
+    default_resolver.ttl = opcoes.get("dns_cache_ttl", DEFAULT_TTL)
+
+    progress(f"Testando {len(alvos)} destino(s) em paralelo...")
+
+    # DNS + ping das referências em paralelo com as sondas, dentro de "network_deadline"
+    referencias = []
+    network_test = NetworkTest.from_config(opcoes)
+    thread_referencias = threading.Thread(
+        target=lambda: referencias.extend(network_test.test_all()), name="network-targets", daemon=True
+    )
+    thread_referencias.start()
+
+    def on_result(probe):
+        # Chamado no loop assíncrono a cada sonda concluída
+        alvo = alvos[probe["index"]]
+        host = alvo.host
+        port = alvo.port
+        description = alvo.description
+        status = "OK" if probe["connected"] else "FALHA"
+        log(f"{description} ({host}:{port}) - fases: {_format_phases(probe)}")
+        if recorder:
+            recorder.record(probe_record(probe, alvo))
+        latency = probe.get("latency")
+        if latency and latency["samples"]:
+            detalhe = (
+                f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, "
+                f"falhas {round(latency['failure_ratio'] * 100, 1)}%"
+            )
+            progress(f"{description} - {status} ({detalhe})")
+            log(
+                f"{description} ({host}:{port}) - {status} - "
+                f"min {latency['min_ms']} / p50 {latency['p50_ms']} / p95 {latency['p95_ms']} / "
+                f"p99 {latency['p99_ms']} / max {latency['max_ms']} ms, "
+                f"desvio {latency['stddev_ms']} ms, falhas {latency['failure_ratio']}"
+            )
+        elif "full_handshake_ms" in probe:
+            detalhe = f"{probe.get('protocol')}, handshake {probe['full_handshake_ms']} ms"
+            if probe.get("resumed"):
+                detalhe += f", retomado {probe['resumed_handshake_ms']} ms"
+            progress(f"{description} - {status} ({detalhe})")
+        else:
+            progress(f"{description} - {status}")  # Mostra resultado na interface
+            log(f"{description} ({host}:{port}) - {status} ({probe['elapsed_ms']} ms)")
+
+    sondas = run_probes(
+        [alvo.spec for alvo in alvos],
+        concurrency=concurrency,
+        timeout=timeout,
+        on_result=on_result,
+        cancel_flag=cancel_flag,
+    )
+    if cancel_flag():
+        progress("Testes de conexão cancelados.")
+    else:
+        thread_referencias.join(network_test.deadline + network_test.ping_timeout)
+
+    # Resumo na ordem do conf.json, independente da ordem de término
+    resultados = []
+    for alvo, probe in zip(alvos, sondas):
+        if probe is None:
+            continue
+        verdict, motivo = probe_verdict(probe, alvo)
+        if verdict == VERDICT_FAIL:
+            resultados.append(f"FALHA CRÍTICA: {motivo}")
+        elif verdict == VERDICT_ALERT:
+            resultados.append(f"ALERTA: {motivo}")
+    if not cancel_flag():
+        resultados.extend(_report_references(list(referencias), progress))
+
+    return resultados
 
 class SpeedTestWorker(QObject):
     finished = Signal(dict)
     error = Signal(str)
     progress = Signal(str)  # Adiciona sinal de progresso
+    throughput = Signal(dict)  # Amostras de vazão ao vivo (limitadas a uma a cada SAMPLE_MIN_INTERVAL)
+
+    # Intervalo mínimo entre amostras repassadas à thread da interface (segundos)
+    SAMPLE_MIN_INTERVAL = 0.25
 
     def __init__(self, timeout=40):
         super().__init__()
         self.timeout = timeout
-        self.requirements = get_speedtest_requirements()
+        model = default_config.model()
+        config = model.raw
+        # Requisitos já resolvidos por métrica e destinos tipados (nuvem.config_model)
+        self.requirements = model.requirements
+        self.jitter_config = config.get("jitter", {})
+        self.tests = model.targets
+        self.backend = config.get("speedtest_backend", BACKEND_SPEEDTEST_CLI)
+        self.throughput_config = config.get("throughput", {})
+        self.server_cache_config = config.get("server_cache", {})
+        self.server_selection_config = config.get("server_selection", {})
+        self.adaptive_config = config.get("adaptive", {})
+        self.phase_timeouts = config.get("speedtest_phases", {})
+        self.bufferbloat_config = config.get("bufferbloat", {})
+        # Registros de resultado (JSONL) da seção "history"; None se desativado
+        self.recorder = ResultRecorder.from_config(config.get("history", {}))
         self._cancelled = False
+        self._last_sample = 0.0
 
     def cancel(self):
         self._cancelled = True
 
+    def _on_sample(self, sample):
+        # Chamado pelas threads de medição; descarta o excesso para não inundar a GUI
+        now = time.monotonic()
+        if now - self._last_sample < self.SAMPLE_MIN_INTERVAL:
+            return
+        self._last_sample = now
+        self.throughput.emit(sample)
+
     def run(self):
         try:
             if self._cancelled:
@@ -26,9 +184,8 @@ class SpeedTestWorker(QObject):
                     "error": "Teste de velocidade cancelado pelo usuário."
                 })
                 return
-            # Garante que o timeout seja inteiro (ThreadPoolExecutor exige int)
-            timeout = int(self.timeout) if self.timeout else 40
-            speedtest_instance = SpeedTest(cancel_flag=lambda: self._cancelled, progress_callback=self.progress.emit)
+            timeout = self.timeout or 40
+            speedtest_instance = self._speedtest(self.progress.emit)
             result = speedtest_instance.run_test(timeout=timeout, requirements=self.requirements)  # type: ignore
             if self._cancelled:
                 result["status"] = "cancelled"
@@ -37,6 +194,73 @@ class SpeedTestWorker(QObject):
         except Exception as e:
             self.error.emit(str(e))
 
+    def _speedtest(self, progress_callback):
+        return SpeedTest(
+            cancel_flag=lambda: self._cancelled,
+            progress_callback=progress_callback,
+            jitter_config=self.jitter_config,
+            tests=self.tests,
+            backend=self.backend,
+            throughput_config=self.throughput_config,
+            sample_callback=self._on_sample,
+            server_cache_config=self.server_cache_config,
+            server_selection_config=self.server_selection_config,
+            adaptive_config=self.adaptive_config,
+            phase_timeouts=self.phase_timeouts,
+            bufferbloat_config=self.bufferbloat_config,
+            recorder=self.recorder,
+        )
+
+class SessionWorker(SpeedTestWorker):
+    """
+    Testes de conexão e speedtest numa sessão só (ver nuvem.session): a descoberta do
+    servidor roda junto com as sondas TCP. Os sinais dos testes de conexão saem
+    antes dos do speedtest, na mesma ordem de quando rodavam em sequência.
+    """
+    network_progress = Signal(str)
+    network_result = Signal(list)
+    network_finished = Signal(list)
+
+    def run(self):
+        output = OrderedOutput()
+        try:
+            if self._cancelled:
+                self.finished.emit({
+                    "status": "cancelled",
+                    "error": "Teste de velocidade cancelado pelo usuário."
+                })
+                return
+
+            def connectivity():
+                return run_connectivity_tests(
+                    lambda message: output.send(CONNECTIVITY, self.network_progress.emit, message),
+                    lambda: self._cancelled,
+                    recorder=self.recorder,
+                )
+
+            def connectivity_done(resultados):
+                output.send(CONNECTIVITY, self.network_result.emit, resultados)
+                output.send(CONNECTIVITY, self.network_finished.emit, resultados)
+                output.close(CONNECTIVITY)
+
+            session = TestSession(
+                connectivity,
+                self._speedtest(lambda message: output.send(SPEEDTEST, self.progress.emit, message)),
+                timeout=self.timeout or 40,
+                requirements=self.requirements,
+                hosts=warmup_hosts(self.backend, self.throughput_config),
+            )
+            _, result = session.run(on_connectivity_done=connectivity_done)
+            if self._cancelled:
+                result["status"] = "cancelled"
+                result["error"] = "Teste de velocidade cancelado pelo usuário."
+            output.send(SPEEDTEST, self.finished.emit, result)
+        except Exception as e:
+            # Interrompe o speedtest que ainda estiver rodando em segundo plano
+            self.cancel()
+            output.close(CONNECTIVITY)
+            self.error.emit(str(e))
+
 class NetworkWorker(QObject):
     finished = Signal(list)
     progress = Signal(str)
@@ -50,35 +274,6 @@ class NetworkWorker(QObject):
         self._cancelled = True
 
     def run_tests(self):
-        self.progress.emit("Executando testes de conexão...")
-        config = load_config()
-        testes = config["tests"] if isinstance(config, dict) and "tests" in config else config
-        resultados = []
-
-        for teste in testes:
-            if not isinstance(teste, dict):
-                continue  # ignora entradas inválidas
-            if self._cancelled:
-                self.progress.emit("Testes de conexão cancelados.")
-                break
-            host = teste["host"]
-            port = teste["port"]
-            required = teste["required"]
-            description = teste.get("description", f"{host}:{port}")
-
-            # Progresso individual com descrição
-            self.progress.emit(f"Testando {description}...")
-
-            conectado = test_connection(host, port)
-            status = "OK" if conectado else "FALHA"
-            resultado = f"{description} - {status}"
-            self.progress.emit(resultado)  # Mostra resultado na interface
-            log(f"{description} ({host}:{port}) - {status}")
-
-            if not conectado and required:
-                resultados.append(f"FALHA CRÍTICA: {description}")
-            elif not conectado:
-                resultados.append(f"ALERTA: {description} falhou")
-
+        resultados = run_connectivity_tests(self.progress.emit, lambda: self._cancelled)
         self.result.emit(resultados)
         self.finished.emit(resultados)
@@ -0,0 +1,137 @@
+# nuvem/resolver.py
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Tempo de vida das resoluções em cache (segundos)
+DEFAULT_TTL = 300.0
+
+# Threads do executor de run_async (getaddrinfo e handshakes TLS bloqueantes)
+DEFAULT_WORKERS = 16
+
+
+class Resolution:
+    """
+    Resultado de uma resolução de nome: endereços e quanto custou o getaddrinfo.
+    """
+
+    __slots__ = ("host", "addresses", "dns_ms", "cached", "expires")
+
+    def __init__(self, host: str, addresses: List[Tuple[int, str]], dns_ms: float, expires: float, cached: bool = False):
+        self.host = host
+        self.addresses = addresses  # [(família, ip), ...] na ordem do getaddrinfo
+        self.dns_ms = dns_ms
+        self.expires = expires
+        self.cached = cached
+
+    @property
+    def ip(self) -> Optional[str]:
+        return self.addresses[0][1] if self.addresses else None
+
+
+class Resolver:
+    """
+    Cache de getaddrinfo por nome de host, com expiração por TTL.
+
+    Cada nome é resolvido uma única vez enquanto a entrada estiver válida;
+    chamadas concorrentes para o mesmo nome esperam a primeira resolução.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._cache: Dict[str, Resolution] = {}
+        self._lock = threading.Lock()
+        self._host_locks: Dict[str, threading.Lock] = {}
+
+    def _lookup(self, host: str) -> Optional[Resolution]:
+        entry = self._cache.get(host)
+        if entry is None:
+            return None
+        if entry.expires <= self._clock():
+            del self._cache[host]
+            return None
+        return entry
+
+    def resolve(self, host: str) -> Resolution:
+        """
+        Resolve `host` (ou devolve do cache). Levanta socket.gaierror em caso de falha.
+        """
+        with self._lock:
+            entry = self._lookup(host)
+            if entry is not None:
+                return Resolution(host, entry.addresses, entry.dns_ms, entry.expires, cached=True)
+            host_lock = self._host_locks.setdefault(host, threading.Lock())
+
+        with host_lock:
+            # Outra thread pode ter resolvido enquanto esperávamos
+            with self._lock:
+                entry = self._lookup(host)
+                if entry is not None:
+                    return Resolution(host, entry.addresses, entry.dns_ms, entry.expires, cached=True)
+
+            start = time.perf_counter()
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+            dns_ms = round((time.perf_counter() - start) * 1000, 2)
+
+            addresses = []
+            for family, _, _, _, sockaddr in infos:
+                address = (family, sockaddr[0])
+                if address not in addresses:
+                    addresses.append(address)
+            entry = Resolution(host, addresses, dns_ms, self._clock() + self.ttl)
+            with self._lock:
+                self._cache[host] = entry
+                self._host_locks.pop(host, None)
+            return entry
+
+    async def resolve_async(self, host: str) -> Resolution:
+        with self._lock:
+            entry = self._lookup(host)
+        if entry is not None:
+            return Resolution(host, entry.addresses, entry.dns_ms, entry.expires, cached=True)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.resolve, host)
+
+    def evict_expired(self):
+        with self._lock:
+            now = self._clock()
+            for host in [h for h, e in self._cache.items() if e.expires <= now]:
+                del self._cache[host]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Resolvedor compartilhado pela sessão
+default_resolver = Resolver()
+
+
+def run_async(coro, workers: int = DEFAULT_WORKERS):
+    """
+    Como asyncio.run, mas o executor padrão do loop (usado por resolve_async e
+    pelos handshakes TLS) é próprio e não é esperado no fim: um getaddrinfo ou
+    handshake travado fica na thread dele, e o retorno respeita os prazos das
+    corrotinas em vez de esperar a thread terminar.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="nuvem-async")
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(executor)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            pendentes = asyncio.all_tasks(loop)
+            for task in pendentes:
+                task.cancel()
+            if pendentes:
+                loop.run_until_complete(asyncio.gather(*pendentes, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            # close() não espera o executor padrão (ao contrário de asyncio.run)
+            loop.close()
@@ -0,0 +1,255 @@
+# nuvem/results.py
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from nuvem.config_model import ProbeTarget
+from nuvem.logger import LogWriter
+
+# Versão do formato dos registros; muda quando um campo mudar de sentido
+RECORD_VERSION = 1
+
+KIND_PROBE = "probe"
+KIND_THROUGHPUT = "throughput"
+KIND_SPEEDTEST = "speedtest"
+KIND_PING = "ping"
+
+VERDICT_OK = "ok"
+VERDICT_ALERT = "alert"
+VERDICT_FAIL = "fail"
+
+# Retenção padrão do JSONL (seção "history"); o que sai dele já está no history.db
+DEFAULT_MAX_AGE_DAYS = 90
+DEFAULT_MAX_MB = 20
+# Intervalo entre verificações de retenção num processo que fica aberto (monitor)
+RETENTION_CHECK_S = 3600
+
+# Métricas numéricas dos registros (o histórico guarda cada uma numa coluna)
+METRICS = (
+    "dns_ms", "connect_ms", "handshake_ms", "first_byte_ms",
+    "p50_ms", "p95_ms", "p99_ms", "failure_ratio",
+    "mbps", "download_mbps", "upload_mbps", "ping_ms", "jitter_ms", "packet_loss", "bufferbloat_ms",
+)
+
+
+def default_results_path() -> str:
+    user_dir = os.path.expandvars(r"%userprofile%/.nuvem")
+    return os.path.join(user_dir, "results", "results.jsonl")
+
+
+def probe_verdict(probe: dict, target: ProbeTarget) -> Tuple[str, Optional[str]]:
+    """
+    Veredito de uma sonda TCP frente ao destino do conf.json: (ok/alert/fail, motivo).
+    """
+    description = target.description
+    grave = VERDICT_FAIL if target.required else VERDICT_ALERT
+    if not probe["connected"]:
+        return grave, description if target.required else f"{description} falhou"
+    latency = probe.get("latency")
+    if target.max_p95_ms is not None and latency:
+        p95 = latency["p95_ms"]
+        if p95 is not None and p95 > target.max_p95_ms:
+            return grave, f"{description} com p95 acima do máximo: {p95} ms > {target.max_p95_ms} ms"
+    return VERDICT_OK, None
+
+
+def probe_record(probe: dict, target: ProbeTarget) -> Dict:
+    verdict, motivo = probe_verdict(probe, target)
+    record = {
+        "kind": KIND_PROBE,
+        "host": target.host,
+        "port": target.port,
+        "description": target.description,
+        "required": target.required,
+        "verdict": verdict,
+        "reason": motivo,
+        "error": probe.get("error"),
+        "dns_ms": probe.get("dns_ms"),
+        "dns_cached": probe.get("dns_cached"),
+        # Tempo até a recusa ou o timeout não é tempo de conexão: fica de fora das tendências
+        "connect_ms": probe.get("connect_ms") if probe["connected"] else None,
+        "handshake_ms": probe.get("full_handshake_ms"),
+        "first_byte_ms": probe.get("first_byte_ms"),
+    }
+    latency = probe.get("latency")
+    if latency:
+        for field in ("p50_ms", "p95_ms", "p99_ms", "failure_ratio"):
+            record[field] = latency.get(field)
+        record["rtt"] = latency
+    return record
+
+
+def ping_record(ping: dict) -> Dict:
+    # ping: PingResult.summary() de nuvem.icmp
+    rtt = ping.get("rtt") or {}
+    return {
+        "kind": KIND_PING,
+        "host": ping["host"],
+        "description": f"ICMP {ping['host']}",
+        "verdict": VERDICT_OK if ping.get("received") else VERDICT_FAIL,
+        "error": ping.get("error"),
+        "ping_ms": rtt.get("p50_ms"),
+        "p50_ms": rtt.get("p50_ms"),
+        "p95_ms": rtt.get("p95_ms"),
+        "p99_ms": rtt.get("p99_ms"),
+        "packet_loss": ping.get("loss"),
+        "rtt": rtt,
+    }
+
+
+def throughput_record(phase: str, mbps: float, server: Optional[dict], min_mbps: Optional[float] = None,
+                      details: Optional[dict] = None) -> Dict:
+    record = {
+        "kind": KIND_THROUGHPUT,
+        "phase": phase,
+        "host": (server or {}).get("host"),
+        "description": (server or {}).get("name"),
+        "mbps": round(mbps, 2),
+        "verdict": VERDICT_FAIL if min_mbps is not None and mbps < min_mbps else VERDICT_OK,
+    }
+    if details:
+        # Campos do motor nativo que ajudam a explicar o número
+        for field in ("seconds", "streams", "mode", "early_stop", "ci_mbps", "errors"):
+            if field in details:
+                record[field] = details[field]
+    return record
+
+
+def speedtest_record(result: dict, server: Optional[dict]) -> Dict:
+    status = result.get("status")
+    bufferbloat = result.get("bufferbloat") or {}
+    return {
+        "kind": KIND_SPEEDTEST,
+        "host": (server or {}).get("host"),
+        "description": (server or {}).get("name"),
+        "verdict": VERDICT_OK if status == "success" else (VERDICT_FAIL if status == "failed" else status),
+        "reason": result.get("error"),
+        "errors": result.get("errors"),
+        "download_mbps": result.get("download"),
+        "upload_mbps": result.get("upload"),
+        "ping_ms": result.get("ping"),
+        "jitter_ms": result.get("jitter"),
+        "packet_loss": result.get("packet_loss"),
+        "bufferbloat_ms": bufferbloat.get("delta_ms"),
+        "bufferbloat_grade": result.get("bufferbloat_grade"),
+    }
+
+
+class _ResultsWriter(LogWriter):
+    """
+    LogWriter sem eco para o JSONL de resultados.
+
+    Ao abrir o arquivo (na thread do gravador, antes da primeira linha) e depois a
+    cada RETENTION_CHECK_S, consolida o JSONL no history.db e corta dele o que
+    passou da retenção. Se outro processo compactou o arquivo, reabre pelo caminho
+    em vez de seguir gravando no antigo.
+    """
+
+    def __init__(self, path: str, max_age_days: float, max_mb: float, db_path: Optional[str]):
+        super().__init__(path, echo=False, max_bytes=0)
+        self.max_age_days = max_age_days
+        self.max_mb = max_mb
+        self.db_path = db_path
+        self._checked = 0.0
+
+    def _open(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        except OSError:
+            pass
+        self._compact()
+        self._checked = time.monotonic()
+        return super()._open()
+
+    def _compact(self):
+        # history importa este módulo: import tardio
+        import sqlite3
+        from nuvem.history import HistoryStore
+        try:
+            store = HistoryStore(self.db_path, self.path)
+            try:
+                store.compact_results(self.max_age_days, self.max_mb)
+            finally:
+                store.close()
+        except (OSError, sqlite3.Error):
+            # Retenção é manutenção: sem ela o registro continua
+            pass
+
+    def _write_batch(self, lines, file):
+        if file is not None and (_replaced(file, self.path)
+                                 or time.monotonic() - self._checked >= RETENTION_CHECK_S):
+            file.close()
+            file = self._open()
+        return super()._write_batch(lines, file)
+
+
+def _replaced(file, path: str) -> bool:
+    try:
+        return os.fstat(file.fileno()).st_ino != os.stat(path).st_ino
+    except OSError:
+        return True
+
+
+# Um gravador por arquivo, compartilhado pelos ResultRecorder do processo
+_writers: Dict[str, _ResultsWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def _shared_writer(path: str, max_age_days: float, max_mb: float, db_path: Optional[str]) -> _ResultsWriter:
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _ResultsWriter(path, max_age_days, max_mb, db_path)
+            atexit.register(writer.close)
+            _writers[path] = writer
+        return writer
+
+
+class ResultRecorder:
+    """
+    Acrescenta registros de resultado a um arquivo JSONL (um objeto por linha).
+
+    Cada linha traz versão, instante (epoch), sessão e origem, além dos campos
+    do registro. `record()` só enfileira a linha: a gravação é feita em lotes
+    pela thread de um LogWriter, com o arquivo aberto, como no log. O arquivo
+    guarda os últimos `max_age_days` dias (até `max_mb`); antes do corte tudo é
+    consolidado no history.db. Seguro para chamadas de várias threads.
+    """
+
+    def __init__(self, path: Optional[str] = None, source: str = "app", session: Optional[str] = None,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS, max_mb: float = DEFAULT_MAX_MB,
+                 db_path: Optional[str] = None):
+        self.path = path or default_results_path()
+        self.source = source
+        # Identifica os registros de uma mesma rodada (testes de conexão + speedtest)
+        self.session = session or uuid.uuid4().hex[:12]
+        self._writer = _shared_writer(self.path, max_age_days, max_mb, db_path)
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], source: str = "app") -> Optional["ResultRecorder"]:
+        section = section or {}
+        if not section.get("enabled", True):
+            return None
+        return cls(
+            section.get("results_path") or None,
+            source=source,
+            max_age_days=section.get("results_max_age_days", DEFAULT_MAX_AGE_DAYS),
+            max_mb=section.get("results_max_mb", DEFAULT_MAX_MB),
+            db_path=section.get("db_path") or None,
+        )
+
+    def record(self, record: dict):
+        line = {"v": RECORD_VERSION, "ts": round(time.time(), 3), "session": self.session, "source": self.source}
+        line.update(record)
+        # Uma linha por registro, gravada inteira pelo LogWriter: leitores nunca veem meio registro
+        self._writer.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")))
+
+    def flush(self, timeout: float = 5.0):
+        """
+        Espera os registros já feitos chegarem ao arquivo.
+        """
+        self._writer.flush(timeout)
@@ -0,0 +1,65 @@
+# nuvem/ringbuffer.py
+from array import array
+from typing import Iterator, Optional, Tuple
+
+
+class RingBuffer:
+    """
+    Buffer circular de amostras em colunas de tamanho fixo (arrays).
+
+    Toda a memória é alocada na criação; ao encher, a amostra mais antiga
+    é sobrescrita. Cada amostra é (timestamp, chave, valor, ok).
+    """
+
+    __slots__ = ("capacity", "_ts", "_key", "_value", "_ok", "_next", "_size")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("Capacidade do buffer deve ser maior que zero.")
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._key = array("H", bytes(2 * capacity))
+        self._value = array("f", bytes(4 * capacity))
+        self._ok = array("b", bytes(capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, timestamp: float, key: int, value: float, ok: bool = True):
+        i = self._next
+        self._ts[i] = timestamp
+        self._key[i] = key
+        self._value[i] = value
+        self._ok[i] = 1 if ok else 0
+        self._next = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def _indexes(self) -> Iterator[int]:
+        start = (self._next - self._size) % self.capacity
+        for offset in range(self._size):
+            yield (start + offset) % self.capacity
+
+    def __iter__(self) -> Iterator[Tuple[float, int, float, bool]]:
+        for i in self._indexes():
+            yield self._ts[i], self._key[i], self._value[i], bool(self._ok[i])
+
+    def values(self, key: int, since: Optional[float] = None) -> Tuple[array, int]:
+        """
+        Valores das amostras bem-sucedidas de `key` (desde `since`) e o total de falhas.
+        """
+        values = array("d")
+        failures = 0
+        for i in self._indexes():
+            if self._key[i] != key or (since is not None and self._ts[i] < since):
+                continue
+            if self._ok[i]:
+                values.append(self._value[i])
+            else:
+                failures += 1
+        return values, failures
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self._ts, self._key, self._value, self._ok))
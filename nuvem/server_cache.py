@@ -0,0 +1,174 @@
+# nuvem/server_cache.py
+import ctypes
+import json
+import os
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+from nuvem.logger import log
+
+# Valores padrão da seção "server_cache" do conf.json
+DEFAULT_SERVERS_TTL_H = 168
+DEFAULT_BEST_TTL_H = 24
+DEFAULT_MAX_LATENCY_FACTOR = 1.5
+
+CACHE_VERSION = 2
+
+# Destino usado para descobrir a rota de saída (TEST-NET-1, nunca é contatado)
+_PROBE_ADDR = "192.0.2.1"
+# dwForwardType de uma rota que passa por um gateway (a rota direta é 3)
+_MIB_IPROUTE_TYPE_INDIRECT = 4
+
+
+def default_cache_path() -> str:
+    user_dir = os.path.expandvars(r"%userprofile%/.nuvem")
+    return os.path.join(user_dir, "cache", "speedtest_servers.json")
+
+
+def _local_ip() -> Optional[str]:
+    # IP da interface de saída; connect() em UDP não envia pacotes
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect((_PROBE_ADDR, 80))
+            return sock.getsockname()[0]
+    except OSError:
+        return None
+
+
+def _linux_gateway(lines) -> Optional[str]:
+    # Linhas de /proc/net/route: a rota padrão tem destino 00000000; o gateway vem em hex little-endian
+    for line in list(lines)[1:]:
+        fields = line.split()
+        if len(fields) > 2 and fields[1] == "00000000":
+            return socket.inet_ntoa(bytes.fromhex(fields[2])[::-1])
+    return None
+
+
+class _MibIpForwardRow(ctypes.Structure):
+    # MIB_IPFORWARDROW do iphlpapi (endereços em ordem de rede dentro do DWORD)
+    _fields_ = [(name, ctypes.c_uint32) for name in (
+        "dwForwardDest", "dwForwardMask", "dwForwardPolicy", "dwForwardNextHop", "dwForwardIfIndex",
+        "dwForwardType", "dwForwardProto", "dwForwardAge", "dwForwardNextHopAS",
+        "dwForwardMetric1", "dwForwardMetric2", "dwForwardMetric3", "dwForwardMetric4", "dwForwardMetric5",
+    )]
+
+
+def _windows_gateway(iphlpapi=None) -> Optional[str]:
+    # GetBestRoute devolve o próximo salto da rota de saída, sem abrir route print/ipconfig
+    if iphlpapi is None:
+        iphlpapi = ctypes.windll.iphlpapi
+    row = _MibIpForwardRow()
+    dest = int.from_bytes(socket.inet_aton(_PROBE_ADDR), "little")
+    if iphlpapi.GetBestRoute(dest, 0, ctypes.byref(row)) != 0:
+        return None
+    if row.dwForwardType != _MIB_IPROUTE_TYPE_INDIRECT:
+        # Destino na própria rede: não há gateway
+        return None
+    return socket.inet_ntoa(row.dwForwardNextHop.to_bytes(4, "little"))
+
+
+def _default_gateway() -> Optional[str]:
+    # Gateway IPv4 padrão, lido sem abrir processos: /proc/net/route no Linux, iphlpapi no Windows
+    try:
+        if sys.platform == "win32":
+            return _windows_gateway()
+        with open("/proc/net/route", "r", encoding="ascii") as f:
+            return _linux_gateway(f)
+    except (OSError, ValueError, AttributeError):
+        # Sem /proc (macOS etc.) ou sem iphlpapi: a rede fica identificada só pelos IPs
+        return None
+
+
+def network_fingerprint(public_ip: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """
+    Identifica a rede atual (IP público, IP local e gateway). Mudou a rede, o cache não vale.
+    """
+    return {"public_ip": public_ip, "local_ip": _local_ip(), "gateway": _default_gateway()}
+
+
+class ServerCache:
+    """
+    Cache em disco da lista de servidores do speedtest.net e dos últimos melhores servidores.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        servers_ttl_h: float = DEFAULT_SERVERS_TTL_H,
+        best_ttl_h: float = DEFAULT_BEST_TTL_H,
+        max_latency_factor: float = DEFAULT_MAX_LATENCY_FACTOR,
+    ):
+        self.path = path or default_cache_path()
+        self.servers_ttl = servers_ttl_h * 3600
+        self.best_ttl = best_ttl_h * 3600
+        self.max_latency_factor = max_latency_factor
+        self._data: Dict = {}
+
+    @classmethod
+    def from_config(cls, section: Optional[dict]) -> "ServerCache":
+        section = section or {}
+        return cls(
+            path=section.get("path"),
+            servers_ttl_h=section.get("servers_ttl_h", DEFAULT_SERVERS_TTL_H),
+            best_ttl_h=section.get("best_ttl_h", DEFAULT_BEST_TTL_H),
+            max_latency_factor=section.get("max_latency_factor", DEFAULT_MAX_LATENCY_FACTOR),
+        )
+
+    def load(self, fingerprint: Dict) -> bool:
+        """
+        Lê o cache; descarta se for de outra versão ou de outra rede.
+        """
+        self._data = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != CACHE_VERSION:
+            return False
+        if data.get("fingerprint") != fingerprint:
+            log("Cache de servidores ignorado: a rede mudou.")
+            return False
+        self._data = data
+        return True
+
+    def _fresh(self, key: str, ttl: float) -> bool:
+        saved_at = self._data.get(f"{key}_saved_at")
+        return saved_at is not None and time.time() - saved_at < ttl
+
+    def servers(self) -> Optional[List[dict]]:
+        if not self._fresh("servers", self.servers_ttl):
+            return None
+        return self._data.get("servers") or None
+
+    def best(self) -> List[dict]:
+        if not self._fresh("best", self.best_ttl):
+            return []
+        return self._data.get("best", [])
+
+    def accepts(self, cached: dict, measured_latency: float) -> bool:
+        # A revalidação aceita o servidor se a latência não piorou demais
+        return measured_latency <= cached.get("latency", 0) * self.max_latency_factor + 5
+
+    def save(self, fingerprint: Dict, servers: Optional[List[dict]] = None, best: Optional[List[dict]] = None):
+        now = time.time()
+        data = dict(self._data) if self._data.get("fingerprint") == fingerprint else {}
+        data["version"] = CACHE_VERSION
+        data["fingerprint"] = fingerprint
+        if servers is not None:
+            data["servers"] = servers
+            data["servers_saved_at"] = now
+        if best is not None:
+            data["best"] = best
+            data["best_saved_at"] = now
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._data = data
+        except OSError as e:
+            log(f"Não foi possível gravar o cache de servidores: {e}")
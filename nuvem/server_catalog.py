@@ -0,0 +1,249 @@
+# nuvem/server_catalog.py
+import gzip
+import heapq
+import math
+import time
+import urllib.request
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from nuvem.logger import log
+
+# Mesmas listas consultadas pelo speedtest-cli, na mesma ordem
+SERVER_LIST_URLS = (
+    "https://www.speedtest.net/speedtest-servers-static.php",
+    "http://c.speedtest.net/speedtest-servers-static.php",
+    "https://www.speedtest.net/speedtest-servers.php",
+    "http://c.speedtest.net/speedtest-servers.php",
+)
+DEFAULT_TIMEOUT = 10.0
+
+EARTH_RADIUS_KM = 6371.0
+
+# Campos de texto guardados por servidor (os demais atributos do XML são descartados)
+TEXT_FIELDS = ("url", "name", "country", "cc", "sponsor", "host")
+
+
+def _unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    # Pontos na esfera unitária: a distância euclidiana (corda) cresce com a
+    # distância geodésica e não há descontinuidade no antimeridiano
+    lat_r = math.radians(lat)
+    lon_r = math.radians(lon)
+    cos_lat = math.cos(lat_r)
+    return cos_lat * math.cos(lon_r), cos_lat * math.sin(lon_r), math.sin(lat_r)
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class ServerCatalog:
+    """
+    Catálogo compacto dos servidores do speedtest.net com índice espacial.
+
+    Coordenadas e ids ficam em arrays; os textos, em listas paralelas. O índice
+    é uma k-d tree implícita sobre os pontos 3D (ordem dos nós num array),
+    construída uma vez; `nearest()` devolve os K servidores mais próximos.
+    """
+
+    __slots__ = ("_id", "_lat", "_lon", "_xyz", "_text", "_tree", "_axis")
+
+    def __init__(self):
+        self._id = array("q")
+        self._lat = array("d")
+        self._lon = array("d")
+        self._xyz = array("d")
+        self._text: List[List[str]] = [[] for _ in TEXT_FIELDS]
+        self._tree = array("l")
+        self._axis = array("b")
+
+    def __len__(self) -> int:
+        return len(self._id)
+
+    def _add(self, server_id: int, lat: float, lon: float, texts: Iterable[str]):
+        self._id.append(server_id)
+        self._lat.append(lat)
+        self._lon.append(lon)
+        self._xyz.extend(_unit_vector(lat, lon))
+        for column, value in zip(self._text, texts):
+            column.append(value)
+
+    # Construção ---------------------------------------------------------------
+
+    @classmethod
+    def parse(cls, stream, exclude: Iterable[int] = ()) -> "ServerCatalog":
+        """
+        Lê o XML da lista de servidores de forma incremental (iterparse).
+
+        Cada elemento <server> é descartado logo após a leitura, então a árvore
+        do documento nunca fica inteira em memória.
+        """
+        catalog = cls()
+        exclude = set(exclude)
+        add = catalog._add
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "start" or elem.tag != "server":
+                continue
+            attrib = elem.attrib
+            try:
+                server_id = int(attrib["id"])
+                if server_id not in exclude:
+                    add(server_id, float(attrib["lat"]), float(attrib["lon"]),
+                        [attrib.get(field, "") for field in TEXT_FIELDS])
+            except (KeyError, ValueError):
+                pass
+            # Descarta o elemento já lido (e a referência que o pai guarda dele)
+            elem.clear()
+            root.clear()
+        catalog._build_index()
+        return catalog
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "ServerCatalog":
+        """
+        Reconstrói o catálogo a partir de `records()` (ex.: lido do cache em disco).
+        """
+        catalog = cls()
+        for record in records:
+            try:
+                catalog._add(int(record["id"]), float(record["lat"]), float(record["lon"]),
+                             (record.get(field, "") for field in TEXT_FIELDS))
+            except (KeyError, ValueError, TypeError):
+                continue
+        catalog._build_index()
+        return catalog
+
+    def _build_index(self):
+        count = len(self)
+        order = list(range(count))
+        axis = [0] * count
+        keys = [self._xyz[dim::3].__getitem__ for dim in range(3)]
+        # Pilha explícita: (início, fim, profundidade); o nó de cada faixa fica no meio dela
+        stack = [(0, count, 0)]
+        while stack:
+            lo, hi, depth = stack.pop()
+            if hi - lo <= 0:
+                continue
+            dim = depth % 3
+            order[lo:hi] = sorted(order[lo:hi], key=keys[dim])
+            mid = (lo + hi) // 2
+            axis[mid] = dim
+            stack.append((lo, mid, depth + 1))
+            stack.append((mid + 1, hi, depth + 1))
+        self._tree = array("l", order)
+        self._axis = array("b", axis)
+
+    # Consulta -----------------------------------------------------------------
+
+    def nearest(self, lat: float, lon: float, k: int = 5) -> List[Tuple[float, int]]:
+        """
+        Os `k` servidores mais próximos de (lat, lon): lista de (distância em km, índice).
+        """
+        if k <= 0 or not len(self):
+            return []
+        query = _unit_vector(lat, lon)
+        xyz = self._xyz
+        tree = self._tree
+        axis = self._axis
+        # Heap de máximo (distâncias negativas) com os k melhores até agora
+        best: List[Tuple[float, int]] = []
+
+        def visit(lo: int, hi: int):
+            if hi <= lo:
+                return
+            mid = (lo + hi) // 2
+            i = tree[mid]
+            base = 3 * i
+            dx = xyz[base] - query[0]
+            dy = xyz[base + 1] - query[1]
+            dz = xyz[base + 2] - query[2]
+            dist2 = dx * dx + dy * dy + dz * dz
+            if len(best) < k:
+                heapq.heappush(best, (-dist2, i))
+            elif dist2 < -best[0][0]:
+                heapq.heapreplace(best, (-dist2, i))
+            dim = axis[mid]
+            diff = query[dim] - xyz[base + dim]
+            if diff < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            visit(*near)
+            # Só desce no outro lado se o plano de corte estiver mais perto que o pior dos k
+            if len(best) < k or diff * diff < -best[0][0]:
+                visit(*far)
+
+        visit(0, len(tree))
+        return sorted((_chord_to_km(math.sqrt(-neg)), i) for neg, i in best)
+
+    def server(self, index: int, distance_km: Optional[float] = None) -> Dict:
+        """
+        Servidor no formato do speedtest-cli (atributos em texto e "d" em km).
+        """
+        server = {field: column[index] for field, column in zip(TEXT_FIELDS, self._text)}
+        server["id"] = str(self._id[index])
+        server["lat"] = str(self._lat[index])
+        server["lon"] = str(self._lon[index])
+        if distance_km is not None:
+            server["d"] = distance_km
+        return server
+
+    def nearest_servers(self, lat: float, lon: float, k: int = 5) -> List[Dict]:
+        return [self.server(i, d) for d, i in self.nearest(lat, lon, k)]
+
+    def records(self) -> List[Dict]:
+        return [self.server(i) for i in range(len(self))]
+
+
+class _DeadlineStream:
+    # Leitura que desiste no prazo, mesmo com o servidor mandando bytes aos poucos
+    def __init__(self, stream, deadline: float):
+        # read1 devolve o que já chegou; read(n) esperaria n bytes ou o fim da resposta
+        self._read = getattr(stream, "read1", stream.read)
+        self.deadline = deadline
+
+    def read(self, size: int = -1) -> bytes:
+        if time.monotonic() >= self.deadline:
+            raise TimeoutError("prazo esgotado")
+        return self._read(size)
+
+
+def fetch_catalog(
+    urls: Iterable[str] = SERVER_LIST_URLS,
+    timeout: float = DEFAULT_TIMEOUT,
+    exclude: Iterable[int] = (),
+    deadline: Optional[float] = None,
+) -> ServerCatalog:
+    """
+    Baixa a lista de servidores e a interpreta enquanto os bytes chegam.
+
+    `timeout` vale por operação de socket; `deadline` (time.monotonic()) limita o
+    download inteiro, somando as tentativas em todas as URLs.
+    """
+    errors = []
+    for url in urls:
+        limite = timeout
+        if deadline is not None:
+            limite = min(timeout, deadline - time.monotonic())
+            if limite <= 0:
+                errors.append(f"{url}: prazo esgotado")
+                break
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip", "User-Agent": "Nuvem.Test"})
+        try:
+            with urllib.request.urlopen(request, timeout=limite) as response:
+                stream = response
+                if response.headers.get("Content-Encoding") == "gzip":
+                    stream = gzip.GzipFile(fileobj=response)
+                if deadline is not None:
+                    stream = _DeadlineStream(stream, deadline)
+                catalog = ServerCatalog.parse(stream, exclude)
+            if len(catalog):
+                return catalog
+            errors.append(f"{url}: lista vazia")
+        except (OSError, ET.ParseError, EOFError) as e:
+            errors.append(f"{url}: {e}")
+    log(f"Falha ao obter a lista de servidores: {'; '.join(errors)}")
+    raise OSError("Não foi possível obter a lista de servidores do speedtest.net.")
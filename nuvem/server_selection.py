@@ -0,0 +1,165 @@
+# nuvem/server_selection.py
+import asyncio
+import bisect
+import math
+import os
+import ssl
+import time
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from nuvem.resolver import Resolver, default_resolver, run_async
+
+# Valores padrão da seção "server_selection" do conf.json
+DEFAULT_CANDIDATES = 10
+DEFAULT_DEADLINE_S = 5.0
+DEFAULT_KEEP = 3
+DEFAULT_REQUEST_TIMEOUT_S = 2.0
+
+# Requisições a latency.txt por candidato, como no speedtest-cli
+LATENCY_REQUESTS = 3
+# Valor (segundos) que o speedtest-cli soma para uma requisição que falhou
+FAILED_REQUEST_S = 3600
+
+# Intervalo de reavaliação dos candidatos em andamento
+PRUNE_INTERVAL = 0.02
+
+
+class _Candidate:
+    __slots__ = ("server", "total_s", "request_start", "failures", "status")
+
+    def __init__(self, server: dict):
+        self.server = server
+        self.total_s = 0.0
+        self.request_start: Optional[float] = None
+        self.failures = 0
+        self.status = "pendente"
+
+    def elapsed_s(self, now: float) -> float:
+        # Soma já acumulada mais o tempo da requisição em andamento
+        running = now - self.request_start if self.request_start is not None else 0.0
+        return self.total_s + running
+
+
+async def _latency_request(host: str, ip: str, port: int, path: str, context, timeout: float) -> Optional[float]:
+    # Nova conexão por requisição, como o speedtest-cli: o tempo inclui o connect
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(ip, port, ssl=context, server_hostname=host if context else None), timeout
+    )
+    try:
+        writer.write(
+            f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Nuvem.Test\r\nConnection: close\r\n\r\n".encode()
+        )
+        remaining = max(0.01, timeout - (time.perf_counter() - start))
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), remaining)
+        elapsed = time.perf_counter() - start
+        status = head.split(b" ", 2)[1] if head.startswith(b"HTTP/") else b""
+        if b"transfer-encoding: chunked" in head.lower():
+            await asyncio.wait_for(reader.readline(), remaining)
+        body = await asyncio.wait_for(reader.readexactly(9), remaining)
+    finally:
+        writer.close()
+    return elapsed if status == b"200" and body == b"test=test" else None
+
+
+async def _probe_candidate(candidate: _Candidate, resolver: Resolver, request_timeout: float):
+    base = urlsplit(os.path.dirname(candidate.server["url"]))
+    host = base.hostname
+    port = base.port or (443 if base.scheme == "https" else 80)
+    context = ssl.create_default_context() if base.scheme == "https" else None
+    stamp = int(time.time() * 1000)
+    try:
+        resolution = await asyncio.wait_for(resolver.resolve_async(host), request_timeout)
+        ip = resolution.ip
+    except (OSError, asyncio.TimeoutError):
+        candidate.failures = LATENCY_REQUESTS
+        candidate.total_s = LATENCY_REQUESTS * FAILED_REQUEST_S
+        candidate.status = "falha"
+        return candidate
+    for i in range(LATENCY_REQUESTS):
+        candidate.request_start = time.perf_counter()
+        try:
+            elapsed = await _latency_request(
+                host, ip, port, f"{base.path}/latency.txt?x={stamp}.{i}", context, request_timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            elapsed = None
+        candidate.request_start = None
+        if elapsed is None:
+            candidate.failures += 1
+            elapsed = FAILED_REQUEST_S
+        candidate.total_s += elapsed
+    candidate.status = "falha" if candidate.failures == LATENCY_REQUESTS else "medido"
+    return candidate
+
+
+async def _rank(servers, deadline_s, keep, request_timeout, cancel_flag, resolver) -> List[_Candidate]:
+    candidates = [_Candidate(server) for server in servers]
+    tasks = {asyncio.ensure_future(_probe_candidate(c, resolver, request_timeout)): c for c in candidates}
+    # Somas dos candidatos concluídos, em ordem; o `keep`-ésimo é o corte para os demais
+    finished: List[float] = []
+    end = time.perf_counter() + deadline_s
+    pending = set(tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, timeout=PRUNE_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            candidate = future.result()
+            if candidate.status == "medido":
+                bisect.insort(finished, candidate.total_s)
+        cutoff = finished[keep - 1] if len(finished) >= keep else math.inf
+        now = time.perf_counter()
+        stop_all = now >= end or (cancel_flag and cancel_flag())
+        drop = set()
+        for future in pending:
+            candidate = tasks[future]
+            if stop_all:
+                candidate.status = "prazo"
+                drop.add(future)
+            elif candidate.elapsed_s(now) >= cutoff:
+                # Já não consegue ficar entre os `keep` melhores (uma falha soma 3600 s)
+                candidate.status = "descartado"
+                drop.add(future)
+        for future in drop:
+            future.cancel()
+        if drop:
+            await asyncio.gather(*drop, return_exceptions=True)
+            pending -= drop
+    return candidates
+
+
+def rank_servers(
+    servers: List[dict],
+    deadline_s: float = DEFAULT_DEADLINE_S,
+    keep: int = DEFAULT_KEEP,
+    request_timeout_s: float = DEFAULT_REQUEST_TIMEOUT_S,
+    cancel_flag: Optional[Callable[[], bool]] = None,
+    resolver: Optional[Resolver] = None,
+) -> Dict[str, List[dict]]:
+    """
+    Mede a latência HTTP (latency.txt) de todos os candidatos ao mesmo tempo.
+
+    Todos compartilham o prazo `deadline_s`. Um candidato é descartado assim que
+    o tempo acumulado já não o deixa entre os `keep` melhores concluídos, então
+    os lentos não seguram a seleção. A latência usa a mesma conta do
+    speedtest-cli (soma de 3 requisições / 6, em ms, com 3600 s por falha).
+
+    Retorna {"ranked": servidores medidos do mais rápido ao mais lento, cada um
+    com "latency"; "dropped": os descartados, com "status"}.
+    """
+    resolver = resolver or default_resolver
+    # run_async: um getaddrinfo travado não segura o retorno depois de `deadline_s`
+    candidates = run_async(_rank(servers, deadline_s, max(1, keep), request_timeout_s, cancel_flag, resolver),
+                           workers=len(servers))
+    ranked = []
+    dropped = []
+    for candidate in candidates:
+        server = dict(candidate.server)
+        if candidate.status == "medido":
+            server["latency"] = round(candidate.total_s / (2 * LATENCY_REQUESTS) * 1000, 3)
+            ranked.append(server)
+        else:
+            server["status"] = candidate.status
+            dropped.append(server)
+    ranked.sort(key=lambda s: s["latency"])
+    return {"ranked": ranked, "dropped": dropped}
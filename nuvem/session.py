@@ -0,0 +1,154 @@
+# nuvem/session.py
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from nuvem.config_model import SpeedRequirements
+from nuvem.logger import log
+from nuvem.resolver import Resolver, default_resolver
+from nuvem.speedtest_worker import SpeedTest, BACKEND_NATIVE
+
+# Hosts do speedtest.net usados na configuração e na lista de servidores
+SPEEDTEST_HOSTS = ("www.speedtest.net", "c.speedtest.net")
+
+# Seções da saída, na ordem em que aparecem na interface
+CONNECTIVITY = "connectivity"
+SPEEDTEST = "speedtest"
+SECTIONS = (CONNECTIVITY, SPEEDTEST)
+
+
+class OrderedOutput:
+    """
+    Entrega mensagens de etapas concorrentes na ordem fixa das seções.
+
+    As mensagens da seção atual saem na hora; as de uma seção posterior ficam
+    retidas e são liberadas, na ordem em que chegaram, quando as anteriores
+    forem fechadas com `close()`.
+    """
+
+    def __init__(self, sections: Iterable[str] = SECTIONS):
+        self._sections = list(sections)
+        self._current = 0
+        self._pending: Dict[str, list] = {section: [] for section in self._sections}
+        self._closed = set()
+        self._lock = threading.Lock()
+
+    def send(self, section: str, callback: Callable, *args):
+        with self._lock:
+            if self._current < len(self._sections) and self._sections[self._current] != section:
+                self._pending[section].append((callback, args))
+                return
+        callback(*args)
+
+    def close(self, section: str):
+        with self._lock:
+            self._closed.add(section)
+            liberadas = []
+            while self._current < len(self._sections) and self._sections[self._current] in self._closed:
+                self._current += 1
+                if self._current < len(self._sections):
+                    proxima = self._sections[self._current]
+                    liberadas.extend(self._pending[proxima])
+                    self._pending[proxima] = []
+            # Entregues ainda sob o lock, para não cruzar com mensagens novas da seção liberada
+            for callback, args in liberadas:
+                callback(*args)
+
+
+def warmup_hosts(backend: str, throughput_config: Optional[dict]) -> List[str]:
+    """
+    Nomes que o speedtest vai resolver antes de medir.
+    """
+    url = (throughput_config or {}).get("download_url")
+    if backend == BACKEND_NATIVE and url:
+        return [urlsplit(url).hostname]
+    return list(SPEEDTEST_HOSTS)
+
+
+def warm_dns(hosts: Iterable[str], resolver: Optional[Resolver] = None) -> Dict[str, Optional[float]]:
+    """
+    Resolve os nomes em paralelo, preenchendo o cache do resolvedor (e o do sistema).
+
+    Retorna {host: tempo em ms, ou None se falhou}.
+    """
+    resolver = resolver or default_resolver
+    tempos: Dict[str, Optional[float]] = {}
+
+    def resolve(host):
+        try:
+            tempos[host] = resolver.resolve(host).dns_ms
+        except (OSError, UnicodeError) as e:
+            tempos[host] = None
+            log(f"Pré-resolução de {host} falhou: {e}")
+
+    threads = [threading.Thread(target=resolve, args=(host,), name=f"dns-{host}", daemon=True) for host in hosts if host]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(socket.getdefaulttimeout() or 10)
+    return tempos
+
+
+class TestSession:
+    """
+    Uma rodada completa: testes de conexão e speedtest.
+
+    Desde o início rodam em paralelo a pré-resolução de DNS, as sondas TCP e, no
+    speedtest, a configuração do speedtest.net e a escolha do servidor. Só as fases
+    que carregam o link (latência ociosa, download e upload) esperam as sondas
+    terminarem, para uma não distorcer a outra.
+    """
+
+    def __init__(
+        self,
+        connectivity: Callable[[], list],
+        speedtest: SpeedTest,
+        timeout: float = 40,
+        requirements: Optional[SpeedRequirements] = None,
+        hosts: Iterable[str] = (),
+        resolver: Optional[Resolver] = None,
+    ):
+        self.connectivity = connectivity
+        self.speedtest = speedtest
+        self.timeout = timeout
+        self.requirements = requirements or SpeedRequirements()
+        self.hosts = list(hosts)
+        self.resolver = resolver
+
+    def run(self, on_connectivity_done: Optional[Callable[[list], None]] = None):
+        """
+        Executa a sessão. `on_connectivity_done` recebe o resumo das sondas antes de
+        o speedtest começar a medir vazão.
+
+        Retorna (resumo das sondas, resultado do speedtest).
+        """
+        gate = threading.Event()
+        self.speedtest.bandwidth_gate = gate
+        inicio = time.monotonic()
+        saida = {}
+
+        dns = threading.Thread(target=warm_dns, args=(self.hosts, self.resolver), name="dns-warmup", daemon=True)
+        dns.start()
+
+        def speedtest_worker():
+            saida["result"] = self.speedtest.run_test(timeout=self.timeout, requirements=self.requirements)
+
+        thread = threading.Thread(target=speedtest_worker, name="session-speedtest", daemon=True)
+        thread.start()
+        try:
+            resultados = self.connectivity()
+            conexao_s = time.monotonic() - inicio
+            if on_connectivity_done:
+                on_connectivity_done(resultados)
+        finally:
+            # Libera download/upload mesmo se as sondas falharem
+            gate.set()
+        # run_test volta sozinho no prazo ou no cancelamento
+        thread.join()
+        total_s = time.monotonic() - inicio
+        result = saida.get("result") or {}
+        result["session"] = {"connectivity_s": round(conexao_s, 3), "total_s": round(total_s, 3)}
+        log(f"Sessão concluída em {total_s:.1f}s (testes de conexão {conexao_s:.1f}s, em paralelo com a descoberta)")
+        return resultados, result
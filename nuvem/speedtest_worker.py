@@ -1,94 +1,582 @@
 # nuvem/speedtest.py
 import speedtest
-from typing import Dict
+import os
+import threading
 import time
-import statistics
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit
 import traceback
 from nuvem.logger import log
-from nuvem.alternative_speedtest import AlternativeSpeedTestWindow
+from nuvem.async_probe import sample_tcp
+from nuvem.throughput import ThroughputEngine, ThroughputError
+from nuvem.adaptive import AdaptiveController, BELOW_MIN
+from nuvem.bufferbloat import (
+    LoadedLatencyProbe,
+    DEFAULT_IDLE_SAMPLES,
+    DEFAULT_INTERVAL_MS as DEFAULT_BUFFERBLOAT_INTERVAL_MS,
+    DEFAULT_TIMEOUT_MS as DEFAULT_BUFFERBLOAT_TIMEOUT_MS,
+)
+from nuvem.config_model import SpeedRequirements, compile_targets
+from nuvem.resolver import run_async
+from nuvem.results import throughput_record, speedtest_record
+from nuvem.server_cache import ServerCache, network_fingerprint
+from nuvem.server_catalog import ServerCatalog, fetch_catalog, DEFAULT_TIMEOUT as DEFAULT_CATALOG_TIMEOUT
+from nuvem.server_selection import (
+    rank_servers,
+    DEFAULT_CANDIDATES as DEFAULT_SELECTION_CANDIDATES,
+    DEFAULT_DEADLINE_S as DEFAULT_SELECTION_DEADLINE_S,
+    DEFAULT_KEEP as DEFAULT_SELECTION_KEEP,
+)
+from nuvem.jitter import (
+    JitterProbe,
+    DEFAULT_METHOD as DEFAULT_JITTER_METHOD,
+    options_from_config as jitter_options_from_config,
+)
+
+BACKEND_SPEEDTEST_CLI = "speedtest-cli"
+BACKEND_NATIVE = "native"
+
+# Prazos máximos por fase (segundos) da seção "speedtest_phases"; o total continua sendo o timeout de run_test
+DEFAULT_PHASE_TIMEOUTS = {"discovery": 15, "download": 15, "upload": 15}
+# Intervalo com que run_test verifica cancelamento e prazo enquanto a medição roda
+CANCEL_POLL_INTERVAL = 0.05
+# Tempo mínimo restante para iniciar download ou upload (segundos)
+MIN_PHASE_S = 1.0
+# Timeout de socket usado pelo speedtest-cli por padrão
+SPEEDTEST_CLI_TIMEOUT = 10
+# Prazo total padrão ("speedtest_timeout") e folga além das fases: ping, fim do jitter e resultado
+DEFAULT_TIMEOUT = 40
+TIMEOUT_MARGIN_S = 5
+
+
+def total_timeout(config: Mapping) -> float:
+    """
+    Prazo total do speedtest: `speedtest_timeout`, ampliado quando não cabe a soma de
+    "speedtest_phases" mais a latência ociosa do bufferbloat e uma folga.
+    """
+    budget = sum(dict(DEFAULT_PHASE_TIMEOUTS, **(config.get("speedtest_phases") or {})).values())
+    bufferbloat = config.get("bufferbloat") or {}
+    if bufferbloat.get("enabled", True):
+        # Mesmo teto de _start_bufferbloat: cada amostra ociosa pode esperar intervalo + timeout
+        por_amostra = (bufferbloat.get("interval_ms", DEFAULT_BUFFERBLOAT_INTERVAL_MS)
+                       + bufferbloat.get("timeout_ms", DEFAULT_BUFFERBLOAT_TIMEOUT_MS))
+        budget += int(bufferbloat.get("idle_samples", DEFAULT_IDLE_SAMPLES)) * por_amostra / 1000
+    return max(config.get("speedtest_timeout", DEFAULT_TIMEOUT), budget + TIMEOUT_MARGIN_S)
+
 
 class SpeedTest:
-    def __init__(self, cancel_flag=None, progress_callback=None):
+    def __init__(self, cancel_flag=None, progress_callback=None, jitter_config=None, tests=None,
+                 backend=BACKEND_SPEEDTEST_CLI, throughput_config=None, sample_callback=None,
+                 server_cache_config=None, server_selection_config=None, adaptive_config=None,
+                 phase_timeouts=None, bufferbloat_config=None, recorder=None):
         self.cancel_flag = cancel_flag
         self.progress_callback = progress_callback
+        # Amostras de vazão durante download/upload (também servem de heartbeat)
+        self.sample_callback = sample_callback
+        # Seção "jitter" e lista "tests" do conf.json
+        self.jitter_config = jitter_config or {}
+        self.tests = compile_targets(tests)
+        # "speedtest-cli" (padrão) ou "native" (nuvem.throughput, seção "throughput")
+        self.backend = backend or BACKEND_SPEEDTEST_CLI
+        self.throughput_config = throughput_config or {}
+        # Seção "server_cache" do conf.json
+        self.server_cache_config = server_cache_config or {}
+        # Seção "server_selection" do conf.json
+        self.server_selection_config = server_selection_config or {}
+        # Seção "adaptive" do conf.json: parada antecipada de download/upload no motor nativo
+        self.adaptive_config = adaptive_config or {}
+        # Requisitos da seção "speedtest", recebidos em run_test
+        self.requirements = SpeedRequirements()
+        # Servidores medidos na seleção, em ordem, para trocar se o escolhido falhar
+        self.runner_ups = []
+        # Seção "bufferbloat" do conf.json: latência ociosa x sob carga
+        self.bufferbloat_config = bufferbloat_config or {}
+        self._bufferbloat: Optional[LoadedLatencyProbe] = None
+        # Prazo por fase ("discovery", "download", "upload"), limitado ao que resta do total
+        self.phase_timeouts = dict(DEFAULT_PHASE_TIMEOUTS, **(phase_timeouts or {}))
+        # Sinalizado no cancelamento ou ao estourar o prazo; o speedtest-cli o usa como shutdown_event
+        self._abort = threading.Event()
+        self._deadline: Optional[float] = None
+        # Prazo da descoberta (catálogo, ranking e get_best_server), fixado ao iniciá-la
+        self._discovery_deadline: Optional[float] = None
+        # Numa sessão completa (nuvem.session), liberado quando os testes de conexão terminam
+        self.bandwidth_gate: Optional[threading.Event] = None
+        # Registros de resultado em JSONL (nuvem.results.ResultRecorder), se configurado
+        self.recorder = recorder
+        # Servidor da medição atual (muda no failover) e detalhes da última fase do motor nativo
+        self.server: Optional[dict] = None
+        self._last_measurement: Optional[dict] = None
 
-    def _run_test_worker(self):
+    def _cancelled(self) -> bool:
+        if self._abort.is_set():
+            return True
+        if self.cancel_flag and self.cancel_flag():
+            self._abort.set()
+            return True
+        return False
+
+    def _remaining(self) -> float:
+        if self._deadline is None:
+            return float("inf")
+        return max(0.0, self._deadline - time.monotonic())
+
+    def _expired(self, phase):
+        # Sem tempo para uma medição com sentido: melhor reportar o timeout que uma taxa de milissegundos
+        log(f"Prazo do speedtest esgotado antes do {phase}.")
+        return {"download": 0.0, "upload": 0.0, "ping": 0.0, "jitter": 0.0,
+                "status": "timeout", "error": "Speedtest excedeu o tempo limite"}
+
+    def _wait_bandwidth_gate(self):
+        # Download e upload não disputam o link com as sondas TCP da sessão
+        gate = self.bandwidth_gate
+        if gate is None or gate.is_set():
+            return
+        log("Servidor escolhido; aguardando o fim dos testes de conexão para medir a vazão.")
+        anterior = time.monotonic()
+        while not gate.wait(CANCEL_POLL_INTERVAL):
+            if self._cancelled():
+                return
+            # A espera não consome o prazo do speedtest
+            agora = time.monotonic()
+            if self._deadline is not None:
+                self._deadline += agora - anterior
+            anterior = agora
+        if self._deadline is not None:
+            self._deadline += time.monotonic() - anterior
+
+    def _phase_budget(self, phase) -> float:
+        return min(self.phase_timeouts.get(phase, self._remaining()), self._remaining())
+
+    def _discovery_remaining(self) -> float:
+        if self._discovery_deadline is None:
+            return self._remaining()
+        return min(max(0.0, self._discovery_deadline - time.monotonic()), self._remaining())
+
+    def _native_engine(self, best=None):
+        # Sem URL configurada, usa os arquivos do servidor escolhido pelo speedtest.net
+        overrides = {}
+        if not self.throughput_config.get("download_url") and best:
+            overrides["download_url"] = f"{os.path.dirname(best['url'])}/random4000x4000.jpg"
+            overrides["upload_url"] = best["url"]
+        return ThroughputEngine.from_config(
+            self.throughput_config,
+            cancel_flag=self._cancelled,
+            sample_callback=self.sample_callback,
+            controller_factory=self._controller,
+            **overrides
+        )
+
+    def _controller(self, phase):
+        # Mínimo exigido para a fase (requisitos obrigatórios da seção "speedtest")
+        return AdaptiveController.from_config(self.adaptive_config, min_mbps=self.requirements.min_mbps(phase))
+
+    def _load_catalog(self, st, cache):
+        # Catálogo de servidores: do cache em disco ou baixado e interpretado em streaming
+        records = cache.servers() if cache else None
+        if records:
+            catalog = ServerCatalog.from_records(records)
+            if len(catalog):
+                log(f"Usando lista de servidores em cache ({len(catalog)} servidores).")
+                return catalog, None
         try:
-            log("Iniciando Speedtest...")
-            if self.progress_callback:
-                self.progress_callback("Iniciando Speedtest...")
+            catalog = fetch_catalog(
+                timeout=max(0.5, min(DEFAULT_CATALOG_TIMEOUT, self._discovery_remaining())),
+                exclude=st.config.get("ignore_servers", []),
+                deadline=time.monotonic() + self._discovery_remaining(),
+            )
+        except OSError:
+            return None, None
+        log(f"Lista de servidores obtida ({len(catalog)} servidores).")
+        return catalog, catalog.records()
+
+    def _rank(self, servers):
+        opcoes = self.server_selection_config
+        resultado = rank_servers(
+            servers,
+            deadline_s=min(opcoes.get("deadline_s", DEFAULT_SELECTION_DEADLINE_S), self._discovery_remaining()),
+            keep=opcoes.get("keep", DEFAULT_SELECTION_KEEP),
+            cancel_flag=self._cancelled,
+        )
+        for server in resultado["ranked"]:
+            log(f"Latência {server.get('host')} ({server.get('name')}): {server['latency']} ms")
+        if resultado["dropped"]:
+            log(f"{len(resultado['dropped'])} candidato(s) descartado(s): "
+                + ", ".join(f"{s.get('host')} ({s['status']})" for s in resultado["dropped"]))
+        return resultado["ranked"]
+
+    def _apply_best(self, st, best):
+        # Mesmo estado que o get_best_server do speedtest-cli deixa no objeto
+        st._best.clear()
+        st._best.update(best)
+        st.results.server = best
+        st.results.ping = best["latency"]
+
+    def _select_server(self, st):
+        # Reaproveita o último melhor servidor (e a lista de servidores) gravados em disco
+        self.runner_ups = []
+        cache = None
+        if self.server_cache_config.get("enabled", True):
+            cache = ServerCache.from_config(self.server_cache_config)
+            fingerprint = network_fingerprint(st.config.get("client", {}).get("ip"))
+            cache.load(fingerprint)
+
+            anteriores = {s.get("id"): s for s in cache.best()}
+            if anteriores:
+                if self.progress_callback:
+                    self.progress_callback(f"Verificando {len(anteriores)} servidor(es) em cache...")
+                verificados = self._rank([dict(s) for s in anteriores.values()])
+                if verificados and cache.accepts(anteriores[verificados[0].get("id")], verificados[0]["latency"]):
+                    best = verificados[0]
+                    log(f"Servidor em cache confirmado: {best.get('host')} ({best['latency']} ms; "
+                        f"antes {anteriores[best.get('id')].get('latency')} ms)")
+                    self.runner_ups = verificados[1:]
+                    self._apply_best(st, best)
+                    cache.save(fingerprint, best=verificados)
+                    return best
+                log("Servidores em cache mais lentos ou inacessíveis; refazendo a descoberta.")
+
+        catalog, records = self._load_catalog(st, cache)
+        if not catalog:
+            # Sem catálogo, o speedtest-cli baixa a lista e mede os candidatos sozinho
+            best = self._best_server_cli(st)
+            if cache:
+                cache.save(fingerprint, best=[best])
+            return best
+
+        lat, lon = st.lat_lon
+        candidatos = catalog.nearest_servers(
+            lat, lon, int(self.server_selection_config.get("candidates", DEFAULT_SELECTION_CANDIDATES))
+        )
+        st.servers = {}
+        for server in candidatos:
+            st.servers.setdefault(server["d"], []).append(server)
+        if self.progress_callback:
+            self.progress_callback(f"Medindo latência de {len(candidatos)} servidores...")
+        ranked = self._rank(candidatos)
+        if not ranked:
+            raise speedtest.SpeedtestBestServerFailure("Não foi possível medir a latência dos servidores.")
+        best = ranked[0]
+        self.runner_ups = ranked[1:]
+        self._apply_best(st, best)
+        if cache:
+            cache.save(fingerprint, servers=records, best=ranked)
+        return best
+
+    def _best_server_cli(self, st):
+        # get_best_server abre conexões sem timeout: roda numa thread daemon e a espera
+        # termina no prazo da descoberta ou no cancelamento
+        saida = {}
+
+        def worker():
             try:
-                st = speedtest.Speedtest()
+                saida["best"] = st.get_best_server()
             except Exception as e:
-                log(f"Falha ao instanciar Speedtest: {e}")
-                error_msg = str(e)
-                if "403" in error_msg or "Forbidden" in error_msg:
-                    if self.progress_callback:
-                        self.progress_callback("Speedtest bloqueado pelo servidor (HTTP 403). Abrindo alternativa...")
-                    # Sinaliza para a interface abrir o fallback
-                    alt_window = AlternativeSpeedTestWindow()
-                    alt_window.show()
-                    return {"download": 0.0, "upload": 0.0, "ping": 0.0, "jitter": 0.0, "status": "blocked", "error": "Speedtest bloqueado pelo servidor (HTTP 403)."},
+                saida["error"] = e
+
+        thread = threading.Thread(target=worker, name="speedtest-best-server", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(min(CANCEL_POLL_INTERVAL, max(0.01, self._discovery_remaining())))
+            if thread.is_alive() and (self._cancelled() or self._discovery_remaining() <= 0):
+                raise speedtest.SpeedtestBestServerFailure("Descoberta do servidor excedeu o prazo.")
+        if "error" in saida:
+            raise saida["error"]
+        return saida["best"]
+
+    def _failover(self, st, phase, erro):
+        # Troca para o próximo servidor da lista já medida, sem nova descoberta
+        best = self.runner_ups.pop(0)
+        log(f"Falha no {phase} ({erro}); usando o servidor reserva {best.get('host')} ({best.get('name')})")
+        if self.progress_callback:
+            self.progress_callback(f"Servidor reserva: {best.get('name')} ({best.get('host')})")
+        self._apply_best(st, best)
+        self.server = best
+        return best
+
+    def _record_phase(self, phase, mbps):
+        if not self.recorder:
+            return
+        self.recorder.record(throughput_record(
+            phase, mbps, self.server, self.requirements.min_mbps(phase), details=self._last_measurement
+        ))
+
+    def _measure_phase(self, phase, st, engine):
+        self._last_measurement = None
+        if self._bufferbloat:
+            self._bufferbloat.set_phase(phase)
+        try:
+            return self._measure_with_failover(phase, st, engine)
+        finally:
+            if self._bufferbloat:
+                self._bufferbloat.set_phase(None)
+
+    def _measure_with_failover(self, phase, st, engine):
+        phase_deadline = time.monotonic() + self._phase_budget(phase)
+        while True:
+            try:
+                if engine:
+                    engine.deadline = phase_deadline
+                    medicao = getattr(engine, phase)()
+                    self._last_measurement = medicao
+                    log(f"{phase.capitalize()} nativo: {medicao}")
+                    mbps = medicao["mbps"]
+                    if medicao.get("early_stop") and self.progress_callback:
+                        motivo = "abaixo do mínimo" if medicao["early_stop"] == BELOW_MIN else "medição estável"
+                        self.progress_callback(
+                            f"{phase.capitalize()} encerrado em {medicao['seconds']}s ({motivo}, "
+                            f"IC 95% {medicao['ci_mbps'][0]}-{medicao['ci_mbps'][1]} Mbps)"
+                        )
                 else:
+                    # O speedtest-cli mede por um tempo fixo (config "length"): limita ao prazo da fase
+                    st.config["length"][phase] = max(1, min(st.config["length"][phase], phase_deadline - time.monotonic()))
+                    mbps = getattr(st, phase)(callback=self._heartbeat(phase)) / 1_000_000
+                if mbps > 0 or not (st and self.runner_ups) or self._cancelled() or time.monotonic() >= phase_deadline:
+                    return mbps, engine
+                erro = "nenhum byte transferido"
+            except (ThroughputError, speedtest.SpeedtestException) as e:
+                if not (st and self.runner_ups) or self._cancelled():
                     raise
-            log("Speedtest instanciado.")
-            if self.progress_callback:
-                self.progress_callback("Speedtest instanciado.")
-            # Obter melhor servidor uma vez só
-            log("Buscando melhor servidor...")
-            if self.progress_callback:
-                self.progress_callback("Determinando melhor servidor...")
-            best = st.get_best_server()
-            log(f"Melhor servidor obtido: {best.get('host')} ({best.get('name')})")
+                erro = e
+            best = self._failover(st, phase, erro)
+            if engine:
+                engine = self._native_engine(best)
+
+    def _heartbeat(self, phase):
+        # O speedtest-cli não expõe bytes parciais: repassa o avanço das requisições
+        done = {"count": 0}
+
+        def callback(current, total, start=False, end=False):
+            if not end or not self.sample_callback:
+                return
+            done["count"] += 1
+            self.sample_callback({
+                "phase": phase,
+                "heartbeat": True,
+                "requests_done": done["count"],
+                "requests_total": total,
+            })
+        return callback
+
+    def _native_ping(self, url):
+        # Ping pela mediana do tempo de conexão TCP ao servidor de vazão
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        probe = run_async(sample_tcp(parts.hostname, port, 5))
+        if not probe["connected"]:
+            raise ThroughputError(f"Servidor de vazão inacessível: {probe.get('error')}")
+        return probe["latency"]["p50_ms"]
+
+    def _jitter_targets(self, best=None):
+        # Destinos do jitter: hosts TOTVS de "tests" ou o servidor escolhido do speedtest
+        method = self.jitter_config.get("method", DEFAULT_JITTER_METHOD)
+        udp_port = self.jitter_config.get("udp_port", 7)
+        if self.jitter_config.get("target", "tests") == "tests" and self.tests:
+            return [(t.host, udp_port if method == "udp" else t.port) for t in self.tests]
+        if best:
+            host, _, port = best.get("host", "").rpartition(":")
+            if method == "udp":
+                return [(host, udp_port)]
+            return [(host, int(port) if port.isdigit() else 80)]
+        return []
+
+    def _start_bufferbloat(self, best):
+        # Hosts TOTVS de "tests" e o servidor do speedtest, medidos antes e durante a carga
+        method = self.bufferbloat_config.get("method", "tcp")
+        udp_port = self.bufferbloat_config.get("udp_port", 7)
+        targets = [(t.host, udp_port if method == "udp" else t.port) for t in self.tests]
+        if best:
+            host, _, port = best.get("host", "").rpartition(":")
+            targets.append((host, udp_port if method == "udp" else (int(port) if port.isdigit() else 80)))
+        probe = LoadedLatencyProbe.from_config(self.bufferbloat_config, targets, cancel_flag=self._cancelled)
+        if probe is None:
+            return None
+        log(f"Medindo latência ociosa ({probe.sampler.method}) em {len(targets)} destino(s)...")
+        if self.progress_callback:
+            self.progress_callback("Medindo latência com o link ocioso...")
+        probe.start()
+        probe.measure_idle(min(self._remaining(), probe.idle_samples * (probe.interval + probe.sampler.timeout)))
+        return probe
+
+    def _bufferbloat_summary(self):
+        probe, self._bufferbloat = self._bufferbloat, None
+        if probe is None:
+            return None
+        probe.stop()
+        resumo = probe.summary()
+        for item in resumo["targets"]:
+            log(
+                f"Latência sob carga {item['target']}: ociosa p50 {item['idle']['p50_ms']}/p95 {item['idle']['p95_ms']} ms, "
+                f"download p50 {item['download']['p50_ms']}/p95 {item['download']['p95_ms']} ms, "
+                f"upload p50 {item['upload']['p50_ms']}/p95 {item['upload']['p95_ms']} ms"
+                + (f", erro: {item['error']}" if item.get("error") else "")
+            )
+        if resumo["grade"] and self.progress_callback:
+            self.progress_callback(
+                f"Bufferbloat: nota {resumo['grade']} ({resumo['delta_ms']:+} ms no p{resumo['percentile']} "
+                f"durante o {resumo['worst_phase']}, {resumo['worst_target']})"
+            )
+        return resumo
+
+    def _wait_jitter(self, jitter_probe):
+        remaining = self._remaining()
+        return jitter_probe.wait(None if remaining == float("inf") else remaining)
+
+    def _start_jitter(self, best=None):
+        targets = self._jitter_targets(best)
+        if not targets:
+            return None
+        options = jitter_options_from_config(self.jitter_config)
+        log(f"Iniciando medição de jitter ({options['method']}) em {len(targets)} destino(s)...")
+        return JitterProbe(targets, cancel_flag=self._cancelled, **options).start()
+
+    def _run_test_worker(self):
+        try:
+            log("Iniciando Speedtest...")
             if self.progress_callback:
-                self.progress_callback(f"Melhor servidor: {best.get('name')} ({best.get('host')})")
+                self.progress_callback("Iniciando Speedtest...")
+            # Jitter contra os hosts TOTVS roda em paralelo com a descoberta do servidor
+            jitter_probe = self._start_jitter()
+            st = None
+            best = None
+            native_url = self.throughput_config.get("download_url")
+            if self.backend == BACKEND_NATIVE and native_url:
+                # Servidor próprio (ex.: dentro da rede TOTVS): sem descoberta no speedtest.net
+                log(f"Backend nativo: {native_url}")
+                parts = urlsplit(native_url)
+                port = parts.port or (443 if parts.scheme == "https" else 80)
+                best = {"name": "Servidor de vazão", "host": f"{parts.hostname}:{port}", "url": native_url}
+                if self.progress_callback:
+                    self.progress_callback(f"Melhor servidor: {best['name']} ({best['host']})")
+                ping = self._native_ping(native_url)
+                self.server = best
+            else:
+                # Um prazo só para a descoberta inteira: configuração, catálogo, ranking e get_best_server
+                self._discovery_deadline = time.monotonic() + self._phase_budget("discovery")
+                try:
+                    # O shutdown_event interrompe os downloads/uploads do speedtest-cli entre blocos
+                    st = speedtest.Speedtest(
+                        timeout=max(1, min(SPEEDTEST_CLI_TIMEOUT, self._discovery_remaining())),
+                        shutdown_event=self._abort,
+                    )
+                except Exception as e:
+                    log(f"Falha ao instanciar Speedtest: {e}")
+                    error_msg = str(e)
+                    if "403" in error_msg or "Forbidden" in error_msg:
+                        if self.progress_callback:
+                            self.progress_callback("Speedtest bloqueado pelo servidor (HTTP 403). Abrindo alternativa...")
+                        # Sinaliza para a interface abrir o fallback
+                        from nuvem.alternative_speedtest import AlternativeSpeedTestWindow
+                        alt_window = AlternativeSpeedTestWindow()
+                        alt_window.show()
+                        return {"download": 0.0, "upload": 0.0, "ping": 0.0, "jitter": 0.0, "status": "blocked", "error": "Speedtest bloqueado pelo servidor (HTTP 403)."},
+                    else:
+                        raise
+                log("Speedtest instanciado.")
+                if self.progress_callback:
+                    self.progress_callback("Speedtest instanciado.")
+                # Obter melhor servidor uma vez só
+                log("Buscando melhor servidor...")
+                if self.progress_callback:
+                    self.progress_callback("Determinando melhor servidor...")
+                best = self._select_server(st)
+                self.server = best
+                log(f"Melhor servidor obtido: {best.get('host')} ({best.get('name')})")
+                if self.progress_callback:
+                    self.progress_callback(f"Melhor servidor: {best.get('name')} ({best.get('host')})")
+                # Ping base (já calculado na seleção do servidor)
+                ping = st.results.ping
+            engine = self._native_engine(best) if self.backend == BACKEND_NATIVE else None
+            if jitter_probe is None:
+                jitter_probe = self._start_jitter(best)
+                if jitter_probe:
+                    # Contra o servidor do speedtest, mede antes de carregar o link
+                    self._wait_jitter(jitter_probe)
+            self._wait_bandwidth_gate()
+            if self._cancelled():
+                return {"status": "cancelled", "error": "Teste de velocidade cancelado."}
+            self._bufferbloat = self._start_bufferbloat(best)
             # Teste de download
-            if self.cancel_flag and self.cancel_flag():
+            if self._cancelled():
                 return {"status": "cancelled", "error": "Teste de velocidade cancelado."}
+            if self._remaining() < MIN_PHASE_S:
+                return self._expired("download")
             if self.progress_callback:
                 self.progress_callback("Teste de Download:")
-            download = st.download() / 1_000_000
+            download, engine = self._measure_phase("download", st, engine)
+            self._record_phase("download", download)
             log(f"Download: {download} Mbps")
             if self.progress_callback:
                 self.progress_callback(f"Resultado Download: {round(download,2)} Mbps")
             # Teste de upload
-            if self.cancel_flag and self.cancel_flag():
+            if self._cancelled():
                 return {"status": "cancelled", "error": "Teste de velocidade cancelado."}
+            if self._remaining() < MIN_PHASE_S:
+                return self._expired("upload")
             if self.progress_callback:
                 self.progress_callback("Teste de Upload:")
-            upload = st.upload() / 1_000_000
+            upload, engine = self._measure_phase("upload", st, engine)
+            self._record_phase("upload", upload)
+            if self._cancelled():
+                return {"status": "cancelled", "error": "Teste de velocidade cancelado."}
             log(f"Upload: {upload} Mbps")
             if self.progress_callback:
                 self.progress_callback(f"Resultado Upload: {round(upload,2)} Mbps")
-            # Ping base (já calculado no get_best_server)
-            ping = st.results.ping
+            bufferbloat = self._bufferbloat_summary()
+            if st:
+                # Após uma troca para o servidor reserva, vale o ping dele
+                ping = st.results.ping
             log(f"Ping: {ping} ms")
             if self.progress_callback:
                 self.progress_callback("Teste de Ping:")
                 self.progress_callback(f"Resultado Ping: {round(ping,2)} ms")
-            # Estimar jitter com múltiplas medições rápidas de ping
-            jitter_samples = []
+            # Jitter (RFC 3550) e perda a partir das amostras de RTT coletadas em paralelo
             if self.progress_callback:
                 self.progress_callback("Teste de Jitter:")
-            for i in range(10):
-                if self.cancel_flag and self.cancel_flag():
+            # Sem amostras, jitter e perda ficam None com o motivo em "jitter_error" (não medido não é 0)
+            jitter = None
+            packet_loss = None
+            jitter_error = None
+            if jitter_probe:
+                resumos = [r.summary() for r in self._wait_jitter(jitter_probe).values()]
+                if not jitter_probe.done:
+                    log("Jitter: medição não terminou no prazo; usando as amostras já coletadas.")
+                for r in resumos:
+                    log(
+                        f"Jitter {r['host']}:{r['port']}: {r['jitter_ms']} ms, desvio médio "
+                        f"{r['mean_deviation_ms']} ms, perda {r['loss']} ({r['received']}/{r['sent']})"
+                        + (f", erro: {r['error']}" if r.get("error") else "")
+                    )
+                validos = [r for r in resumos if r["received"] > 1]
+                if validos:
+                    jitter = max(r["jitter_ms"] for r in validos)
+                else:
+                    jitter_error = ("medição de jitter não terminou no prazo" if not jitter_probe.done
+                                    else "amostras de RTT insuficientes")
+                enviados = [r for r in resumos if r["sent"]]
+                if enviados:
+                    packet_loss = max(r["loss"] for r in enviados)
+                if self._cancelled():
                     return {"status": "cancelled", "error": "Teste de velocidade cancelado."}
-                t1 = time.perf_counter()
-                _ = st.results.ping  # usa ping já definido pelo servidor atual
-                t2 = time.perf_counter()
-                jitter_samples.append((t2 - t1) * 1000)
-                log(f"Jitter sample {i}: {(t2 - t1) * 1000} ms")
-                time.sleep(0.1)
-            jitter = statistics.stdev(jitter_samples) if len(jitter_samples) > 1 else 0.0
-            log(f"Jitter calculado: {jitter} ms")
-            if self.progress_callback:
-                self.progress_callback(f"Resultado Jitter: {round(jitter,2)} ms")
+            else:
+                jitter_error = "nenhum destino configurado"
+            if jitter is None:
+                log(f"Jitter não medido: {jitter_error}.")
+                if self.progress_callback:
+                    self.progress_callback(f"Resultado Jitter: não medido ({jitter_error})")
+            else:
+                log(f"Jitter calculado: {jitter} ms, perda {packet_loss}")
+                if self.progress_callback:
+                    perda = f"{round(packet_loss * 100, 1)}%" if packet_loss is not None else "não medida"
+                    self.progress_callback(f"Resultado Jitter: {round(jitter, 2)} ms (perda {perda})")
             return {
                 "download": round(download, 2),
                 "upload": round(upload, 2),
                 "ping": round(ping, 2),
-                "jitter": round(jitter, 2),
+                "jitter": round(jitter, 2) if jitter is not None else None,
+                "packet_loss": packet_loss,
+                "jitter_error": jitter_error,
+                "bufferbloat": bufferbloat,
+                "bufferbloat_grade": bufferbloat["grade"] if bufferbloat else None,
                 "status": "success"
             }
 
@@ -108,48 +596,46 @@ class SpeedTest:
                 "status": "failed",
                 "error": user_msg
             }
+        finally:
+            # Prazo esgotado, cancelamento ou erro antes do resumo: encerra a thread e o executor do probe
+            probe, self._bufferbloat = self._bufferbloat, None
+            if probe is not None:
+                probe.stop()
 
     def run_test(self, timeout: int = 40, requirements=None) -> dict:
-        # requirements: lista de dicts do conf.json (download, upload, ping, jitter)
-        if requirements is None:
-            requirements = []
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(self._run_test_worker)
-            try:
-                result = future.result(timeout=timeout)
-                if isinstance(result, tuple) and len(result) == 1 and isinstance(result[0], dict):
-                    result = result[0]
-                # Validação dos requisitos
-                if isinstance(result, dict) and result.get("status") == "success":
-                    for req in requirements:
-                        tipo = req.get("type")
-                        if tipo == "download" and req.get("required"):
-                            min_mbps = req.get("min_mbps", 0)
-                            if result.get("download", 0) < min_mbps:
-                                result["status"] = "failed"
-                                result["error"] = f"Download abaixo do mínimo: {result.get('download')} Mbps < {min_mbps} Mbps"
-                        if tipo == "upload" and req.get("required"):
-                            min_mbps = req.get("min_mbps", 0)
-                            if result.get("upload", 0) < min_mbps:
-                                result["status"] = "failed"
-                                result["error"] = f"Upload abaixo do mínimo: {result.get('upload')} Mbps < {min_mbps} Mbps"
-                        if tipo == "ping" and req.get("required"):
-                            max_ms = req.get("max_ms", 9999)
-                            if result.get("ping", 0) > max_ms:
-                                result["status"] = "failed"
-                                result["error"] = f"Ping acima do máximo: {result.get('ping')} ms > {max_ms} ms"
-                        if tipo == "jitter" and req.get("required"):
-                            max_ms = req.get("max_ms", 9999)
-                            if result.get("jitter", 0) > max_ms:
-                                result["status"] = "failed"
-                                result["error"] = f"Jitter acima do máximo: {result.get('jitter')} ms > {max_ms} ms"
-                if isinstance(result, dict):
-                    return result
-                # fallback: retorna o primeiro elemento se for tuple
-                if isinstance(result, tuple) and len(result) > 0 and isinstance(result[0], dict):
-                    return result[0]
-                return {}
-            except FuturesTimeoutError:
+        result = self._run_test(timeout, requirements)
+        if self.recorder and result:
+            # Um registro por teste, com o status final (inclusive cancelado, timeout e reprovado)
+            self.recorder.record(speedtest_record(result, self.server))
+        return result
+
+    def _run_test(self, timeout, requirements) -> dict:
+        # requirements: SpeedRequirements (ou a lista "speedtest" do conf.json, compilada aqui)
+        if not isinstance(requirements, SpeedRequirements):
+            requirements = SpeedRequirements.from_list(requirements)
+        self.requirements = requirements
+        self._abort.clear()
+        self._deadline = time.monotonic() + timeout
+        saida = {}
+
+        def worker():
+            saida["result"] = self._run_test_worker()
+
+        # Thread daemon em vez de executor: no timeout não há shutdown esperando a medição terminar
+        thread = threading.Thread(target=worker, name="speedtest", daemon=True)
+        thread.start()
+        while thread.is_alive():
+            thread.join(CANCEL_POLL_INTERVAL)
+            if not thread.is_alive():
+                break
+            if self._cancelled():
+                log("Speedtest cancelado; encerrando conexões em segundo plano.")
+                return {"download": 0.0, "upload": 0.0, "ping": 0.0, "jitter": 0.0,
+                        "status": "cancelled", "error": "Teste de velocidade cancelado."}
+            if time.monotonic() >= self._deadline:
+                # Sinaliza a thread (sockets, speedtest-cli e jitter param no próximo bloco) e retorna já
+                self._abort.set()
+                log("Speedtest excedeu o tempo limite; encerrando conexões em segundo plano.")
                 return {
                     "download": 0.0,
                     "upload": 0.0,
@@ -158,3 +644,19 @@ class SpeedTest:
                     "status": "timeout",
                     "error": "Speedtest excedeu o tempo limite"
                 }
+        result = saida.get("result")
+        if isinstance(result, tuple) and len(result) == 1 and isinstance(result[0], dict):
+            result = result[0]
+        # Validação dos requisitos: um limite por métrica, todas as violações em "errors"
+        if isinstance(result, dict) and result.get("status") == "success":
+            erros = requirements.evaluate(result)
+            result["errors"] = erros
+            if erros:
+                result["status"] = "failed"
+                result["error"] = "; ".join(erros)
+        if isinstance(result, dict):
+            return result
+        # fallback: retorna o primeiro elemento se for tuple
+        if isinstance(result, tuple) and len(result) > 0 and isinstance(result[0], dict):
+            return result[0]
+        return {}
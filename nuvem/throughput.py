@@ -0,0 +1,476 @@
+# nuvem/throughput.py
+import http.client
+import multiprocessing
+import os
+import queue
+import socket
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from nuvem.adaptive import AdaptiveController
+
+# Valores padrão da seção "throughput" do conf.json
+DEFAULT_STREAMS = 4
+DEFAULT_DURATION_S = 10.0
+DEFAULT_WARMUP_S = 2.0
+DEFAULT_TIMEOUT_S = 10.0
+DEFAULT_UPLOAD_SIZE = 4 * 1024 * 1024
+DEFAULT_SAMPLE_INTERVAL_S = 0.5
+
+# "threads": todos os fluxos neste processo; "processes": fluxos repartidos entre processos
+MODE_THREADS = "threads"
+MODE_PROCESSES = "processes"
+MODES = (MODE_THREADS, MODE_PROCESSES)
+
+CHUNK_SIZE = 64 * 1024
+
+# Intervalo de verificação do cancelamento durante a medição
+POLL_INTERVAL = 0.1
+
+
+class ThroughputError(Exception):
+    pass
+
+
+def _connect(url: str, timeout: float) -> http.client.HTTPConnection:
+    parts = urlsplit(url)
+    if parts.scheme == "https":
+        return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=timeout)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+
+
+def _path(url: str) -> str:
+    parts = urlsplit(url)
+    return (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+
+class ThroughputEngine:
+    """
+    Mede vazão com vários fluxos HTTP paralelos por um tempo fixo.
+
+    Os bytes dos primeiros `warmup_s` segundos (slow start do TCP, abertura das
+    conexões) não entram no cálculo; a taxa vem só da janela de `duration_s`.
+    Com `controller_factory`, a fase pode terminar antes (ver nuvem.adaptive).
+    """
+
+    def __init__(
+        self,
+        download_url: Optional[str] = None,
+        upload_url: Optional[str] = None,
+        streams: int = DEFAULT_STREAMS,
+        duration_s: float = DEFAULT_DURATION_S,
+        warmup_s: float = DEFAULT_WARMUP_S,
+        timeout_s: float = DEFAULT_TIMEOUT_S,
+        upload_size: int = DEFAULT_UPLOAD_SIZE,
+        cancel_flag: Optional[Callable[[], bool]] = None,
+        sample_callback: Optional[Callable[[Dict], None]] = None,
+        sample_interval_s: float = DEFAULT_SAMPLE_INTERVAL_S,
+        controller_factory: Optional[Callable[[str], Optional[AdaptiveController]]] = None,
+        mode: str = MODE_THREADS,
+        processes: Optional[int] = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Modo de vazão inválido: {mode}")
+        self.download_url = download_url
+        self.upload_url = upload_url or download_url
+        self.streams = max(1, streams)
+        self.duration_s = duration_s
+        self.warmup_s = warmup_s
+        self.timeout_s = timeout_s
+        self.upload_size = upload_size
+        # Corpo dos uploads: alocado no primeiro upload (ver _upload_body), não em motores só de download
+        self._payload: Optional[memoryview] = None
+        self.cancel_flag = cancel_flag
+        # Recebe a cada `sample_interval_s` os bytes por fluxo no intervalo e a vazão agregada
+        self.sample_callback = sample_callback
+        self.sample_interval_s = sample_interval_s
+        # Cria, por fase, o controle que pode encerrar a medição antes de `duration_s`
+        self.controller_factory = controller_factory
+        # Prazo absoluto (time.monotonic) da fase atual; limita a medição e os timeouts dos sockets
+        self.deadline: Optional[float] = None
+        # Conexões abertas na fase atual, fechadas à força ao cancelar
+        self._active: Dict[int, http.client.HTTPConnection] = {}
+        self.mode = mode
+        # No modo "processes": quantos processos dividem os fluxos (padrão: um por núcleo, até `streams`)
+        self.processes = max(1, min(self.streams, processes or os.cpu_count() or 1))
+
+    @classmethod
+    def from_config(cls, section: Optional[dict], cancel_flag=None, sample_callback=None, controller_factory=None,
+                    **overrides) -> "ThroughputEngine":
+        section = dict(section or {})
+        section.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(
+            download_url=section.get("download_url"),
+            upload_url=section.get("upload_url"),
+            streams=int(section.get("streams", DEFAULT_STREAMS)),
+            duration_s=section.get("duration_s", DEFAULT_DURATION_S),
+            warmup_s=section.get("warmup_s", DEFAULT_WARMUP_S),
+            timeout_s=section.get("timeout_s", DEFAULT_TIMEOUT_S),
+            upload_size=int(section.get("upload_size", DEFAULT_UPLOAD_SIZE)),
+            cancel_flag=cancel_flag,
+            sample_callback=sample_callback,
+            sample_interval_s=section.get("sample_interval_s", DEFAULT_SAMPLE_INTERVAL_S),
+            controller_factory=controller_factory,
+            mode=section.get("mode", MODE_THREADS),
+            processes=section.get("processes"),
+        )
+
+    def _cancelled(self) -> bool:
+        return bool(self.cancel_flag and self.cancel_flag())
+
+    def _socket_timeout(self) -> float:
+        if self.deadline is None:
+            return self.timeout_s
+        return max(POLL_INTERVAL, min(self.timeout_s, self.deadline - time.monotonic()))
+
+    def _open(self, index: int, url: str) -> http.client.HTTPConnection:
+        conn = _connect(url, self._socket_timeout())
+        self._active[index] = conn
+        return conn
+
+    def _abort_connections(self):
+        # Desbloqueia recv/send em andamento; as threads dos fluxos saem no próximo retorno
+        for conn in list(self._active.values()):
+            sock = conn.sock
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # Fluxos -----------------------------------------------------------------
+
+    def _download_stream(self, index: int, counters: array, stop: threading.Event, errors: list):
+        conn = None
+        path = _path(self.download_url)
+        # Os bytes recebidos só são contados: um único buffer por fluxo, reaproveitado em cada leitura
+        sink = memoryview(bytearray(CHUNK_SIZE))
+        while not stop.is_set():
+            try:
+                if conn is None:
+                    conn = self._open(index, self.download_url)
+                conn.request("GET", path, headers={"Cache-Control": "no-cache"})
+                response = conn.getresponse()
+                if response.status != 200:
+                    raise ThroughputError(f"HTTP {response.status} em {self.download_url}")
+                while not stop.is_set():
+                    received = response.readinto(sink)
+                    if not received:
+                        break
+                    counters[index] += received
+                if not response.isclosed():
+                    # Interrompido no meio da resposta: a conexão não pode ser reaproveitada
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException, ThroughputError) as e:
+                if stop.is_set():
+                    # Conexão derrubada pelo fim da medição, não é falha
+                    break
+                errors.append(e)
+                if conn:
+                    conn.close()
+                conn = None
+                if stop.wait(POLL_INTERVAL):
+                    break
+        if conn:
+            conn.close()
+        self._active.pop(index, None)
+
+    def _upload_stream(self, index: int, counters: array, stop: threading.Event, errors: list):
+        conn = None
+        path = _path(self.upload_url)
+        # O corpo é sempre o mesmo buffer pré-alocado; cada envio é uma fatia sem cópia
+        body = self._upload_body()
+        size = len(body)
+        while not stop.is_set():
+            try:
+                if conn is None:
+                    conn = self._open(index, self.upload_url)
+                conn.putrequest("POST", path)
+                conn.putheader("Content-Type", "application/octet-stream")
+                conn.putheader("Content-Length", str(size))
+                conn.endheaders()
+                sent = 0
+                while sent < size and not stop.is_set():
+                    chunk = body[sent:sent + CHUNK_SIZE]
+                    conn.send(chunk)
+                    sent += len(chunk)
+                    counters[index] += len(chunk)
+                if sent < size:
+                    conn.close()
+                    conn = None
+                    break
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    raise ThroughputError(f"HTTP {response.status} em {self.upload_url}")
+            except (OSError, http.client.HTTPException, ThroughputError) as e:
+                if stop.is_set():
+                    # Conexão derrubada pelo fim da medição, não é falha
+                    break
+                errors.append(e)
+                if conn:
+                    conn.close()
+                conn = None
+                if stop.wait(POLL_INTERVAL):
+                    break
+        if conn:
+            conn.close()
+        self._active.pop(index, None)
+
+    # Medição ----------------------------------------------------------------
+
+    def _emit_sample(self, phase, deltas, mbps, interval, elapsed, warmup):
+        self.sample_callback({
+            "phase": phase,
+            "elapsed_s": round(elapsed, 3),
+            "interval_s": round(interval, 3),
+            "bytes": deltas,
+            "mbps": round(mbps, 2),
+            "warmup": warmup,
+        })
+
+    def _measure(self, phase: str) -> Dict:
+        controller = self.controller_factory(phase) if self.controller_factory else None
+        sampling = bool(self.sample_callback or controller)
+        group = _ProcessStreams(self, phase) if self.mode == MODE_PROCESSES else _ThreadStreams(self, phase)
+        counters = group.counters
+        group.start()
+        start = time.monotonic()
+
+        warmup_end = start + self.warmup_s
+        measure_end = warmup_end + self.duration_s
+        if self.deadline is not None:
+            measure_end = min(measure_end, self.deadline)
+        warm_bytes = None
+        warm_at = start
+        cancelled = False
+        previous = [0] * self.streams
+        previous_at = start
+        next_sample = start + self.sample_interval_s
+        while True:
+            now = time.monotonic()
+            if warm_bytes is None and now >= warmup_end:
+                warm_bytes = sum(counters)
+                warm_at = now
+            if sampling and now >= next_sample:
+                snapshot = list(counters)
+                deltas = [current - before for current, before in zip(snapshot, previous)]
+                interval = now - previous_at
+                sample_mbps = sum(deltas) * 8 / interval / 1_000_000 if interval > 0 else 0.0
+                if self.sample_callback:
+                    self._emit_sample(phase, deltas, sample_mbps, interval, now - start, now < warmup_end)
+                # Só amostras inteiramente após o aquecimento alimentam a decisão de parar cedo
+                settled = warm_bytes is not None and previous_at >= warm_at
+                previous, previous_at = snapshot, now
+                next_sample = max(next_sample + self.sample_interval_s, now + POLL_INTERVAL / 2)
+                if controller and settled and controller.add(sample_mbps):
+                    break
+            if now >= measure_end:
+                break
+            if self._cancelled():
+                cancelled = True
+                break
+            wake = measure_end
+            if warm_bytes is None:
+                wake = min(wake, warmup_end)
+            if sampling:
+                wake = min(wake, next_sample)
+            time.sleep(min(POLL_INTERVAL, max(0.0, wake - now)))
+        end_bytes = sum(counters)
+        end_at = time.monotonic()
+        errors = group.stop(cancelled)
+
+        measured_bytes = end_bytes - (warm_bytes or 0)
+        elapsed = end_at - warm_at
+        mbps = (measured_bytes * 8 / elapsed / 1_000_000) if elapsed > 0 else 0.0
+        result = {
+            "phase": phase,
+            "mbps": round(mbps, 2),
+            "bytes": measured_bytes,
+            "total_bytes": end_bytes,
+            "seconds": round(elapsed, 3),
+            "streams": self.streams,
+            "mode": self.mode,
+            "per_stream_bytes": list(counters),
+            "cancelled": cancelled,
+        }
+        if self.mode == MODE_PROCESSES:
+            result["processes"] = self.processes
+        if controller and controller.verdict:
+            result["early_stop"] = controller.verdict
+            result["ci_mbps"] = [round(bound, 2) for bound in controller.interval]
+        if errors:
+            result["errors"] = len(errors)
+            result["last_error"] = str(errors[-1])
+            if end_bytes == 0:
+                raise ThroughputError(f"Falha no {phase}: {errors[-1]}")
+        return result
+
+    def download(self) -> Dict:
+        if not self.download_url:
+            raise ThroughputError("URL de download não configurada.")
+        return self._measure("download")
+
+    def upload(self) -> Dict:
+        if not self.upload_url:
+            raise ThroughputError("URL de upload não configurada.")
+        if self.mode == MODE_THREADS:
+            # Antes de iniciar os fluxos; no modo "processes" cada filho aloca o seu
+            self._upload_body()
+        return self._measure("upload")
+
+    def _upload_body(self) -> memoryview:
+        # Alocado uma vez e compartilhado (só leitura) por todos os fluxos
+        if self._payload is None:
+            self._payload = memoryview(bytes(self.upload_size))
+        return self._payload
+
+
+class _ThreadStreams:
+    """
+    Fluxos em threads deste processo, contando bytes num array compartilhado.
+    """
+
+    def __init__(self, engine: ThroughputEngine, phase: str):
+        self.engine = engine
+        self.counters = array("Q", [0] * engine.streams)
+        self._stop = threading.Event()
+        self._errors: list = []
+        target = engine._download_stream if phase == "download" else engine._upload_stream
+        self._threads = [
+            threading.Thread(
+                target=target, args=(i, self.counters, self._stop, self._errors), name=f"{phase}-{i}", daemon=True
+            )
+            for i in range(engine.streams)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, cancelled: bool) -> List:
+        self._stop.set()
+        if cancelled:
+            # Não espera o timeout dos sockets: derruba as conexões e devolve o controle já
+            self.engine._abort_connections()
+        for thread in self._threads:
+            thread.join(POLL_INTERVAL if cancelled else self.engine.timeout_s)
+        return self._errors
+
+
+def _process_worker(phase: str, options: Dict, indexes: List[int], counters, go, stop, events):
+    # Processo filho: roda os fluxos `indexes` em threads, somando no bloco de contadores compartilhado
+    engine = ThroughputEngine(**options)
+    if phase == "upload":
+        engine._upload_body()
+    target = engine._download_stream if phase == "download" else engine._upload_stream
+    local_stop = threading.Event()
+    errors: list = []
+    threads = [
+        threading.Thread(target=target, args=(i, counters, local_stop, errors), daemon=True) for i in indexes
+    ]
+    events.put(("ready", os.getpid()))
+    go.wait()
+    for thread in threads:
+        thread.start()
+    stop.wait()
+    local_stop.set()
+    for thread in threads:
+        thread.join(engine.timeout_s)
+    events.put(("done", len(errors), str(errors[-1]) if errors else None))
+
+
+class _ProcessStreams:
+    """
+    Fluxos repartidos entre processos (sem a disputa pelo GIL).
+
+    Os bytes de cada fluxo ficam num bloco de memória compartilhada (RawArray de
+    uint64, um contador por fluxo, escrito por um único processo), que o processo
+    pai lê para as amostras ao vivo sem trocar mensagens.
+    """
+
+    def __init__(self, engine: ThroughputEngine, phase: str):
+        self.engine = engine
+        context = multiprocessing.get_context("spawn")
+        self.counters = context.RawArray("Q", engine.streams)
+        self._go = context.Event()
+        self._stop = context.Event()
+        self._events = context.Queue()
+        options = {
+            "download_url": engine.download_url,
+            "upload_url": engine.upload_url,
+            "streams": engine.streams,
+            "timeout_s": engine._socket_timeout(),
+            "upload_size": engine.upload_size,
+        }
+        self._processes = [
+            context.Process(
+                target=_process_worker,
+                args=(phase, options, list(range(n, engine.streams, engine.processes)),
+                      self.counters, self._go, self._stop, self._events),
+                name=f"{phase}-proc-{n}",
+                daemon=True,
+            )
+            for n in range(engine.processes)
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        # O relógio só começa com todos os processos prontos (o spawn custa centenas de ms).
+        # A espera é fatiada para respeitar o cancelamento, o prazo da fase e filhos que morreram
+        engine = self.engine
+        limit = time.monotonic() + engine.timeout_s
+        if engine.deadline is not None:
+            limit = min(limit, engine.deadline)
+        ready = 0
+        while ready < len(self._processes):
+            if engine._cancelled():
+                # O laço de medição vê o cancelamento e encerra os processos em stop(True)
+                break
+            dead = next((p for p in self._processes if p.exitcode is not None), None)
+            if dead is not None:
+                self._abort()
+                raise ThroughputError(f"Processo de medição {dead.name} encerrou ao iniciar (código {dead.exitcode}).")
+            if time.monotonic() >= limit:
+                self._abort()
+                raise ThroughputError("Processos de medição não iniciaram a tempo.")
+            try:
+                event = self._events.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if event[0] == "ready":
+                ready += 1
+        self._go.set()
+
+    def _abort(self):
+        self._go.set()
+        self.stop(True)
+
+    def stop(self, cancelled: bool) -> List:
+        self._stop.set()
+        errors = []
+        deadline = time.monotonic() + (POLL_INTERVAL if cancelled else self.engine.timeout_s)
+        pending = len(self._processes)
+        while pending:
+            try:
+                event = self._events.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if event[0] == "done":
+                pending -= 1
+                count, last = event[1], event[2]
+                errors.extend([last] * count)
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                # Cancelado ou travado num socket: encerra o processo e as conexões dele
+                process.terminate()
+                process.join(POLL_INTERVAL)
+        self._events.close()
+        return errors
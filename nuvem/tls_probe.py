@@ -0,0 +1,132 @@
+# nuvem/tls_probe.py
+import select
+import socket
+import ssl
+import time
+from typing import Any, Dict, Optional
+
+from nuvem.resolver import Resolver, default_resolver
+
+DEFAULT_TIMEOUT = 5.0
+
+# Espera máxima pelo session ticket, que no TLS 1.3 chega depois do handshake
+TICKET_WAIT = 0.3
+
+
+def create_context(verify: bool = True, cafile: Optional[str] = None) -> ssl.SSLContext:
+    context = ssl.create_default_context(cafile=cafile)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _wait_for_ticket(tls: ssl.SSLSocket, timeout: float):
+    # O OpenSSL só processa o NewSessionTicket ao tentar ler do socket
+    deadline = time.monotonic() + timeout
+    tls.setblocking(False)
+    try:
+        while not (tls.session and tls.session.has_ticket):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([tls], [], [], remaining)
+            if not readable:
+                break
+            try:
+                if not tls.recv(1024):
+                    break
+            except (ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                continue
+            except (ssl.SSLError, OSError):
+                break
+    finally:
+        tls.setblocking(True)
+
+
+def _handshake(ip: str, port: int, context: ssl.SSLContext, server_hostname: str, timeout: float, session=None):
+    start = time.perf_counter()
+    sock = socket.create_connection((ip, port), timeout=timeout)
+    connect_ms = (time.perf_counter() - start) * 1000
+    try:
+        tls = context.wrap_socket(
+            sock, server_hostname=server_hostname, do_handshake_on_connect=False, session=session
+        )
+    except Exception:
+        sock.close()
+        raise
+    try:
+        start = time.perf_counter()
+        tls.do_handshake()
+        handshake_ms = (time.perf_counter() - start) * 1000
+    except Exception:
+        tls.close()
+        raise
+    return tls, connect_ms, handshake_ms
+
+
+def tls_handshake_probe(
+    host: str,
+    port: int = 443,
+    timeout: float = DEFAULT_TIMEOUT,
+    server_hostname: Optional[str] = None,
+    context: Optional[ssl.SSLContext] = None,
+    resolver: Optional[Resolver] = None,
+) -> Dict[str, Any]:
+    """
+    Mede um handshake TLS completo e, em seguida, um retomado com o session ticket.
+
+    Retorna DNS, conexão TCP, handshake completo e retomado (ms), além do
+    protocolo e da cifra negociados.
+    """
+    resolver = resolver or default_resolver
+    context = context or create_context()
+    server_hostname = server_hostname or host
+    result: Dict[str, Any] = {"host": host, "port": port, "connected": False, "tls": True}
+    start = time.perf_counter()
+
+    try:
+        resolution = resolver.resolve(host)
+    except OSError as e:
+        result["error"] = f"falha na resolução DNS: {e}"
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+    result["ip"] = resolution.ip
+    result["dns_ms"] = resolution.dns_ms
+    result["dns_cached"] = resolution.cached
+
+    try:
+        tls, connect_ms, full_ms = _handshake(resolution.ip, port, context, server_hostname, timeout)
+    except (OSError, ssl.SSLError, ssl.CertificateError) as e:
+        result["error"] = str(e) or "timeout"
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    result["connected"] = True
+    result["connect_ms"] = round(connect_ms, 2)
+    result["full_handshake_ms"] = round(full_ms, 2)
+    result["protocol"] = tls.version()
+    cipher = tls.cipher()
+    result["cipher"] = cipher[0] if cipher else None
+    with tls:
+        _wait_for_ticket(tls, min(TICKET_WAIT, timeout))
+        session = tls.session
+
+    if session is None or (not session.has_ticket and not session.id):
+        result["resumed"] = False
+        result["resume_error"] = "servidor não forneceu sessão para retomada"
+    else:
+        try:
+            tls, resumed_connect_ms, resumed_ms = _handshake(
+                resolution.ip, port, context, server_hostname, timeout, session=session
+            )
+            with tls:
+                result["resumed"] = tls.session_reused
+                result["resumed_connect_ms"] = round(resumed_connect_ms, 2)
+                result["resumed_handshake_ms"] = round(resumed_ms, 2)
+        except (OSError, ssl.SSLError, ssl.CertificateError) as e:
+            result["resumed"] = False
+            result["resume_error"] = str(e) or "timeout"
+
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return result
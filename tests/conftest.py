@@ -0,0 +1,15 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nuvem.logger import configure  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _log_temporario(tmp_path_factory):
+    # Os testes não escrevem em %userprofile%/.nuvem/logs nem no terminal
+    configure(log_dir=str(tmp_path_factory.mktemp("logs")), echo=False)
@@ -0,0 +1,49 @@
+# tests/test_adaptive.py
+import pytest
+
+from nuvem.adaptive import BELOW_MIN, CONVERGED, AdaptiveController
+
+
+def test_converge_com_amostras_estaveis():
+    ctrl = AdaptiveController(window=8, min_samples=4, max_relative_ci=0.1)
+    # Antes de min_samples não há veredito nem intervalo
+    assert [ctrl.add(v) for v in (100, 101, 99)] == [None, None, None]
+    assert ctrl.interval is None
+    assert ctrl.add(100) == CONVERGED
+    baixo, alto = ctrl.interval
+    assert baixo < 100 < alto
+
+
+def test_nao_converge_com_amostras_instaveis():
+    ctrl = AdaptiveController(window=8, min_samples=4, max_relative_ci=0.1)
+    for v in (50, 150, 40, 160, 55, 145):
+        assert ctrl.add(v) is None
+    assert ctrl.verdict is None
+
+
+def test_abaixo_do_minimo_antes_de_convergir():
+    ctrl = AdaptiveController(min_mbps=100, window=8, min_samples=4, max_relative_ci=0.01)
+    for v in (20, 22, 19):
+        assert ctrl.add(v) is None
+    # Limite superior do intervalo já está abaixo dos 100 Mbps exigidos
+    assert ctrl.add(21) == BELOW_MIN
+    assert ctrl.interval[1] < 100
+
+
+def test_janela_descarta_amostras_antigas():
+    ctrl = AdaptiveController(window=4, min_samples=4, max_relative_ci=0.05)
+    for v in (10, 300, 5, 200):
+        ctrl.add(v)
+    assert ctrl.verdict is None
+    # Só as últimas 4 amostras entram no intervalo
+    for v in (80, 80, 80):
+        ctrl.add(v)
+    assert ctrl.add(80) == CONVERGED
+    assert ctrl.interval == pytest.approx((80.0, 80.0))
+
+
+def test_from_config():
+    assert AdaptiveController.from_config({"enabled": False}) is None
+    ctrl = AdaptiveController.from_config({"min_samples": 1, "max_relative_ci": 0.2}, min_mbps=5)
+    # Pelo menos 2 amostras para haver variância
+    assert ctrl.min_samples == 2 and ctrl.min_mbps == 5 and ctrl.max_relative_ci == 0.2
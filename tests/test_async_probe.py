@@ -0,0 +1,88 @@
+# tests/test_async_probe.py
+import socket
+import threading
+import time
+
+import pytest
+
+from nuvem.async_probe import run_probes
+from nuvem.resolver import Resolver
+from nuvem.server_selection import rank_servers
+
+
+class _ResolverTravado(Resolver):
+    # getaddrinfo que não volta (até o teste liberar): simula um DNS pendurado
+    def __init__(self):
+        super().__init__()
+        self.liberar = threading.Event()
+
+    def resolve(self, host):
+        self.liberar.wait(30)
+        return super().resolve(host)
+
+
+@pytest.fixture
+def resolver_travado():
+    resolver = _ResolverTravado()
+    yield resolver
+    resolver.liberar.set()
+
+
+@pytest.fixture
+def porta_aberta():
+    with socket.create_server(("127.0.0.1", 0)) as srv:
+        yield srv.getsockname()[1]
+
+
+def _porta_fechada():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_run_probes_na_ordem_dos_testes(porta_aberta):
+    testes = [
+        {"host": "127.0.0.1", "port": _porta_fechada()},
+        {"host": "127.0.0.1", "port": porta_aberta, "samples": 3},
+    ]
+    fechada, aberta = run_probes(testes, timeout=2)
+    assert not fechada["connected"] and fechada["error"]
+    assert aberta["connected"] and aberta["latency"]["samples"] == 3
+    assert [fechada["index"], aberta["index"]] == [0, 1]
+
+
+def test_tls_travado_nao_segura_o_retorno(resolver_travado):
+    inicio = time.monotonic()
+    (result,) = run_probes([{"host": "travado.test", "port": 443, "tls": True}], timeout=0.5,
+                           resolver=resolver_travado)
+    # Dois handshakes de 0,5 s no máximo, sem esperar a thread presa no DNS
+    assert time.monotonic() - inicio < 2.0
+    assert not result["connected"]
+    assert result["error"] == "timeout no handshake TLS"
+
+
+def test_dns_travado_respeita_o_prazo_da_sonda(resolver_travado):
+    inicio = time.monotonic()
+    (result,) = run_probes([{"host": "travado.test", "port": 80}], timeout=0.5, resolver=resolver_travado)
+    assert time.monotonic() - inicio < 1.5
+    assert not result["connected"]
+    assert result["error"] == "timeout na resolução DNS"
+
+
+def test_ranking_com_dns_travado_termina_no_prazo(resolver_travado):
+    servidores = [{"id": 1, "host": "travado.test:8080", "url": "http://travado.test:8080/speedtest/upload.php"}]
+    inicio = time.monotonic()
+    resultado = rank_servers(servidores, deadline_s=1.0, request_timeout_s=0.5, resolver=resolver_travado)
+    assert time.monotonic() - inicio < 2.0
+    assert resultado["ranked"] == []
+    assert [s["status"] for s in resultado["dropped"]] == ["falha"]
+
+
+def test_resolver_guarda_em_cache_ate_o_ttl():
+    agora = [0.0]
+    resolver = Resolver(ttl=10, clock=lambda: agora[0])
+    primeira = resolver.resolve("localhost")
+    assert not primeira.cached and primeira.ip
+    assert resolver.resolve("localhost").cached
+    agora[0] = 11
+    assert not resolver.resolve("localhost").cached
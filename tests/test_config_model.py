@@ -0,0 +1,76 @@
+# tests/test_config_model.py
+import pickle
+
+import pytest
+
+from nuvem.config_loader import _freeze
+from nuvem.config_model import AppConfig, ProbeTarget, SpeedRequirements, Threshold, compile_targets
+
+REQUISITOS = [
+    {"type": "download", "min_mbps": 10, "required": True, "description": "Download mínimo"},
+    {"type": "download", "min_mbps": 25, "required": True},
+    {"type": "upload", "min_mbps": 5, "required": True},
+    {"type": "ping", "max_ms": 80, "required": True},
+    {"type": "ping", "max_ms": 50, "required": True},
+    {"type": "jitter", "max_ms": 10, "required": False},
+    {"type": "perda", "max_pct": 1, "required": True},
+]
+
+
+def test_vale_o_requisito_mais_restritivo():
+    req = SpeedRequirements.from_list(REQUISITOS)
+    assert [t.metric for t in req.limits] == ["download", "upload", "ping"]
+    assert req.by_metric["download"].minimum == 25
+    assert req.by_metric["ping"].maximum == 50
+    # "required": false e tipos desconhecidos não entram
+    assert "jitter" not in req.by_metric and "perda" not in req.by_metric
+    assert req.min_mbps("upload") == 5 and req.min_mbps("jitter") is None
+
+
+def test_by_metric_somente_leitura_e_fora_da_comparacao():
+    req = SpeedRequirements.from_list(REQUISITOS)
+    with pytest.raises(TypeError):
+        req.by_metric["download"] = Threshold("download", minimum=1)
+    assert req == SpeedRequirements(req.limits)
+    assert hash(req) == hash(SpeedRequirements(req.limits))
+    copia = pickle.loads(pickle.dumps(req))
+    assert copia == req and copia.by_metric["ping"].maximum == 50
+
+
+def test_evaluate_devolve_todas_as_violacoes():
+    req = SpeedRequirements.from_list(REQUISITOS)
+    assert req.evaluate({"download": 30, "upload": 6, "ping": 20}) == []
+    erros = req.evaluate({"download": 12, "upload": 6, "ping": 70})
+    assert erros == [
+        "Download abaixo do mínimo: 12 Mbps < 25 Mbps",
+        "Ping acima do máximo: 70 ms > 50 ms",
+    ]
+    # Métrica ausente conta como 0; métrica sem medição (None) é violação própria
+    assert req.evaluate({"upload": 6, "ping": 20}) == ["Download abaixo do mínimo: 0 Mbps < 25 Mbps"]
+    assert Threshold("jitter", maximum=10).violation(None) == "Jitter não medido"
+
+
+def test_compile_targets_ignora_entradas_invalidas():
+    alvos = compile_targets([
+        {"host": "a.exemplo", "port": "443", "required": 1, "tls": True},
+        "lixo",
+        ProbeTarget("b.exemplo", 80, False, "B"),
+    ])
+    assert [(t.host, t.port, t.required) for t in alvos] == [("a.exemplo", 443, True), ("b.exemplo", 80, False)]
+    assert alvos[0].description == "a.exemplo:443"
+    assert alvos[0].spec["tls"] is True
+    assert compile_targets(None) == ()
+
+
+def test_modelo_do_snapshot_congelado_e_hashable():
+    snapshot = _freeze({
+        "tests": [{"host": "a.exemplo", "port": 443, "required": True, "max_p95_ms": 120}],
+        "speedtest": REQUISITOS,
+    })
+    modelo = AppConfig.from_dict(snapshot)
+    (alvo,) = modelo.targets
+    # spec (FrozenDict) fica fora do hash, mas ainda entra na comparação
+    assert {alvo: "ok"}[ProbeTarget.from_dict(dict(snapshot["tests"][0]))] == "ok"
+    assert alvo != ProbeTarget.from_dict({**snapshot["tests"][0], "tls": True})
+    assert hash(modelo) == hash(AppConfig.from_dict(snapshot))
+    assert alvo.max_p95_ms == 120
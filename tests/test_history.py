@@ -0,0 +1,83 @@
+# tests/test_history.py
+import json
+import time
+
+import pytest
+
+from nuvem.history import DAY_S, HistoryStore
+
+
+def _registro(ts, host="prod.exemplo", connect_ms=10.0, **extra):
+    registro = {"ts": ts, "kind": "probe", "host": host, "port": 443, "description": "Totvs Cloud - Prod",
+                "connect_ms": connect_ms}
+    registro.update(extra)
+    return json.dumps(registro) + "\n"
+
+
+@pytest.fixture
+def historico(tmp_path):
+    results = tmp_path / "results.jsonl"
+    store = HistoryStore(str(tmp_path / "history.db"), str(results))
+    yield store, results
+    store.close()
+
+
+def test_ingest_le_so_o_trecho_novo(historico):
+    store, results = historico
+    agora = time.time()
+    with open(results, "w", encoding="utf-8") as f:
+        f.write(_registro(agora - 30) + "isto não é json\n" + _registro(agora - 20))
+        # Linha ainda sendo escrita (sem "\n") fica para a próxima consolidação
+        f.write(_registro(agora - 10).rstrip("\n"))
+    assert store.ingest() == 2
+    assert store.ingest() == 0
+    with open(results, "a", encoding="utf-8") as f:
+        f.write("\n" + _registro(agora, connect_ms=True))
+    assert store.ingest() == 2
+    # bool não é métrica: a linha entra, o valor não
+    assert [v for _, v in store.values("connect_ms")] == [10.0, 10.0, 10.0]
+
+
+def test_ingest_recomeca_se_o_arquivo_foi_recriado(historico):
+    store, results = historico
+    agora = time.time()
+    results.write_text(_registro(agora - 2) + _registro(agora - 1), encoding="utf-8")
+    assert store.ingest() == 2
+    results.write_text(_registro(agora, connect_ms=99.0), encoding="utf-8")
+    assert store.ingest() == 1
+    assert store.percentile("connect_ms", 100) == 99.0
+
+
+def test_percentil_por_destino_e_periodo(historico):
+    store, results = historico
+    agora = time.time()
+    linhas = [_registro(agora - i, connect_ms=float(i + 1)) for i in range(100)]
+    linhas.append(_registro(agora - 1, host="dev.exemplo", connect_ms=500.0, description="Totvs Cloud - Dev"))
+    linhas.append(_registro(agora - 40 * DAY_S, connect_ms=1000.0))
+    results.write_text("".join(linhas), encoding="utf-8")
+    store.ingest()
+    assert store.targets("Prod") == [("prod.exemplo", 443)]
+    assert store.percentile("connect_ms", 95, target="Prod") == pytest.approx(95.05)
+    assert store.percentile("connect_ms", 50, target="prod.exemplo") == pytest.approx(50.5)
+    # Sem destino entram todos os hosts; fora dos 30 dias, nada
+    assert store.percentile("connect_ms", 100) == 500.0
+    assert store.percentile("connect_ms", 100, days=60) == 1000.0
+    assert store.percentile("connect_ms", target="Inexistente") is None
+    with pytest.raises(ValueError):
+        store.values("metrica_inventada")
+
+
+def test_compactacao_so_corta_o_que_ja_esta_no_banco(historico):
+    store, results = historico
+    agora = time.time()
+    antigas = [_registro(agora - (100 - i) * DAY_S, connect_ms=1.0) for i in range(5)]
+    novas = [_registro(agora - i, connect_ms=2.0) for i in range(3)]
+    results.write_text("".join(antigas + novas), encoding="utf-8")
+    cortados = store.compact_results(max_age_days=90, max_mb=20)
+    assert cortados == len("".join(antigas))
+    assert results.read_text(encoding="utf-8") == "".join(novas)
+    # As linhas cortadas continuam no histórico e a posição de leitura foi ajustada
+    assert len(store.values("connect_ms", days=365)) == 8
+    with open(results, "a", encoding="utf-8") as f:
+        f.write(_registro(agora, connect_ms=3.0))
+    assert store.ingest() == 1
@@ -0,0 +1,64 @@
+# tests/test_icmp.py
+import socket
+
+import pytest
+
+from nuvem import icmp
+
+
+def _permitido(family):
+    try:
+        sock, _ = icmp.open_icmp_socket(family)
+    except OSError:
+        return False
+    sock.close()
+    return True
+
+
+def _ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as sock:
+            sock.bind(("::1", 0))
+        return True
+    except OSError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(
+    not _permitido(socket.AF_INET), reason="sem permissão para sockets ICMP (datagram ou raw)"
+)
+
+
+def test_ping_loopback_ipv4():
+    result = icmp.ping("127.0.0.1", count=3, timeout=1.0)
+    assert result.ip == "127.0.0.1"
+    assert result.method in ("dgram", "raw")
+    assert (result.sent, result.received, result.loss) == (3, 3, 0.0)
+    resumo = result.summary()["rtt"]
+    assert resumo["samples"] == 3
+    assert 0 < resumo["min_ms"] <= resumo["p50_ms"] <= resumo["max_ms"] < 1000
+
+
+@pytest.mark.skipif(not _ipv6_loopback() or not _permitido(socket.AF_INET6), reason="sem ::1 ou sem ICMPv6")
+def test_ping_many_ipv4_e_ipv6():
+    results = icmp.ping_many(["127.0.0.1", "::1"], count=2, timeout=1.0)
+    for host in ("127.0.0.1", "::1"):
+        assert results[host].ip == host
+        assert results[host].received == 2
+        assert results[host].rtt.summary()["samples"] == 2
+        assert results[host].error is None
+
+
+def test_ping_perda_sem_tempo_de_resposta():
+    # Sem tempo para esperar a resposta, cada echo enviado conta como perda
+    result = icmp.ping("127.0.0.1", count=2, timeout=0)
+    assert (result.sent, result.received, result.loss, result.ok) == (2, 0, 1.0, False)
+    assert result.rtt.summary()["samples"] == 0
+
+
+def test_ping_many_falha_de_resolucao():
+    results = icmp.ping_many(["127.0.0.1", "destino.invalid"], count=1, timeout=1.0)
+    assert results["127.0.0.1"].loss == 0.0
+    falhou = results["destino.invalid"]
+    assert (falhou.ip, falhou.sent, falhou.loss) == (None, 0, 1.0)
+    assert "DNS" in falhou.error
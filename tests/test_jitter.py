@@ -0,0 +1,96 @@
+# tests/test_jitter.py
+import socket
+import threading
+
+import pytest
+
+from nuvem.jitter import JitterProbe, measure_jitter, mean_deviation, rfc3550_jitter
+
+
+def _ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6, socket.SOCK_DGRAM) as sock:
+            sock.bind(("::1", 0))
+        return True
+    except OSError:
+        return False
+
+
+@pytest.fixture
+def porta_tcp():
+    with socket.create_server(("127.0.0.1", 0)) as srv:
+        srv.settimeout(0.2)
+        parar = threading.Event()
+
+        def aceitar():
+            while not parar.is_set():
+                try:
+                    srv.accept()[0].close()
+                except OSError:
+                    pass
+
+        thread = threading.Thread(target=aceitar, daemon=True)
+        thread.start()
+        yield srv.getsockname()[1]
+        parar.set()
+        thread.join()
+
+
+def _eco_udp(family, host):
+    # Respondedor UDP echo (RFC 862) mínimo
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    sock.bind((host, 0))
+
+    def responder():
+        while True:
+            try:
+                data, addr = sock.recvfrom(64)
+                sock.sendto(data, addr)
+            except OSError:
+                return
+
+    threading.Thread(target=responder, daemon=True).start()
+    return sock
+
+
+def test_rfc3550_e_desvio_medio():
+    assert rfc3550_jitter([10.0, 10.0, 10.0]) == 0.0
+    # |D| = 16 na primeira variação: J = 16/16 = 1
+    assert rfc3550_jitter([10.0, 26.0]) == pytest.approx(1.0)
+    assert mean_deviation([1.0, 3.0]) == pytest.approx(1.0)
+    assert mean_deviation([]) == 0.0
+
+
+@pytest.mark.parametrize("family, host", [
+    (socket.AF_INET, "127.0.0.1"),
+    pytest.param(socket.AF_INET6, "::1", marks=pytest.mark.skipif(not _ipv6_loopback(), reason="sem IPv6")),
+])
+def test_udp_echo_na_familia_do_endereco(family, host):
+    eco = _eco_udp(family, host)
+    try:
+        port = eco.getsockname()[1]
+        (result,) = measure_jitter([(host, port)], method="udp", samples=5, interval_ms=10, timeout_ms=500).values()
+        resumo = result.summary()
+        assert "error" not in resumo
+        assert (resumo["sent"], resumo["received"], resumo["loss"]) == (5, 5, 0.0)
+    finally:
+        eco.close()
+
+
+def test_wait_no_prazo_devolve_amostras_parciais(porta_tcp):
+    probe = JitterProbe([("127.0.0.1", porta_tcp)], method="tcp", samples=1000, interval_ms=20).start()
+    results = probe.wait(0.5)
+    assert not probe.done
+    (result,) = results.values()
+    assert 0 < result.sent < 1000
+    assert len(result.samples) > 1
+    # A coleta é interrompida depois do prazo
+    probe._thread.join(2)
+    assert probe.done
+
+
+def test_wait_completo():
+    probe = JitterProbe([("127.0.0.1", 9)], method="tcp", samples=3, interval_ms=10, timeout_ms=200).start()
+    (result,) = probe.wait(5).values()
+    assert probe.done
+    assert result.sent == 3 and result.loss == 1.0 and result.error
@@ -0,0 +1,50 @@
+# tests/test_latency.py
+import statistics
+
+import pytest
+
+from nuvem.latency import LatencySamples, percentile
+
+
+def test_percentil_com_interpolacao_linear():
+    valores = [10.0, 20.0, 30.0, 40.0]
+    assert percentile(valores, 0) == 10.0
+    assert percentile(valores, 100) == 40.0
+    assert percentile(valores, 50) == pytest.approx(25.0)
+    assert percentile(valores, 95) == pytest.approx(38.5)
+    # Mesmo método do numpy/statistics "inclusive"
+    assert percentile(valores, 25) == pytest.approx(statistics.quantiles(valores, n=4, method="inclusive")[0])
+
+
+def test_percentil_de_listas_pequenas():
+    assert percentile([], 95) == 0.0
+    assert percentile([7], 99) == 7.0
+    assert isinstance(percentile([7], 50), float)
+
+
+def test_resumo_em_ms_a_partir_de_ns():
+    amostras = LatencySamples()
+    for ms in (12, 10, 11, 50, 13):
+        amostras.add(ms * 1_000_000)
+    amostras.add_failure()
+    assert len(amostras) == 5 and amostras.attempts == 6
+    assert amostras.last_ns() == 13_000_000
+    resumo = amostras.summary()
+    assert resumo["samples"] == 5
+    assert resumo["min_ms"] == 10.0 and resumo["max_ms"] == 50.0
+    assert resumo["p50_ms"] == 12.0
+    assert resumo["p95_ms"] == pytest.approx(42.6)
+    assert resumo["stddev_ms"] == pytest.approx(statistics.stdev([12, 10, 11, 50, 13]), abs=0.001)
+    assert resumo["failure_ratio"] == pytest.approx(1 / 6, abs=1e-4)
+
+
+def test_resumo_sem_amostras():
+    amostras = LatencySamples()
+    assert amostras.last_ns() is None
+    assert amostras.summary()["p95_ms"] is None and amostras.summary()["failure_ratio"] == 0.0
+    amostras.add_failure()
+    resumo = amostras.summary()
+    assert resumo["samples"] == 0 and resumo["failure_ratio"] == 1.0
+    # Uma amostra só: desvio padrão zero
+    amostras.add(5_000_000)
+    assert amostras.summary()["stddev_ms"] == 0.0
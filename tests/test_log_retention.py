@@ -0,0 +1,81 @@
+# tests/test_log_retention.py
+import gzip
+import json
+import os
+import time
+
+import nuvem.log_retention as log_retention
+from nuvem.log_retention import INDEX_FILE, LogRetention, load_index, search
+
+DIA = 86400
+
+
+def _criar(pasta, nome, texto, idade_s):
+    caminho = pasta / nome
+    caminho.write_text(texto, encoding="utf-8")
+    mtime = time.time() - idade_s
+    os.utime(caminho, (mtime, mtime))
+    return caminho
+
+
+def test_comprime_os_fechados_e_indexa(tmp_path):
+    _criar(tmp_path, "NuvemTest_2026-10-01_09-00-00.log", "Totvs Cloud - Prod ok\n", 2 * DIA)
+    _criar(tmp_path, "NuvemTest_2026-10-01_09-00-00.1.log", "parte 1\n", 2 * DIA)
+    # Nome antigo (Nuvemtest_) também é mantido; o log recente ainda pode estar em uso
+    _criar(tmp_path, "Nuvemtest_2026-09-30_08-00-00.log", "versão anterior\n", 3 * DIA)
+    _criar(tmp_path, "NuvemTest_2026-10-18_10-00-00.log", "recente\n", 60)
+    _criar(tmp_path, "outro.txt", "não é log\n", 10 * DIA)
+
+    resultado = LogRetention(str(tmp_path), max_age_days=30, max_total_mb=50).run()
+    assert resultado == {"compressed": 3, "removed": 0}
+    nomes = sorted(os.listdir(tmp_path))
+    assert nomes == [
+        "NuvemTest_2026-10-01_09-00-00.1.log.gz",
+        "NuvemTest_2026-10-01_09-00-00.log.gz",
+        "NuvemTest_2026-10-18_10-00-00.log",
+        "Nuvemtest_2026-09-30_08-00-00.log.gz",
+        INDEX_FILE,
+        "outro.txt",
+    ]
+    with gzip.open(tmp_path / "NuvemTest_2026-10-01_09-00-00.log.gz", "rt", encoding="utf-8") as f:
+        assert f.read() == "Totvs Cloud - Prod ok\n"
+    indice = load_index(str(tmp_path))
+    assert sorted(indice) == ["2026-09-30_08-00-00", "2026-10-01_09-00-00", "2026-10-18_10-00-00"]
+    assert indice["2026-10-01_09-00-00"]["files"] == [
+        "NuvemTest_2026-10-01_09-00-00.log.gz", "NuvemTest_2026-10-01_09-00-00.1.log.gz",
+    ]
+
+
+def test_apaga_por_idade_e_por_tamanho(tmp_path):
+    _criar(tmp_path, "NuvemTest_2026-08-01_09-00-00.log", "x" * 100, 60 * DIA)
+    for dia in (10, 11, 12):
+        _criar(tmp_path, f"NuvemTest_2026-10-{dia}_09-00-00.log", "y" * 1000, (20 - dia) * DIA)
+    retencao = LogRetention(str(tmp_path), max_age_days=30, max_total_mb=2500 / (1024 * 1024), compress=False)
+    assert retencao.run() == {"compressed": 0, "removed": 2}
+    # O vencido saiu por idade; depois, o mais antigo até caber em 2500 bytes
+    assert sorted(os.listdir(tmp_path)) == [
+        "NuvemTest_2026-10-11_09-00-00.log", "NuvemTest_2026-10-12_09-00-00.log", INDEX_FILE,
+    ]
+    with open(tmp_path / INDEX_FILE, encoding="utf-8") as f:
+        assert sum(s["bytes"] for s in json.load(f)["sessions"].values()) == 2000
+
+
+def test_log_em_uso_nunca_e_tocado(tmp_path, monkeypatch):
+    ativo = _criar(tmp_path, "NuvemTest_2026-08-01_09-00-00.log", "em uso\n", 60 * DIA)
+    monkeypatch.setattr(log_retention, "current_log_paths", lambda: [str(ativo)])
+    assert LogRetention(str(tmp_path), max_age_days=1, max_total_mb=0).run() == {"compressed": 0, "removed": 0}
+    assert ativo.read_text(encoding="utf-8") == "em uso\n"
+
+
+def test_busca_filtra_sessoes_pelo_indice(tmp_path):
+    _criar(tmp_path, "NuvemTest_2026-09-20_09-00-00.log", "Totvs Cloud - Prod falhou\n", 20 * DIA)
+    _criar(tmp_path, "NuvemTest_2026-10-02_09-00-00.log", "Totvs Cloud - Prod ok\noutra linha\n", 10 * DIA)
+    # Sem índice, a busca lista a tmp_path
+    assert [linha for _, linha in search("Prod", str(tmp_path))] == ["Totvs Cloud - Prod falhou", "Totvs Cloud - Prod ok"]
+    LogRetention(str(tmp_path), max_age_days=30, max_total_mb=50).run()
+    assert list(search("Prod", str(tmp_path), since="2026-10-01")) == [
+        ("NuvemTest_2026-10-02_09-00-00.log.gz", "Totvs Cloud - Prod ok"),
+    ]
+    assert list(search("Prod", str(tmp_path), until="2026-09-30")) == [
+        ("NuvemTest_2026-09-20_09-00-00.log.gz", "Totvs Cloud - Prod falhou"),
+    ]
@@ -0,0 +1,83 @@
+# tests/test_logger.py
+import time
+
+from nuvem.logger import LogWriter
+
+
+def _ler(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _esperar(condicao, prazo=2.0):
+    fim = time.monotonic() + prazo
+    while time.monotonic() < fim:
+        if condicao():
+            return True
+        time.sleep(0.02)
+    return condicao()
+
+
+def test_lote_so_vai_ao_disco_no_flush(tmp_path):
+    path = tmp_path / "sessao.log"
+    writer = LogWriter(str(path), flush_bytes=1 << 20, flush_interval_s=60, echo=False)
+    try:
+        for i in range(3):
+            writer.write(f"linha {i}")
+        time.sleep(0.2)
+        assert _ler(path) == ""
+        writer.flush()
+        assert _ler(path) == "linha 0\nlinha 1\nlinha 2\n"
+    finally:
+        writer.close()
+
+
+def test_lote_descarregado_por_tamanho_e_por_tempo(tmp_path):
+    por_tamanho = LogWriter(str(tmp_path / "tamanho.log"), flush_bytes=16, flush_interval_s=60, echo=False)
+    por_tempo = LogWriter(str(tmp_path / "tempo.log"), flush_bytes=1 << 20, flush_interval_s=0.1, echo=False)
+    try:
+        por_tamanho.write("12345678")
+        por_tamanho.write("abcdefgh")
+        por_tempo.write("linha")
+        assert _esperar(lambda: _ler(tmp_path / "tamanho.log") == "12345678\nabcdefgh\n")
+        assert _esperar(lambda: _ler(tmp_path / "tempo.log") == "linha\n")
+    finally:
+        por_tamanho.close()
+        por_tempo.close()
+
+
+def test_close_grava_o_pendente_e_depois_grava_direto(tmp_path):
+    path = tmp_path / "sessao.log"
+    writer = LogWriter(str(path), flush_bytes=1 << 20, flush_interval_s=60, echo=False)
+    writer.write("antes")
+    writer.close()
+    assert _ler(path) == "antes\n"
+    # Depois do close (ex.: atexit de outro módulo) a linha vai direto ao arquivo
+    writer.write("depois")
+    assert _ler(path) == "antes\ndepois\n"
+
+
+def test_rotacao_em_partes(tmp_path):
+    path = tmp_path / "NuvemTest_2026-10-18_10-00-00.log"
+    writer = LogWriter(str(path), flush_bytes=1, flush_interval_s=60, echo=False, max_bytes=20)
+    try:
+        for i in range(5):
+            writer.write(f"linha numero {i}")
+            writer.flush()
+    finally:
+        writer.close()
+    partes = sorted(p.name for p in tmp_path.iterdir())
+    assert partes[0] == "NuvemTest_2026-10-18_10-00-00.1.log"
+    assert path.name in partes and len(partes) >= 3
+    texto = "".join(_ler(tmp_path / nome) for nome in [path.name] + [f"{path.stem}.{n}.log" for n in range(1, len(partes))])
+    assert texto == "".join(f"linha numero {i}\n" for i in range(5))
+
+
+def test_sem_pasta_o_log_segue_no_terminal(tmp_path, capsys):
+    writer = LogWriter(str(tmp_path / "nao_existe" / "sessao.log"), flush_bytes=1, echo=True)
+    writer.write("mensagem")
+    writer.flush()
+    writer.close()
+    saida = capsys.readouterr()
+    assert "mensagem" in saida.out
+    assert "Não foi possível abrir o log" in saida.err
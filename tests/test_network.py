@@ -0,0 +1,56 @@
+# tests/test_network.py
+import socket
+
+import pytest
+
+from nuvem import icmp
+from nuvem.network import NetworkTest
+
+
+def _permitido():
+    try:
+        sock, _ = icmp.open_icmp_socket(socket.AF_INET)
+    except OSError:
+        return False
+    sock.close()
+    return True
+
+
+sem_icmp = pytest.mark.skipif(not _permitido(), reason="sem permissão para sockets ICMP (datagram ou raw)")
+
+# 240.0.0.0/4 é reservado: não é roteado, o echo nunca volta
+SEM_RESPOSTA = "240.0.0.1"
+
+
+@sem_icmp
+def test_test_all_separa_sucesso_de_destino_sem_resposta():
+    resultados = NetworkTest(["127.0.0.1", SEM_RESPOSTA], deadline=3, ping_timeout=0.5).test_all()
+    loopback, mudo = resultados
+    assert loopback["status"] == "success" and loopback["ping"] is not None
+    assert mudo["host"] == SEM_RESPOSTA
+    assert mudo["status"] == "timeout"
+    assert mudo["ping"] is None and mudo["error"]
+
+
+@sem_icmp
+def test_test_connection_sem_resposta_nao_e_sucesso():
+    result = NetworkTest(ping_timeout=0.5).test_connection(SEM_RESPOSTA)
+    assert result["status"] == "timeout"
+    assert result["ping"] is None
+
+
+def test_test_all_zero_echos_nao_e_sucesso(monkeypatch):
+    # Sem depender da rede: o lote de ping volta sem nenhum echo
+    def ping_many(hosts, count=1, timeout=1.0, **kwargs):
+        return {host: icmp.PingResult(host, host) for host in hosts}
+
+    monkeypatch.setattr(icmp, "ping_many", ping_many)
+    (result,) = NetworkTest(["127.0.0.1"], deadline=2).test_all()
+    assert result["status"] == "timeout"
+    assert result["error"] == "Sem resposta ao ping"
+
+
+def test_test_all_falha_de_resolucao():
+    (result,) = NetworkTest(["destino.invalid"], deadline=3).test_all()
+    assert result["status"] == "failed"
+    assert result["error"]
@@ -0,0 +1,42 @@
+# tests/test_ringbuffer.py
+import pytest
+
+from nuvem.ringbuffer import RingBuffer
+
+
+def test_capacidade_invalida():
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+
+def test_sobrescreve_a_amostra_mais_antiga():
+    buf = RingBuffer(3)
+    for t in range(5):
+        buf.append(float(t), key=t % 2, value=t * 10, ok=t != 3)
+    assert len(buf) == 3
+    assert list(buf) == [(2.0, 0, 20.0, True), (3.0, 1, 30.0, False), (4.0, 0, 40.0, True)]
+
+
+def test_valores_por_chave_e_periodo():
+    buf = RingBuffer(8)
+    buf.append(1.0, 0, 10.5)
+    buf.append(2.0, 1, 99.0)
+    buf.append(3.0, 0, 0.0, ok=False)
+    buf.append(4.0, 0, 12.5)
+    valores, falhas = buf.values(0)
+    assert list(valores) == [10.5, 12.5] and falhas == 1
+    valores, falhas = buf.values(0, since=3.5)
+    assert list(valores) == [12.5] and falhas == 0
+    valores, falhas = buf.values(7)
+    assert len(valores) == 0 and falhas == 0
+
+
+def test_memoria_alocada_na_criacao():
+    buf = RingBuffer(100)
+    tamanho = buf.nbytes()
+    # 8 (timestamp) + 2 (chave) + 4 (valor) + 1 (ok) bytes por amostra
+    assert tamanho == 100 * 15
+    for t in range(250):
+        buf.append(float(t), 0, 1.0)
+    assert buf.nbytes() == tamanho and len(buf) == 100
+    assert next(iter(buf))[0] == 150.0
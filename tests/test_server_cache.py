@@ -0,0 +1,47 @@
+# tests/test_server_cache.py
+import socket
+
+from nuvem.server_cache import _linux_gateway, _windows_gateway
+
+ROTAS_LINUX = [
+    "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT\n",
+    "eth0\t0000A8C0\t00000000\t0001\t0\t0\t0\t00FFFFFF\t0\t0\t0\n",
+    "eth0\t00000000\t0101A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0\n",
+]
+
+
+class _IphlpapiFalso:
+    """
+    Imita GetBestRoute: preenche a MIB_IPFORWARDROW recebida por referência.
+    """
+
+    def __init__(self, next_hop, route_type=4, retorno=0):
+        self.next_hop = next_hop
+        self.route_type = route_type
+        self.retorno = retorno
+        self.destinos = []
+
+    def GetBestRoute(self, dest, source, row_ref):
+        self.destinos.append(socket.inet_ntoa(dest.to_bytes(4, "little")))
+        row = row_ref._obj
+        row.dwForwardNextHop = int.from_bytes(socket.inet_aton(self.next_hop), "little")
+        row.dwForwardType = self.route_type
+        return self.retorno
+
+
+def test_gateway_do_proc_net_route():
+    assert _linux_gateway(ROTAS_LINUX) == "192.168.1.1"
+    # Sem rota padrão não há gateway
+    assert _linux_gateway(ROTAS_LINUX[:2]) is None
+
+
+def test_gateway_do_windows_pela_melhor_rota():
+    api = _IphlpapiFalso("10.0.0.1")
+    assert _windows_gateway(api) == "10.0.0.1"
+    assert api.destinos == ["192.0.2.1"]
+
+
+def test_gateway_do_windows_sem_rota_indireta_ou_com_erro():
+    # Rota direta (destino na própria rede) e falha da API (ex.: ERROR_NETWORK_UNREACHABLE)
+    assert _windows_gateway(_IphlpapiFalso("192.0.2.1", route_type=3)) is None
+    assert _windows_gateway(_IphlpapiFalso("10.0.0.1", retorno=1231)) is None
@@ -0,0 +1,100 @@
+# tests/test_session.py
+import threading
+import time
+
+import pytest
+
+from nuvem.session import CONNECTIVITY, SPEEDTEST, OrderedOutput
+# Outro nome para o pytest não tentar coletar a classe como teste
+from nuvem.session import TestSession as Sessao
+from nuvem.speedtest_worker import SpeedTest
+
+
+def test_mensagens_do_speedtest_esperam_a_conexao():
+    saida = []
+    ordem = OrderedOutput()
+    ordem.send(SPEEDTEST, saida.append, "servidor escolhido")
+    ordem.send(CONNECTIVITY, saida.append, "Testando Prod")
+    ordem.send(SPEEDTEST, saida.append, "latência do servidor")
+    assert saida == ["Testando Prod"]
+    ordem.close(CONNECTIVITY)
+    assert saida == ["Testando Prod", "servidor escolhido", "latência do servidor"]
+    # Seção liberada: as próximas saem na hora
+    ordem.send(SPEEDTEST, saida.append, "download")
+    assert saida[-1] == "download"
+
+
+def test_fechar_fora_de_ordem_nao_libera_antes_da_hora():
+    saida = []
+    ordem = OrderedOutput(("a", "b", "c"))
+    ordem.send("c", saida.append, "c1")
+    ordem.send("b", saida.append, "b1")
+    ordem.close("b")
+    assert saida == []
+    ordem.close("a")
+    assert saida == ["b1", "c1"]
+
+
+class _SpeedTestFalso:
+    """
+    Imita SpeedTest.run_test: anota se a vazão só começou depois do fim das sondas.
+    """
+
+    def __init__(self, conexao_terminou):
+        self.conexao_terminou = conexao_terminou
+        self.bandwidth_gate = None
+        self.liberado_depois_da_conexao = None
+
+    def run_test(self, timeout, requirements=None):
+        self.bandwidth_gate.wait(5)
+        self.liberado_depois_da_conexao = self.conexao_terminou.is_set()
+        return {"download": 100.0, "status": "success"}
+
+
+def test_sessao_so_mede_vazao_depois_das_sondas():
+    terminou = threading.Event()
+    speedtest = _SpeedTestFalso(terminou)
+
+    def conectividade():
+        time.sleep(0.2)
+        terminou.set()
+        return ["Prod: ok"]
+
+    resumos = []
+    resultados, result = Sessao(conectividade, speedtest).run(on_connectivity_done=resumos.append)
+    assert resultados == ["Prod: ok"] and resumos == [["Prod: ok"]]
+    assert speedtest.liberado_depois_da_conexao is True
+    assert result["status"] == "success" and result["session"]["connectivity_s"] >= 0.2
+
+
+def test_portao_liberado_mesmo_com_falha_nas_sondas():
+    speedtest = _SpeedTestFalso(threading.Event())
+
+    def conectividade():
+        raise RuntimeError("falha nas sondas")
+
+    with pytest.raises(RuntimeError):
+        Sessao(conectividade, speedtest).run()
+    assert speedtest.bandwidth_gate.is_set()
+
+
+def test_espera_do_portao_nao_consome_o_prazo():
+    speedtest = SpeedTest()
+    speedtest.bandwidth_gate = threading.Event()
+    speedtest._deadline = time.monotonic() + 1.0
+    threading.Timer(0.4, speedtest.bandwidth_gate.set).start()
+    inicio = time.monotonic()
+    speedtest._wait_bandwidth_gate()
+    assert time.monotonic() - inicio >= 0.35
+    assert speedtest._remaining() > 0.9
+
+
+def test_cancelamento_interrompe_a_espera_do_portao():
+    cancelado = threading.Event()
+    speedtest = SpeedTest(cancel_flag=cancelado.is_set)
+    speedtest.bandwidth_gate = threading.Event()
+    threading.Timer(0.2, cancelado.set).start()
+    inicio = time.monotonic()
+    speedtest._wait_bandwidth_gate()
+    assert time.monotonic() - inicio < 1.0
+    assert not speedtest.bandwidth_gate.is_set()
@@ -0,0 +1,30 @@
+# tests/test_speedtest_worker.py
+import json
+import os
+
+from nuvem.speedtest_worker import TIMEOUT_MARGIN_S, total_timeout
+
+CONF = os.path.join(os.path.dirname(__file__), "..", "config", "conf.json")
+
+
+def test_prazo_total_do_conf_padrao_cabe_as_fases():
+    with open(CONF, encoding="utf-8") as f:
+        config = json.load(f)
+    fases = sum(config["speedtest_phases"].values())
+    ociosa = config["bufferbloat"]["idle_samples"] * (
+        config["bufferbloat"]["interval_ms"] + config["bufferbloat"]["timeout_ms"]) / 1000
+    assert config["speedtest_timeout"] >= fases + ociosa + TIMEOUT_MARGIN_S
+    assert total_timeout(config) == config["speedtest_timeout"]
+
+
+def test_prazo_curto_e_ampliado_para_as_fases():
+    config = {
+        "speedtest_timeout": 30,
+        "speedtest_phases": {"discovery": 15, "download": 15, "upload": 15},
+        "bufferbloat": {"enabled": False},
+    }
+    assert total_timeout(config) == 45 + TIMEOUT_MARGIN_S
+    config["bufferbloat"] = {"idle_samples": 4, "interval_ms": 250, "timeout_ms": 250}
+    assert total_timeout(config) == 45 + 2 + TIMEOUT_MARGIN_S
+    # Um prazo configurado maior que o necessário é respeitado
+    assert total_timeout(dict(config, speedtest_timeout=300)) == 300
@@ -0,0 +1,129 @@
+# tests/test_throughput.py
+import http.server
+import threading
+import time
+
+import pytest
+
+from nuvem.throughput import MODE_PROCESSES, MODE_THREADS, ThroughputEngine
+
+BLOCO = b"x" * 65536
+TAMANHO_DOWNLOAD = 64 * 1024 * 1024
+TAMANHO_UPLOAD = 256 * 1024
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    # Arquivo de download "infinito" e destino de upload que só conta os bytes
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(TAMANHO_DOWNLOAD))
+        self.end_headers()
+        try:
+            for _ in range(TAMANHO_DOWNLOAD // len(BLOCO)):
+                self.wfile.write(BLOCO)
+        except OSError:
+            pass
+
+    def do_POST(self):
+        restante = int(self.headers["Content-Length"])
+        while restante > 0:
+            dados = self.rfile.read(min(restante, len(BLOCO)))
+            if not dados:
+                return
+            restante -= len(dados)
+            with self.server.lock:
+                self.server.recebidos += len(dados)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def servidor():
+    srv = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.daemon_threads = True
+    srv.recebidos = 0
+    srv.lock = threading.Lock()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv, f"http://127.0.0.1:{srv.server_address[1]}/arquivo.bin"
+    srv.shutdown()
+    srv.server_close()
+
+
+def _engine(url, mode, **opcoes):
+    padrao = dict(streams=2, duration_s=0.6, warmup_s=0.3, timeout_s=5, upload_size=TAMANHO_UPLOAD,
+                  sample_interval_s=0.1, mode=mode, processes=2)
+    padrao.update(opcoes)
+    return ThroughputEngine(download_url=url, **padrao)
+
+
+@pytest.mark.parametrize("mode", [MODE_THREADS, MODE_PROCESSES])
+def test_download_conta_bytes_por_fluxo(servidor, mode):
+    _, url = servidor
+    result = _engine(url, mode).download()
+    assert result["mode"] == mode and result["streams"] == 2
+    assert not result["cancelled"] and "errors" not in result
+    assert all(n > 0 for n in result["per_stream_bytes"])
+    # Contadores lidos depois de parar os fluxos: incluem o que chegou durante o encerramento
+    assert sum(result["per_stream_bytes"]) >= result["total_bytes"]
+    assert 0 < result["bytes"] < result["total_bytes"]
+    assert result["mbps"] > 0
+    if mode == MODE_PROCESSES:
+        assert result["processes"] == 2
+
+
+@pytest.mark.parametrize("mode", [MODE_THREADS, MODE_PROCESSES])
+def test_upload_conta_bytes_enviados(servidor, mode):
+    srv, url = servidor
+    antes = srv.recebidos
+    result = _engine(url, mode).upload()
+    assert not result["cancelled"] and "errors" not in result
+    assert all(n > 0 for n in result["per_stream_bytes"])
+    assert 0 < result["bytes"] < result["total_bytes"]
+    # O servidor recebeu (quase) tudo o que foi contado; o que falta ainda estava em trânsito
+    time.sleep(0.2)
+    assert srv.recebidos - antes <= sum(result["per_stream_bytes"])
+    assert srv.recebidos - antes > result["bytes"] / 2
+
+
+def test_aquecimento_fica_fora_da_taxa(servidor):
+    _, url = servidor
+    amostras = []
+    result = _engine(url, MODE_THREADS, sample_callback=amostras.append).download()
+    aquecimento = [a for a in amostras if a["warmup"]]
+    medicao = [a for a in amostras if not a["warmup"]]
+    assert aquecimento and medicao
+    assert all(a["elapsed_s"] < 0.3 for a in aquecimento)
+    # Os bytes do aquecimento não entram em "bytes" nem no tempo da taxa
+    assert result["total_bytes"] - result["bytes"] >= sum(sum(a["bytes"]) for a in aquecimento)
+    assert result["seconds"] == pytest.approx(0.6, abs=0.25)
+    assert result["mbps"] == pytest.approx(result["bytes"] * 8 / result["seconds"] / 1_000_000, rel=0.01)
+
+
+@pytest.mark.parametrize("mode", [MODE_THREADS, MODE_PROCESSES])
+def test_prazo_encerra_a_fase(servidor, mode):
+    _, url = servidor
+    engine = _engine(url, mode, duration_s=30)
+    engine.deadline = time.monotonic() + (3.0 if mode == MODE_PROCESSES else 1.0)
+    inicio = time.monotonic()
+    result = engine.download()
+    assert time.monotonic() - inicio < (5.0 if mode == MODE_PROCESSES else 2.5)
+    assert not result["cancelled"]
+    assert result["bytes"] > 0
+
+
+@pytest.mark.parametrize("mode", [MODE_THREADS, MODE_PROCESSES])
+def test_cancelamento_encerra_a_fase(servidor, mode):
+    _, url = servidor
+    cancelado = threading.Event()
+    engine = _engine(url, mode, duration_s=30, cancel_flag=cancelado.is_set)
+    threading.Timer(0.8 if mode == MODE_PROCESSES else 0.5, cancelado.set).start()
+    inicio = time.monotonic()
+    result = engine.upload()
+    assert time.monotonic() - inicio < 4.0
+    assert result["cancelled"]
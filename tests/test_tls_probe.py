@@ -0,0 +1,110 @@
+# tests/test_tls_probe.py
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+
+import pytest
+
+from nuvem.async_probe import run_probes
+from nuvem.tls_probe import create_context, tls_handshake_probe
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="openssl não encontrado para gerar o certificado")
+
+
+@pytest.fixture(scope="module")
+def certificado(tmp_path_factory):
+    # Certificado autoassinado só para o servidor de teste
+    pasta = tmp_path_factory.mktemp("tls")
+    cert, key = str(pasta / "cert.pem"), str(pasta / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", key, "-out", cert,
+         "-days", "1", "-subj", "/CN=localhost"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+class _ServidorTLS:
+    """
+    Servidor TLS local: faz o handshake e segura cada conexão até o cliente fechar
+    (o session ticket do TLS 1.3 só chega depois do handshake).
+    """
+
+    def __init__(self, cert, key, max_version=None):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert, key)
+        if max_version:
+            self.context.maximum_version = max_version
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._aceitar, daemon=True).start()
+
+    def _aceitar(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._atender, args=(conn,), daemon=True).start()
+
+    def _atender(self, conn):
+        conn.settimeout(5)
+        try:
+            with self.context.wrap_socket(conn, server_side=True) as tls:
+                while tls.recv(1024):
+                    pass
+        except (OSError, ssl.SSLError):
+            conn.close()
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def servidor(certificado):
+    servidores = []
+
+    def criar(max_version=None):
+        srv = _ServidorTLS(*certificado, max_version=max_version)
+        servidores.append(srv)
+        return srv
+
+    yield criar
+    for srv in servidores:
+        srv.close()
+
+
+def test_handshake_tls13_com_retomada(servidor):
+    srv = servidor()
+    result = tls_handshake_probe("127.0.0.1", srv.port, timeout=5, context=create_context(verify=False))
+    assert result["connected"], result.get("error")
+    assert result["protocol"] == "TLSv1.3"
+    assert result["cipher"]
+    assert result["resumed"] is True
+    assert result["full_handshake_ms"] > 0 and result["resumed_handshake_ms"] > 0
+
+
+def test_handshake_tls12_com_retomada(servidor):
+    srv = servidor(max_version=ssl.TLSVersion.TLSv1_2)
+    result = tls_handshake_probe("127.0.0.1", srv.port, timeout=5, context=create_context(verify=False))
+    assert result["connected"], result.get("error")
+    assert result["protocol"] == "TLSv1.2"
+    assert result["resumed"] is True
+
+
+def test_certificado_autoassinado_reprovado_com_verificacao(servidor):
+    srv = servidor()
+    result = tls_handshake_probe("127.0.0.1", srv.port, timeout=5, server_hostname="localhost")
+    assert not result["connected"]
+    assert "certificate" in result["error"].lower()
+
+
+def test_run_probes_com_tls_verify_false(servidor):
+    srv = servidor()
+    teste = {"host": "127.0.0.1", "port": srv.port, "tls": True, "tls_verify": False}
+    (result,) = run_probes([teste], timeout=5)
+    assert result["connected"], result.get("error")
+    assert result["protocol"] == "TLSv1.3"
+    assert result["resumed"] is True